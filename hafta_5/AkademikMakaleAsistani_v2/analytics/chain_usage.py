@@ -0,0 +1,253 @@
+"""
+Chain Usage Accounting - Tokens, latency and cache status of every chain LLM call
+A LangChain callback attributes each call to its chain (chat model metadata) and
+step (output key of the calling LLMChain); per-document reports show which steps
+dominate cost and latency, and a process-wide tracker keeps rolling p50/p95 numbers
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Any
+from uuid import UUID
+
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain.schema import LLMResult
+
+from analytics.metrics import percentile
+from memory.llm_cache import pop_lookup_status
+from tools.context_packer import TokenCounter
+from tools.question_router import estimate_cost
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CACHE_STATUSES = ["hit", "miss", "bypassed", "off"]
+
+
+def summarize_usage(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Totals and per chain.step breakdown of call records, slowest and costliest steps first"""
+    by_step: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        step = by_step.setdefault(f"{record['chain']}.{record['step']}", {
+            "calls": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            "seconds": 0.0, "max_seconds": 0.0, "cost": 0.0, "estimated_calls": 0,
+            "cache": {status: 0 for status in CACHE_STATUSES}
+        })
+        step["calls"] += 1
+        step["errors"] += record["error"] is not None
+        step["prompt_tokens"] += record["prompt_tokens"]
+        step["completion_tokens"] += record["completion_tokens"]
+        step["seconds"] += record["seconds"]
+        step["max_seconds"] = max(step["max_seconds"], record["seconds"])
+        step["cost"] += record["cost"] or 0.0
+        step["estimated_calls"] += record["estimated"]
+        step["cache"][record["cache"]] += 1
+
+    for step in by_step.values():
+        step["seconds"] = round(step["seconds"], 3)
+        step["max_seconds"] = round(step["max_seconds"], 3)
+        step["cost"] = round(step["cost"], 6)
+
+    return {
+        "calls": len(records),
+        "errors": sum(step["errors"] for step in by_step.values()),
+        "prompt_tokens": sum(step["prompt_tokens"] for step in by_step.values()),
+        "completion_tokens": sum(step["completion_tokens"] for step in by_step.values()),
+        # Sum of call latencies; concurrent calls make it larger than the wall-clock time
+        "llm_seconds": round(sum(step["seconds"] for step in by_step.values()), 3),
+        "cost": round(sum(step["cost"] for step in by_step.values()), 6),
+        "cache": {status: sum(step["cache"][status] for step in by_step.values()) for status in CACHE_STATUSES},
+        "slowest_steps": sorted(by_step, key=lambda name: by_step[name]["max_seconds"], reverse=True)[:3],
+        "costliest_steps": sorted(by_step, key=lambda name: by_step[name]["cost"], reverse=True)[:3],
+        "by_step": by_step
+    }
+
+
+class ChainUsageTracker:
+    """Rolling per chain.step call metrics across all documents (see get_stats)"""
+
+    def __init__(self, history_size: int = 500):
+        self.history_size = history_size
+        self._steps: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, record: Dict[str, Any]):
+        key = f"{record['chain']}.{record['step']}"
+        with self._lock:
+            metrics = self._steps.get(key)
+            if metrics is None:
+                metrics = self._steps[key] = {
+                    "calls": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_cost": 0.0,
+                    "cache": {status: 0 for status in CACHE_STATUSES},
+                    "latencies": deque(maxlen=self.history_size),
+                    "prompt_history": deque(maxlen=self.history_size),
+                    "completion_history": deque(maxlen=self.history_size)
+                }
+            metrics["calls"] += 1
+            metrics["cache"][record["cache"]] += 1
+            if record["error"] is not None:
+                metrics["errors"] += 1
+                return
+            metrics["prompt_tokens"] += record["prompt_tokens"]
+            metrics["completion_tokens"] += record["completion_tokens"]
+            metrics["total_cost"] += record["cost"] or 0.0
+            metrics["latencies"].append(record["seconds"])
+            metrics["prompt_history"].append(record["prompt_tokens"])
+            metrics["completion_history"].append(record["completion_tokens"])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per chain.step counts, cache hit rate and rolling p50/p95 latency and tokens"""
+        with self._lock:
+            stats = {}
+            for key, metrics in sorted(self._steps.items()):
+                latencies = list(metrics["latencies"])
+                prompts = list(metrics["prompt_history"])
+                completions = list(metrics["completion_history"])
+                lookups = metrics["cache"]["hit"] + metrics["cache"]["miss"]
+                stats[key] = {
+                    "calls": metrics["calls"],
+                    "errors": metrics["errors"],
+                    "prompt_tokens": metrics["prompt_tokens"],
+                    "completion_tokens": metrics["completion_tokens"],
+                    "total_cost": round(metrics["total_cost"], 6),
+                    "cache": dict(metrics["cache"]),
+                    "cache_hit_rate": round(metrics["cache"]["hit"] / lookups, 4) if lookups else 0.0,
+                    "p50_seconds": round(percentile(latencies, 0.5), 3),
+                    "p95_seconds": round(percentile(latencies, 0.95), 3),
+                    "p50_prompt_tokens": percentile(prompts, 0.5),
+                    "p95_prompt_tokens": percentile(prompts, 0.95),
+                    "p50_completion_tokens": percentile(completions, 0.5),
+                    "p95_completion_tokens": percentile(completions, 0.95)
+                }
+            return stats
+
+
+class ChainUsageHandler(BaseCallbackHandler):
+    """
+    Records every LLM call made under it (one handler per document or request)
+
+    The chain comes from the chat model's metadata["chain"] (LLMGateway.chat_model(chain=...)),
+    the step from the output key of the LLMChain making the call ("direct" for calls
+    outside a chain). Cache hits cost no tokens. Streamed responses carry no usage, so
+    their tokens are counted locally and marked as estimated. Records also go to the
+    process-wide tracker.
+    """
+
+    def __init__(self, document: str = "", tracker: ChainUsageTracker = None):
+        self.document = document
+        self.tracker = tracker or get_usage_tracker()
+        self.records: List[Dict[str, Any]] = []
+        self.counter = TokenCounter()
+        self._steps: Dict[UUID, str] = {}   # chain run id -> step name
+        self._calls: Dict[UUID, Dict[str, Any]] = {}  # LLM run id -> call in flight
+        self._lock = threading.Lock()
+
+    def on_chain_start(self, serialized: Dict[str, Any], inputs: Dict[str, Any], *,
+                       run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        serialized = serialized or {}
+        step = serialized.get("kwargs", {}).get("output_key") or kwargs.get("name") or serialized.get("name")
+        if step:
+            with self._lock:
+                self._steps[run_id] = step
+
+    def on_chain_end(self, outputs: Dict[str, Any], *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._steps.pop(run_id, None)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._steps.pop(run_id, None)
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], prompt_text: str,
+               metadata: Optional[Dict[str, Any]], invocation_params: Optional[Dict[str, Any]]):
+        params = invocation_params or {}
+        with self._lock:
+            self._calls[run_id] = {
+                "chain": (metadata or {}).get("chain", "unknown"),
+                "step": self._steps.get(parent_run_id, "direct"),
+                "model": params.get("model_name") or params.get("model") or "",
+                "prompt_text": prompt_text,
+                "start": time.perf_counter()
+            }
+        # Forget a lookup left by an earlier call on this thread
+        pop_lookup_status()
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID,
+                     parent_run_id: Optional[UUID] = None, metadata: Optional[Dict[str, Any]] = None,
+                     **kwargs: Any) -> None:
+        self._start(run_id, parent_run_id, "\n".join(prompts), metadata, kwargs.get("invocation_params"))
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID,
+                            parent_run_id: Optional[UUID] = None, metadata: Optional[Dict[str, Any]] = None,
+                            **kwargs: Any) -> None:
+        prompt_text = "\n".join(str(getattr(message, "content", message)) for batch in messages for message in batch)
+        self._start(run_id, parent_run_id, prompt_text, metadata, kwargs.get("invocation_params"))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+
+        cache = pop_lookup_status() or "off"
+        llm_output = response.llm_output or {}
+        usage = llm_output.get("token_usage") or {}
+        estimated = False
+        if cache == "hit":
+            prompt_tokens = completion_tokens = 0
+        elif usage:
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            completion_tokens = usage.get("completion_tokens", 0)
+        else:
+            text = "".join(generation.text for batch in response.generations for generation in batch)
+            prompt_tokens = self.counter.count(call["prompt_text"])
+            completion_tokens = self.counter.count(text)
+            estimated = True
+
+        self._record(call, cache, prompt_tokens, completion_tokens, estimated,
+                     model=llm_output.get("model_name") or call["model"])
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        if call is not None:
+            self._record(call, pop_lookup_status() or "off", 0, 0, False, call["model"], error=str(error))
+
+    def _record(self, call: Dict[str, Any], cache: str, prompt_tokens: int, completion_tokens: int,
+                estimated: bool, model: str, error: str = None):
+        record = {
+            "chain": call["chain"],
+            "step": call["step"],
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "seconds": round(time.perf_counter() - call["start"], 3),
+            "cache": cache,
+            "estimated": estimated,
+            "cost": estimate_cost(model, prompt_tokens, completion_tokens),
+            "error": error
+        }
+        with self._lock:
+            self.records.append(record)
+        self.tracker.record(record)
+
+    def report(self) -> Dict[str, Any]:
+        """Usage of every call recorded so far, totals and per chain.step"""
+        with self._lock:
+            records = list(self.records)
+        return {"document": self.document, **summarize_usage(records)}
+
+
+_tracker: Optional[ChainUsageTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_usage_tracker() -> ChainUsageTracker:
+    """Return the process-wide tracker fed by every ChainUsageHandler"""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = ChainUsageTracker()
+    return _tracker
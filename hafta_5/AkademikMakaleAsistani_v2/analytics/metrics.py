@@ -0,0 +1,12 @@
+"""
+Metric helpers shared by the gateway, router and chain usage statistics
+"""
+from typing import List
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of values (fraction 0-1), 0.0 for no values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
@@ -0,0 +1,315 @@
+"""
+Bulk Import Script for Academic Research Assistant v2.0
+Ingests an existing folder of PDFs into the library without the Streamlit uploader
+
+Usage:
+    python bulk_import.py <folder> [--workers 4] [--embed-workers 1] [--no-embed]
+
+Each file goes through hashing, text extraction, metadata extraction, library
+registration and embedding. Files already in the library are skipped and progress
+is written to a state file, so an interrupted import resumes where it stopped.
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+# Add project root to Python path
+project_root = Path(__file__).parent
+sys.path.append(str(project_root))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+STAGES = ["hash", "extraction", "metadata", "library", "embedding"]
+
+
+class StageTimer:
+    """Thread-safe accumulator of per-stage wall time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = {stage: 0.0 for stage in STAGES}
+        self.counts = {stage: 0 for stage in STAGES}
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self.totals[stage] += seconds
+            self.counts[stage] += 1
+
+    def timed(self, stage: str, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+
+class ImportState:
+    """Persistent record of imported files so an interrupted run can resume"""
+
+    def __init__(self, state_file: Path):
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self.data = {"completed": {}, "pending_embedding": {}, "failed": {}}
+
+        if state_file.exists():
+            try:
+                with open(state_file, 'r', encoding='utf-8') as f:
+                    self.data.update(json.load(f))
+            except Exception as e:
+                logger.error(f"Could not read import state {state_file}: {e}")
+
+    def _save(self):
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False)
+
+    def is_completed(self, file_hash: str) -> bool:
+        return file_hash in self.data["completed"]
+
+    def pending_embedding(self, file_hash: str) -> Optional[str]:
+        return self.data["pending_embedding"].get(file_hash)
+
+    def mark_registered(self, file_hash: str, pdf_name: str):
+        with self._lock:
+            self.data["pending_embedding"][file_hash] = pdf_name
+            self._save()
+
+    def mark_completed(self, file_hash: str, source: str, pdf_name: str):
+        with self._lock:
+            self.data["pending_embedding"].pop(file_hash, None)
+            self.data["failed"].pop(source, None)
+            self.data["completed"][file_hash] = {
+                "source": source,
+                "pdf_name": pdf_name,
+                "imported_at": datetime.now().isoformat()
+            }
+            self._save()
+
+    def mark_failed(self, source: str, error: str):
+        with self._lock:
+            self.data["failed"][source] = error
+            self._save()
+
+
+class BulkImporter:
+    """Bounded-concurrency folder importer built on EnhancedPDFManager and EnhancedVectorDB"""
+
+    def __init__(self, pdf_manager, vector_db=None, workers: int = 4, embed_workers: int = 1,
+                 state_file: Path = None):
+        self.pdf_manager = pdf_manager
+        self.vector_db = vector_db
+        self.workers = max(1, workers)
+        self.embed_workers = max(1, embed_workers)
+        self.state = ImportState(state_file or project_root / 'data' / 'bulk_import_state.json')
+        self.timer = StageTimer()
+
+    def find_pdfs(self, folder: Path, recursive: bool = True) -> List[Path]:
+        """List PDF files in a folder"""
+        pattern = "**/*" if recursive else "*"
+        return sorted(p for p in folder.glob(pattern) if p.is_file() and p.suffix.lower() == ".pdf")
+
+    def run(self, folder: Path, recursive: bool = True) -> Dict[str, Any]:
+        """Import every PDF in the folder and return a run report"""
+        pdf_files = self.find_pdfs(folder, recursive)
+        report = {"found": len(pdf_files), "imported": 0, "skipped": 0, "failed": 0,
+                  "bytes": 0, "files": []}
+
+        print(f"📁 {len(pdf_files)} PDF files found in {folder}")
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as ingest_pool, \
+                ThreadPoolExecutor(max_workers=self.embed_workers) as embed_pool:
+            futures = [ingest_pool.submit(self._import_file_background, path, embed_pool) for path in pdf_files]
+
+            for future in as_completed(futures):
+                outcome = future.result()
+                # Ingest done - wait for the chained embedding step if there is one
+                embed_future = outcome.pop("embed_future", None)
+                if embed_future is not None:
+                    outcome = embed_future.result()
+
+                report["files"].append(outcome)
+                report[outcome["status"]] += 1
+                if outcome["status"] == "imported":
+                    report["bytes"] += outcome.get("size", 0)
+
+                icon = {"imported": "✅", "skipped": "⏭️", "failed": "❌"}[outcome["status"]]
+                print(f"{icon} {outcome['source']} {outcome.get('detail', '')}".rstrip())
+
+        report["elapsed_seconds"] = time.perf_counter() - start
+        report["stage_totals"] = dict(self.timer.totals)
+        report["stage_counts"] = dict(self.timer.counts)
+        return report
+
+    def _import_file_background(self, path: Path, embed_pool: ThreadPoolExecutor) -> Dict[str, Any]:
+        """Import one file with its LLM metadata calls in the background priority class"""
+        from tools.llm_gateway import llm_priority, BACKGROUND
+        with llm_priority(BACKGROUND):
+            return self._import_file(path, embed_pool)
+
+    def _import_file(self, path: Path, embed_pool: ThreadPoolExecutor) -> Dict[str, Any]:
+        """Hash, extract, describe and register one file, then queue its embedding"""
+        source = str(path)
+        try:
+            file_hash = self.timer.timed("hash", self.pdf_manager.get_file_hash, source)
+            if not file_hash:
+                raise ValueError("could not read file")
+
+            if self.state.is_completed(file_hash):
+                return {"source": source, "status": "skipped", "detail": "(already imported)"}
+
+            existing = self.pdf_manager.find_pdf_by_hash(file_hash)
+            pending_name = self.state.pending_embedding(file_hash)
+
+            if existing and not pending_name:
+                return {"source": source, "status": "skipped", "detail": f"(in library as {existing[1]})"}
+
+            if existing and pending_name:
+                # Interrupted after registration - only the embedding is missing
+                file_path, pdf_name = existing
+                text = self.timer.timed("extraction", self.pdf_manager.extract_text, file_path)
+                metadata = (self.pdf_manager.get_pdf_metadata(pdf_name) or {}).get("extracted_metadata", {})
+            else:
+                text = self.timer.timed("extraction", self.pdf_manager.extract_text, source)
+                if not text:
+                    raise ValueError("no text extracted")
+
+                metadata = self.timer.timed(
+                    "metadata", self.pdf_manager.extract_enhanced_metadata, source, text, file_hash
+                )
+                file_path, pdf_name = self.timer.timed(
+                    "library", self.pdf_manager.add_to_library, path, text, metadata, file_hash
+                )
+                self.state.mark_registered(file_hash, pdf_name)
+
+            outcome = {"source": source, "status": "imported", "pdf_name": pdf_name,
+                       "size": path.stat().st_size, "detail": f"→ {pdf_name}"}
+
+            if self.vector_db is None:
+                self.state.mark_completed(file_hash, source, pdf_name)
+                return outcome
+
+            outcome["embed_future"] = embed_pool.submit(
+                self._embed_file, outcome, file_hash, text, metadata
+            )
+            return outcome
+
+        except Exception as e:
+            self.state.mark_failed(source, str(e))
+            return {"source": source, "status": "failed", "detail": f"({e})"}
+
+    def _embed_file(self, outcome: Dict[str, Any], file_hash: str, text: str,
+                    metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Add one registered file to the vector database"""
+        pdf_name = outcome["pdf_name"]
+        try:
+            # Vector metadata must be flat scalars
+            chunk_metadata = {
+                "filename": pdf_name,
+                "title": metadata.get("title") or pdf_name,
+                "authors": ", ".join(metadata.get("authors", [])),
+                "publication_year": metadata.get("publication_year", ""),
+                "file_hash": file_hash
+            }
+
+            # A resumed file may have a partial set of chunks from the interrupted run
+            self.vector_db.delete_document(pdf_name)
+            self.timer.timed("embedding", self.vector_db.add_document, text, chunk_metadata, pdf_name)
+
+            self.state.mark_completed(file_hash, outcome["source"], pdf_name)
+            return outcome
+
+        except Exception as e:
+            self.state.mark_failed(outcome["source"], str(e))
+            return {"source": outcome["source"], "status": "failed", "detail": f"(embedding: {e})"}
+
+
+def print_report(report: Dict[str, Any]):
+    """Print throughput and per-stage timing"""
+    elapsed = report["elapsed_seconds"]
+
+    print("\n" + "=" * 60)
+    print("📊 Bulk Import Summary")
+    print("=" * 60)
+    print(f"📁 Found:    {report['found']}")
+    print(f"✅ Imported: {report['imported']}")
+    print(f"⏭️ Skipped:  {report['skipped']}")
+    print(f"❌ Failed:   {report['failed']}")
+    print(f"⏱️ Elapsed:  {elapsed:.1f}s")
+
+    if elapsed > 0 and report["imported"]:
+        megabytes = report["bytes"] / (1024 * 1024)
+        print(f"⚡ Throughput: {report['imported'] / elapsed * 60:.1f} files/min, {megabytes / elapsed:.2f} MB/s")
+
+    print("\n🔧 Stage timing (summed across workers):")
+    for stage in STAGES:
+        count = report["stage_counts"][stage]
+        total = report["stage_totals"][stage]
+        average = total / count if count else 0
+        print(f"  {stage:<11} {total:8.2f}s total  {average:6.2f}s avg  ({count} files)")
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Import a folder of PDFs into the research library")
+    parser.add_argument("folder", help="Folder containing PDF files")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Concurrent extraction/metadata workers (default: 4)")
+    parser.add_argument("--embed-workers", type=int, default=1,
+                        help="Concurrent embedding workers (default: 1)")
+    parser.add_argument("--no-recursive", action="store_true", help="Do not descend into subfolders")
+    parser.add_argument("--no-embed", action="store_true", help="Skip vector indexing")
+    parser.add_argument("--state-file", default=None,
+                        help="Resume state file (default: data/bulk_import_state.json)")
+    args = parser.parse_args()
+
+    folder = Path(args.folder)
+    if not folder.is_dir():
+        print(f"❌ Folder not found: {folder}")
+        return 1
+
+    try:
+        from tools.pdf_manager import EnhancedPDFManager
+        pdf_manager = EnhancedPDFManager()
+
+        vector_db = None
+        if not args.no_embed:
+            from tools.vector_db import EnhancedVectorDB
+            vector_db = EnhancedVectorDB()
+    except ImportError as e:
+        print(f"Import Error: {e}")
+        print("Make sure all dependencies are installed: pip install -r requirements.txt")
+        return 1
+
+    importer = BulkImporter(
+        pdf_manager,
+        vector_db=vector_db,
+        workers=args.workers,
+        embed_workers=args.embed_workers,
+        state_file=Path(args.state_file) if args.state_file else None
+    )
+
+    try:
+        report = importer.run(folder, recursive=not args.no_recursive)
+    except KeyboardInterrupt:
+        print("\n⏸️ Import interrupted - run the same command again to resume")
+        return 130
+
+    print_report(report)
+    return 0 if report["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
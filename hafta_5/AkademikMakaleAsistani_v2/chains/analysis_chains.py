@@ -3,11 +3,15 @@ Analysis Chain - Advanced document analysis and quality assessment system
 Multi-step chain for comprehensive document evaluation and feedback
 """
 import logging
-from typing import Dict, List, Optional, Any
+import os
+import time
+from typing import Dict, List, Optional, Any, Tuple
 from langchain.chains import LLMChain, SequentialChain
 from langchain.prompts import PromptTemplate
 from langchain.schema import BaseOutputParser
-from langchain.chat_models import ChatOpenAI
+from tools.llm_gateway import get_gateway
+from memory.llm_cache import chain_cache
+from chains.map_reduce import fit_document_text
 from langchain.callbacks.base import BaseCallbackHandler
 import json
 import re
@@ -15,6 +19,68 @@ import re
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MULTI_CALL = "multi_call"
+SINGLE_CALL = "single_call"
+
+# Output of the single-call mode: the four step outputs with the fields of the step prompts.
+# "score" fields are integers 1-10 (the values _calculate_overall_scores averages).
+STRUCTURED_SCHEMA = {
+    "content_quality_analysis": {
+        "content_depth": {"theoretical_foundation": "score", "conceptual_clarity": "score",
+                          "complexity_level": "text", "comprehensive_coverage": "score"},
+        "academic_rigor": {"evidence_quality": "score", "logical_reasoning": "score",
+                           "critical_analysis": "score", "objectivity": "score"},
+        "originality": {"novelty_score": "score", "unique_contribution": "text",
+                        "innovation_level": "text", "field_advancement": "score"},
+        "overall_quality_score": "score",
+        "strengths": "list",
+        "weaknesses": "list",
+        "improvement_suggestions": "list"
+    },
+    "methodology_evaluation": {
+        "methodology_evaluation": {"research_design_quality": "score", "data_collection_appropriateness": "score",
+                                   "sample_adequacy": "score", "analysis_rigor": "score"},
+        "validity_reliability": {"internal_validity": "score", "external_validity": "score",
+                                 "construct_validity": "score", "reliability_measures": "text"},
+        "ethical_considerations": {"ethical_approval": "text", "participant_protection": "text",
+                                   "bias_mitigation": "text"},
+        "methodology_strengths": "list",
+        "methodology_limitations": "list",
+        "replication_feasibility": "text"
+    },
+    "citation_evaluation": {
+        "citation_quality": {"source_diversity": "score", "recency_score": "score",
+                             "authority_level": "score", "citation_density": "text"},
+        "reference_analysis": {"total_references": "text", "primary_sources": "text",
+                               "secondary_sources": "text", "recent_sources_5yr": "text",
+                               "seminal_works": "text"},
+        "citation_patterns": {"over_citation": "text", "under_citation": "text",
+                              "self_citation_rate": "text", "citation_balance": "text"},
+        "improvement_recommendations": "list"
+    },
+    "structure_language_analysis": {
+        "structure_analysis": {"logical_flow": "score", "section_organization": "score",
+                               "paragraph_coherence": "score", "transition_quality": "score"},
+        "language_quality": {"clarity": "score", "precision": "score",
+                             "academic_tone": "score", "readability": "score"},
+        "technical_writing": {"terminology_consistency": "text", "sentence_structure": "text",
+                              "grammar_accuracy": "text", "style_appropriateness": "text"},
+        "audience_alignment": {"complexity_match": "text", "background_assumptions": "text",
+                               "accessibility": "text"},
+        "language_improvements": "list"
+    }
+}
+
+# Metric names holding a 1-10 score (in the nested sections of every step output)
+SCORE_FIELDS = {
+    metric
+    for fields in STRUCTURED_SCHEMA.values()
+    for section in fields.values() if isinstance(section, dict)
+    for metric, spec in section.items() if spec == "score"
+}
+
+SCHEMA_PLACEHOLDERS = {"score": "1-10 arası tam sayı", "text": "Kısa açıklama", "list": ["Madde listesi"]}
+
 class AnalysisOutputParser(BaseOutputParser):
     """Custom parser for analysis output"""
     
@@ -50,11 +116,24 @@ class DocumentAnalysisChain:
     - Originality and contribution
     """
     
-    def __init__(self, llm_model: str = "gpt-4o", temperature: float = 0.2):
-        self.llm = ChatOpenAI(model_name=llm_model, temperature=temperature)
+    def __init__(self, llm_model: str = "gpt-4o", temperature: float = 0.0, mode: str = None):
+        # Responses of unchanged prompts are reused across runs (see memory/llm_cache.py)
+        cache = chain_cache("document_analysis", llm_model, temperature)
+        self.llm = get_gateway().chat_model(llm_model, temperature, chain="document_analysis", cache=cache)
+        # JSON mode for the single-call analysis
+        self.json_llm = get_gateway().chat_model(
+            llm_model, temperature, chain="document_analysis", cache=cache,
+            model_kwargs={"response_format": {"type": "json_object"}}
+        )
         self.output_parser = AnalysisOutputParser()
         
+        # multi_call: one request per assessment; single_call: all four in one JSON response
+        self.mode = mode or os.getenv("DOCUMENT_ANALYSIS_MODE", MULTI_CALL)
+        if self.mode not in (MULTI_CALL, SINGLE_CALL):
+            raise ValueError(f"Unknown document analysis mode: {self.mode}")
+        
         self._setup_analysis_chains()
+        self._setup_structured_chain()
         self._setup_sequential_chain()
         
         logger.info("Document Analysis Chain initialized")
@@ -237,6 +316,45 @@ class DocumentAnalysisChain:
             output_parser=self.output_parser
         )
     
+    def _setup_structured_chain(self):
+        """Setup the single-call chain returning all four assessments as one JSON object"""
+        skeleton = {
+            step: self._schema_placeholder(fields) for step, fields in STRUCTURED_SCHEMA.items()
+        }
+        # Braces are doubled so the JSON skeleton survives PromptTemplate formatting
+        skeleton_text = json.dumps(skeleton, ensure_ascii=False, indent=2).replace("{", "{{").replace("}", "}}")
+        
+        structured_prompt = PromptTemplate(
+            input_variables=["document_text", "title", "abstract", "research_type", "references", "target_audience"],
+            template="""
+            Bu akademik dokümanı dört açıdan tek seferde değerlendir: içerik kalitesi, metodoloji,
+            atıf/kaynak kullanımı, yapı ve dil.
+
+            Başlık: {title}
+            Özet: {abstract}
+            Araştırma Türü: {research_type}
+            Kaynaklar: {references}
+            Hedef Kitle: {target_audience}
+            Dokuman: {document_text}
+
+            Yalnızca aşağıdaki yapıda geçerli bir JSON nesnesi döndür. Tüm anahtarları kullan;
+            skor alanları 1-10 arası tam sayı olmalıdır:
+            """ + skeleton_text + "\n"
+        )
+        
+        self.structured_chain = LLMChain(
+            llm=self.json_llm,
+            prompt=structured_prompt,
+            output_key="structured_analysis",
+            output_parser=self.output_parser
+        )
+    
+    @classmethod
+    def _schema_placeholder(cls, spec):
+        if isinstance(spec, dict):
+            return {key: cls._schema_placeholder(value) for key, value in spec.items()}
+        return SCHEMA_PLACEHOLDERS[spec]
+    
     def _setup_sequential_chain(self):
         """Setup the main sequential analysis chain"""
         self.sequential_chain = SequentialChain(
@@ -266,30 +384,15 @@ class DocumentAnalysisChain:
         try:
             logger.info(f"Starting comprehensive analysis for: {document_data.get('title', 'Untitled')}")
             
-            # Prepare input parameters with defaults
-            analysis_input = {
-                "document_text": document_data.get("text", "")[:10000],  # Limit text length
-                "title": document_data.get("title", "Başlık belirtilmemiş"),
-                "abstract": document_data.get("abstract", "Özet mevcut değil"),
-                "research_type": document_data.get("research_type", "Genel araştırma"),
-                "references": document_data.get("references", "Kaynaklar belirtilmemiş"),
-                "target_audience": document_data.get("target_audience", "Akademik topluluk")
-            }
-            
-            # Run the sequential chain
-            results = self.sequential_chain(analysis_input, callbacks=callbacks)
-            
-            # Calculate overall scores
-            overall_analysis = self._calculate_overall_scores(results)
-            results["overall_analysis"] = overall_analysis
+            calls = 1 if self.mode == SINGLE_CALL else len(self.step_chains)
+            analysis_input = self.prepare_input(document_data, callbacks=callbacks, calls=calls)
+            if self.mode == SINGLE_CALL:
+                results = {**analysis_input, **self.run_structured(analysis_input, callbacks=callbacks)}
+            else:
+                # Run the sequential chain
+                results = self.sequential_chain(analysis_input, callbacks=callbacks)
             
-            # Add metadata
-            results["analysis_metadata"] = {
-                "document_title": document_data.get("title"),
-                "analysis_timestamp": "2024-10-21",  # Would use actual timestamp
-                "model_used": self.llm.model_name,
-                "analysis_type": "comprehensive"
-            }
+            results = self.finalize_results(results, document_data)
             
             logger.info("Comprehensive analysis completed successfully")
             return results
@@ -304,6 +407,185 @@ class DocumentAnalysisChain:
                 }
             }
     
+    # Output key of each analysis step -> the chain producing it
+    @property
+    def step_chains(self) -> Dict[str, LLMChain]:
+        return {
+            "content_quality_analysis": self.content_quality_chain,
+            "methodology_evaluation": self.methodology_analysis_chain,
+            "citation_evaluation": self.citation_analysis_chain,
+            "structure_language_analysis": self.structure_language_chain
+        }
+    
+    # Only the methodology step depends on the research type coming from research analysis
+    RESEARCH_TYPE_STEPS = ["methodology_evaluation"]
+    
+    # Characters of document text sent to each analysis prompt
+    TEXT_LIMIT = 10000
+    
+    def prepare_input(self, document_data: Dict[str, Any],
+                      callbacks: List[BaseCallbackHandler] = None, calls: int = 1) -> Dict[str, Any]:
+        """Build chain input parameters with defaults (calls: prompts that will be sent with it)"""
+        title = document_data.get("title", "Başlık belirtilmemiş")
+        return {
+            # Limit text length (long documents are condensed in map_reduce mode)
+            "document_text": fit_document_text(document_data.get("text", ""), self.TEXT_LIMIT, title, callbacks,
+                                               consumer="document_analysis", calls=calls),
+            "title": title,
+            "abstract": document_data.get("abstract", "Özet mevcut değil"),
+            "research_type": document_data.get("research_type", "Genel araştırma"),
+            "references": document_data.get("references", "Kaynaklar belirtilmemiş"),
+            "target_audience": document_data.get("target_audience", "Akademik topluluk")
+        }
+    
+    def run_step(self, step: str, analysis_input: Dict[str, Any],
+                 callbacks: List[BaseCallbackHandler] = None) -> Any:
+        """
+        Run a single analysis step (one of step_chains) and return its parsed output
+        
+        The four steps are independent of each other, so callers may run them concurrently.
+        """
+        chain = self.step_chains[step]
+        step_input = {key: analysis_input[key] for key in chain.input_keys}
+        return chain(step_input, callbacks=callbacks)[step]
+    
+    def run_structured(self, analysis_input: Dict[str, Any],
+                       callbacks: List[BaseCallbackHandler] = None) -> Dict[str, Any]:
+        """
+        Run all four assessments in one request and return {step: output} like run_step
+        
+        The response is validated against STRUCTURED_SCHEMA; if it does not conform,
+        the four steps are run separately instead.
+        """
+        raw = self.structured_chain(analysis_input, callbacks=callbacks)["structured_analysis"]
+        outputs, problems = self._validate_structured(raw)
+        if not problems:
+            return outputs
+        
+        logger.warning(
+            f"Single-call analysis did not match the schema ({len(problems)} problems, "
+            f"e.g. {problems[:3]}); running the four steps separately"
+        )
+        return {step: self.run_step(step, analysis_input, callbacks=callbacks) for step in self.step_chains}
+    
+    @staticmethod
+    def _coerce_score(value: Any) -> Optional[int]:
+        """Integer 1-10 from 8, 8.0, "8" or "8/10"; None if not a score"""
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, (int, float)):
+            score = value
+        elif isinstance(value, str):
+            match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*(?:/\s*10)?\s*', value)
+            if not match:
+                return None
+            score = float(match.group(1))
+        else:
+            return None
+        return int(round(score)) if 1 <= score <= 10 else None
+    
+    def _validate_structured(self, raw: Any) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        Check a single-call response against STRUCTURED_SCHEMA
+        
+        Returns (outputs, problems): scores are normalized to integers, lists to lists;
+        problems lists every missing step/section or invalid score.
+        """
+        problems = []
+        
+        def check(value, spec, path):
+            if isinstance(spec, dict):
+                if not isinstance(value, dict):
+                    problems.append(f"{path}: expected an object")
+                    return {}
+                return {key: check(value.get(key), sub_spec, f"{path}.{key}") for key, sub_spec in spec.items()}
+            if spec == "score":
+                score = self._coerce_score(value)
+                if score is None:
+                    problems.append(f"{path}: expected a score 1-10, got {value!r}")
+                return score
+            if spec == "list":
+                if value is None:
+                    return []
+                return value if isinstance(value, list) else [value]
+            return "" if value is None else value
+        
+        if not isinstance(raw, dict):
+            return {}, ["response is not a JSON object"]
+        outputs = {step: check(raw.get(step), spec, step) for step, spec in STRUCTURED_SCHEMA.items()}
+        return outputs, problems
+    
+    def compare_modes(self, document_data: Dict[str, Any], run: bool = False,
+                      callbacks: List[BaseCallbackHandler] = None) -> Dict[str, Any]:
+        """
+        Side-by-side cost and latency of the four-call and single-call modes
+        
+        Without run, input tokens are estimated from the rendered prompts (no API calls).
+        With run=True both modes are executed on the document and the measured latency,
+        token usage and cost are reported as well.
+        """
+        from tools.context_packer import TokenCounter
+        from tools.question_router import estimate_cost
+        
+        analysis_input = self.prepare_input(document_data)
+        counter = TokenCounter(self.llm.model_name)
+        report = {
+            MULTI_CALL: {
+                "calls": len(self.step_chains),
+                "estimated_prompt_tokens": sum(
+                    counter.count(chain.prompt.format(**{k: analysis_input[k] for k in chain.input_keys}))
+                    for chain in self.step_chains.values()
+                )
+            },
+            SINGLE_CALL: {
+                "calls": 1,
+                "estimated_prompt_tokens": counter.count(self.structured_chain.prompt.format(**analysis_input))
+            }
+        }
+        
+        if run:
+            from langchain.callbacks import get_openai_callback
+            
+            runs = {
+                MULTI_CALL: lambda: {step: self.run_step(step, analysis_input, callbacks=callbacks)
+                                     for step in self.step_chains},
+                SINGLE_CALL: lambda: self.run_structured(analysis_input, callbacks=callbacks)
+            }
+            for mode, execute in runs.items():
+                start = time.perf_counter()
+                with get_openai_callback() as usage:
+                    outputs = execute()
+                report[mode].update({
+                    "seconds": round(time.perf_counter() - start, 2),
+                    "prompt_tokens": usage.prompt_tokens,
+                    "completion_tokens": usage.completion_tokens,
+                    "cost_usd": estimate_cost(self.llm.model_name, usage.prompt_tokens, usage.completion_tokens),
+                    "overall_score": self._calculate_overall_scores(outputs)["overall_score"]
+                })
+        
+        multi, single = report[MULTI_CALL], report[SINGLE_CALL]
+        report["prompt_token_reduction"] = round(
+            1 - single["estimated_prompt_tokens"] / multi["estimated_prompt_tokens"], 3
+        ) if multi["estimated_prompt_tokens"] else 0.0
+        return report
+    
+    def finalize_results(self, results: Dict[str, Any], document_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Add overall scores and metadata to the combined step outputs"""
+        # Calculate overall scores
+        overall_analysis = self._calculate_overall_scores(results)
+        results["overall_analysis"] = overall_analysis
+        
+        # Add metadata
+        results["analysis_metadata"] = {
+            "document_title": document_data.get("title"),
+            "analysis_timestamp": "2024-10-21",  # Would use actual timestamp
+            "model_used": self.llm.model_name,
+            "analysis_type": "comprehensive",
+            "analysis_mode": self.mode
+        }
+        
+        return results
+    
     def _calculate_overall_scores(self, analysis_results: Dict[str, Any]) -> Dict[str, Any]:
         """Calculate overall quality scores from individual analyses"""
         try:
@@ -318,6 +600,12 @@ class DocumentAnalysisChain:
                     for section_key, section_value in analysis.items():
                         if isinstance(section_value, dict):
                             for metric_key, metric_value in section_value.items():
+                                # Plain numeric scores (8, "8", "8/10") as returned in JSON mode
+                                numeric_score = self._coerce_score(metric_value) if metric_key in SCORE_FIELDS else None
+                                if numeric_score is not None:
+                                    scores.append(numeric_score)
+                                    continue
+                                
                                 # Extract numeric score
                                 if isinstance(metric_value, str) and '(' in metric_value:
                                     score_match = re.search(r'\((\d+)-\d+\)', metric_value)
@@ -0,0 +1,137 @@
+"""
+Stage Checkpoints - Persisted per-stage outputs for resumable document processing
+Each stage output is stored under data/checkpoints/<file_hash>/<stage>.json
+"""
+import json
+import logging
+import re
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "_manifest.json"
+
+class DocumentCheckpoints:
+    """Checkpoints of one document (file hash), usable as StageGraph checkpoints"""
+
+    def __init__(self, directory: Path, file_hash: str):
+        self.directory = directory
+        self.file_hash = file_hash
+        self.restored: List[str] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stage_file_name(stage: str) -> str:
+        # Stage names like "quality:methodology_evaluation" must be valid file names everywhere
+        return re.sub(r"[^A-Za-z0-9_.-]", "_", stage) + ".json"
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        manifest_file = self.directory / MANIFEST_FILE
+        if manifest_file.exists():
+            try:
+                with open(manifest_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error(f"Error reading checkpoint manifest {manifest_file}: {e}")
+        return {"file_hash": self.file_hash, "completed_stages": []}
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        manifest["updated_at"] = datetime.now().isoformat()
+        with open(self.directory / MANIFEST_FILE, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    def start(self, document_path: str, expected_stages: List[str] = ()):
+        """Record a processing attempt of the document and the stages it needs"""
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            manifest = self._read_manifest()
+            manifest.setdefault("started_at", datetime.now().isoformat())
+            manifest["document_path"] = document_path
+            manifest["expected_stages"] = list(expected_stages)
+            manifest["attempts"] = manifest.get("attempts", 0) + 1
+            self._write_manifest(manifest)
+
+    def expect(self, stages: List[str]):
+        """Add stages (e.g. those of an analysis graph) to the expected list"""
+        with self._lock:
+            manifest = self._read_manifest()
+            expected = manifest.setdefault("expected_stages", [])
+            expected.extend(stage for stage in stages if stage not in expected)
+            self._write_manifest(manifest)
+
+    def load(self, stage: str) -> Tuple[bool, Any]:
+        """Return (True, output) for a completed stage, else (False, None)"""
+        stage_file = self.directory / self._stage_file_name(stage)
+        if not stage_file.exists():
+            return False, None
+        try:
+            with open(stage_file, 'r', encoding='utf-8') as f:
+                output = json.load(f)["output"]
+            self.restored.append(stage)
+            return True, output
+        except Exception as e:
+            logger.error(f"Error loading checkpoint {stage} for {self.file_hash}: {e}")
+            return False, None
+
+    def save(self, stage: str, output: Any):
+        """Persist a stage output; error results are not checkpointed so they run again"""
+        if isinstance(output, dict) and "error" in output:
+            return
+
+        with self._lock:
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                stage_file = self.directory / self._stage_file_name(stage)
+                temp_file = stage_file.with_suffix(".tmp")
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump({"stage": stage, "saved_at": datetime.now().isoformat(), "output": output},
+                              f, ensure_ascii=False, default=str)
+                temp_file.replace(stage_file)
+
+                manifest = self._read_manifest()
+                if stage not in manifest["completed_stages"]:
+                    manifest["completed_stages"].append(stage)
+                self._write_manifest(manifest)
+            except Exception as e:
+                logger.error(f"Error saving checkpoint {stage} for {self.file_hash}: {e}")
+
+    def clear(self):
+        """Remove all checkpoints once the document is fully processed"""
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+class CheckpointStore:
+    """Directory of per-document stage checkpoints keyed by file hash"""
+
+    def __init__(self, checkpoint_dir: str = None):
+        self.checkpoint_dir = Path(checkpoint_dir) if checkpoint_dir else \
+            Path(__file__).parent.parent / 'data' / 'checkpoints'
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+
+    def for_document(self, file_hash: str) -> DocumentCheckpoints:
+        return DocumentCheckpoints(self.checkpoint_dir / file_hash, file_hash)
+
+    def list_partial(self) -> List[Dict[str, Any]]:
+        """Documents with checkpoints, i.e. started but not fully processed"""
+        documents = []
+        for directory in sorted(self.checkpoint_dir.iterdir()):
+            if not directory.is_dir():
+                continue
+            manifest = DocumentCheckpoints(directory, directory.name)._read_manifest()
+            completed = manifest.get("completed_stages", [])
+            expected = manifest.get("expected_stages", [])
+            documents.append({
+                "file_hash": directory.name,
+                "document_path": manifest.get("document_path"),
+                "completed_stages": completed,
+                "pending_stages": [stage for stage in expected if stage not in completed],
+                "attempts": manifest.get("attempts", 0),
+                "started_at": manifest.get("started_at"),
+                "updated_at": manifest.get("updated_at")
+            })
+        return documents
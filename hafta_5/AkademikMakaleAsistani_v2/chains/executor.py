@@ -0,0 +1,161 @@
+"""
+Stage Executor - Dependency-driven concurrent execution of pipeline stages
+Runs each stage in a thread pool as soon as the stages it depends on have finished
+"""
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional, Any, Callable, Iterable
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class StageGraph:
+    """
+    Small DAG executor for pipeline stages
+
+    Each stage is a callable receiving a dict with the initial inputs plus the
+    outputs of every finished stage (keyed by stage name). Independent stages run
+    concurrently; a stage starts the moment all of its dependencies are done.
+    Stages can share a group label (e.g. "Quality Analysis") so progress can be
+    reported per group: the group starts with its first stage and completes with its last.
+    """
+
+    def __init__(self, max_workers: int = 6,
+                 on_group_start: Callable[[str], None] = None,
+                 on_group_complete: Callable[[str], None] = None):
+        self.max_workers = max_workers
+        self.on_group_start = on_group_start
+        self.on_group_complete = on_group_complete
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    def add_stage(self, name: str, func: Callable[[Dict[str, Any]], Any],
+                  depends_on: Iterable[str] = (), group: str = None) -> "StageGraph":
+        """Register a stage; dependencies must be added before run()"""
+        if name in self.stages:
+            raise ValueError(f"Stage already defined: {name}")
+        self.stages[name] = {
+            "func": func,
+            "depends_on": list(depends_on),
+            "group": group or name
+        }
+        return self
+
+    def _validate(self):
+        """Check that every dependency exists and there are no cycles"""
+        for name, stage in self.stages.items():
+            for dependency in stage["depends_on"]:
+                if dependency not in self.stages:
+                    raise ValueError(f"Stage '{name}' depends on unknown stage '{dependency}'")
+
+        visited, in_progress = set(), set()
+
+        def visit(name: str):
+            if name in visited:
+                return
+            if name in in_progress:
+                raise ValueError(f"Cycle detected at stage '{name}'")
+            in_progress.add(name)
+            for dependency in self.stages[name]["depends_on"]:
+                visit(dependency)
+            in_progress.discard(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def run(self, inputs: Dict[str, Any] = None, checkpoints=None) -> Dict[str, Any]:
+        """
+        Execute all stages and return {stage_name: output}
+
+        The first stage exception is re-raised after running stages finish;
+        stages that have not started yet are not run.
+
+        checkpoints (optional) provides load(stage) -> (found, output) and
+        save(stage, output): stages with a stored output are restored instead of
+        run, and every newly finished stage is saved as soon as it completes.
+        """
+        self._validate()
+
+        context = dict(inputs or {})
+        results: Dict[str, Any] = {}
+        lock = threading.Lock()
+
+        group_remaining: Dict[str, int] = {}
+        for stage in self.stages.values():
+            group_remaining[stage["group"]] = group_remaining.get(stage["group"], 0) + 1
+        started_groups = set()
+
+        pending = dict(self.stages)
+        running = {}
+        error: Optional[BaseException] = None
+
+        def start_group(group: str):
+            with lock:
+                first_in_group = group not in started_groups
+                started_groups.add(group)
+            if first_in_group and self.on_group_start:
+                self.on_group_start(group)
+
+        def finish_stage(name: str):
+            group = self.stages[name]["group"]
+            group_remaining[group] -= 1
+            if group_remaining[group] == 0 and self.on_group_complete:
+                self.on_group_complete(group)
+
+        def execute(name: str, stage: Dict[str, Any], stage_inputs: Dict[str, Any]):
+            start_group(stage["group"])
+            output = stage["func"](stage_inputs)
+            if checkpoints is not None:
+                checkpoints.save(name, output)
+            return output
+
+        # Stages completed by an earlier run are restored without executing them
+        if checkpoints is not None:
+            for name in list(pending):
+                found, output = checkpoints.load(name)
+                if found:
+                    pending.pop(name)
+                    start_group(self.stages[name]["group"])
+                    results[name] = output
+                    finish_stage(name)
+            if results:
+                logger.info(f"Restored {len(results)} stage(s) from checkpoints: {', '.join(results)}")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                if error is None:
+                    ready = [
+                        name for name, stage in pending.items()
+                        if all(dependency in results for dependency in stage["depends_on"])
+                    ]
+                    for name in ready:
+                        stage = pending.pop(name)
+                        stage_inputs = {**context, **results}
+                        # Stages inherit the caller's context (e.g. the LLM priority class)
+                        context_copy = contextvars.copy_context()
+                        running[pool.submit(context_copy.run, execute, name, stage, stage_inputs)] = name
+                else:
+                    pending.clear()
+
+                if not running:
+                    break
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        logger.error(f"Stage '{name}' failed: {e}")
+                        if error is None:
+                            error = e
+                        continue
+
+                    finish_stage(name)
+
+        if error is not None:
+            raise error
+
+        return results
@@ -0,0 +1,232 @@
+"""
+Section Map-Reduce - Full-text condensing of long documents for the analysis chains
+Splits the text into token-bounded sections, extracts dense notes from every
+section concurrently (map) and joins them in document order (reduce), so the
+analysis prompts see the whole paper instead of its first pages
+"""
+import contextvars
+import hashlib
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, List, Optional, Any
+
+from langchain.chains import LLMChain
+from langchain.prompts import PromptTemplate
+from langchain.callbacks.base import BaseCallbackHandler
+
+from tools.llm_gateway import get_gateway
+from tools.context_packer import TokenCounter
+from memory.llm_cache import chain_cache
+from tools.document_digest import DIGEST, get_document_digester
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TRUNCATE = "truncate"
+MAP_REDUCE = "map_reduce"
+
+# Average characters per word in the notes, used to size the map output
+CHARS_PER_WORD = 7
+# Size of the condensed text, within the limits of every analysis prompt
+CONDENSED_CHARS = 8000
+
+def long_document_mode() -> str:
+    """How the analysis chains handle text beyond their character limit (LONG_DOCUMENT_MODE)"""
+    mode = os.getenv("LONG_DOCUMENT_MODE", TRUNCATE)
+    if mode not in (TRUNCATE, MAP_REDUCE, DIGEST):
+        raise ValueError(f"Unknown long document mode: {mode}")
+    return mode
+
+class SectionMapReducer:
+    """
+    Condenses a long document to a character budget with one map call per section
+
+    Sections are at most max_section_tokens long and are mapped concurrently
+    (the LLM gateway still applies its global limit). Results are cached by text
+    hash and concurrent requests for the same text wait for one computation, so
+    several chains analyzing the same document share the map phase.
+    """
+
+    def __init__(self, llm_model: str = None, max_section_tokens: int = None,
+                 max_workers: int = None, cache_size: int = 16):
+        llm_model = llm_model or os.getenv("MAP_REDUCE_MODEL", "gpt-4o-mini")
+        self.llm = get_gateway().chat_model(llm_model, 0.0, chain="section_notes",
+                                            cache=chain_cache("section_notes", llm_model, 0.0))
+        self.max_section_tokens = max_section_tokens or int(os.getenv("MAP_SECTION_TOKENS", "6000"))
+        self.max_workers = max_workers or int(os.getenv("MAP_MAX_WORKERS", "6"))
+        self.counter = TokenCounter(llm_model)
+        self.cache_size = cache_size
+
+        self._results: "OrderedDict[str, Future]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        map_prompt = PromptTemplate(
+            input_variables=["title", "index", "total", "section", "max_words"],
+            template="""
+            Aşağıdaki metin, "{title}" başlıklı akademik makalenin {index}/{total}. bölümüdür.
+
+            Bu bölümdeki araştırma amacı/soruları, yöntem (desen, örneklem, veri toplama, analiz),
+            bulgular (sayısal sonuçlar dahil), tartışma, sınırlılıklar ve atıf yapılan temel kaynaklar
+            hakkındaki bilgileri koruyarak en fazla {max_words} kelimelik yoğun notlar çıkar.
+            Bölüm başlıklarını koru. Bölümde olmayan bilgi ekleme.
+
+            Bölüm:
+            {section}
+
+            Notlar:
+            """
+        )
+        self.map_chain = LLMChain(llm=self.llm, prompt=map_prompt, output_key="notes")
+
+    def split(self, text: str) -> List[str]:
+        """Token-bounded sections, cut at paragraph and then sentence boundaries"""
+        units = []
+        for paragraph in re.split(r"\n\s*\n", text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if self.counter.count(paragraph) <= self.max_section_tokens:
+                units.append(paragraph)
+                continue
+            for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+                while self.counter.count(sentence) > self.max_section_tokens:
+                    head = self.counter.truncate(sentence, self.max_section_tokens)
+                    units.append(head)
+                    sentence = sentence[len(head):].lstrip()
+                if sentence:
+                    units.append(sentence)
+
+        # Spread the text evenly over the fewest sections that respect the limit
+        unit_tokens = [self.counter.count(unit) for unit in units]
+        section_count = max(1, math.ceil(sum(unit_tokens) / self.max_section_tokens))
+        target_tokens = min(self.max_section_tokens, math.ceil(sum(unit_tokens) / section_count))
+
+        sections, current, current_tokens = [], [], 0
+        for unit, tokens in zip(units, unit_tokens):
+            if current and current_tokens + tokens > target_tokens:
+                sections.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(unit)
+            current_tokens += tokens
+        if current:
+            sections.append("\n\n".join(current))
+        return sections
+
+    def condense(self, text: str, char_limit: int, title: str = "",
+                 callbacks: List[BaseCallbackHandler] = None) -> Dict[str, Any]:
+        """
+        Return {"text", "condensed", "sections", "original_chars", "seconds"}
+
+        Text within char_limit is returned unchanged; longer text is replaced by the
+        section notes, which fit in char_limit.
+        """
+        if len(text) <= char_limit:
+            return {"text": text, "condensed": False, "sections": 1,
+                    "original_chars": len(text), "seconds": 0.0}
+
+        key = hashlib.sha1(f"{char_limit}\x00{text}".encode("utf-8")).hexdigest()
+        with self._lock:
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._results[key] = future
+                while len(self._results) > self.cache_size:
+                    self._results.popitem(last=False)
+            else:
+                self._results.move_to_end(key)
+
+        if owner:
+            try:
+                future.set_result(self._map_reduce(text, char_limit, title, callbacks))
+            except Exception as e:
+                with self._lock:
+                    self._results.pop(key, None)
+                future.set_exception(e)
+        return future.result()
+
+    def _map_reduce(self, text: str, char_limit: int, title: str,
+                    callbacks: List[BaseCallbackHandler] = None) -> Dict[str, Any]:
+        start = time.perf_counter()
+        sections = self.split(text)
+        header_chars = len(f"[Bölüm {len(sections)}/{len(sections)}]\n\n\n")
+        max_words = max(40, (char_limit // len(sections) - header_chars) // CHARS_PER_WORD)
+
+        def map_section(index: int, section: str) -> str:
+            result = self.map_chain({
+                "title": title or "Başlıksız",
+                "index": index + 1,
+                "total": len(sections),
+                "section": section,
+                "max_words": max_words
+            }, callbacks=callbacks)
+            return result["notes"].strip()
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(sections)))) as pool:
+            # Map calls inherit the caller's context (e.g. the LLM priority class)
+            futures = [
+                pool.submit(contextvars.copy_context().run, map_section, index, section)
+                for index, section in enumerate(sections)
+            ]
+            notes = [future.result() for future in futures]
+
+        # Reduce: notes in document order, each within its share of the budget
+        share = char_limit // len(sections)
+        condensed = "\n\n".join(
+            f"[Bölüm {index + 1}/{len(sections)}]\n{note}"[:share] for index, note in enumerate(notes)
+        )[:char_limit]
+
+        seconds = time.perf_counter() - start
+        logger.info(
+            f"Condensed {len(text)} chars in {len(sections)} sections to {len(condensed)} chars "
+            f"in {seconds:.1f}s"
+        )
+        return {"text": condensed, "condensed": True, "sections": len(sections),
+                "original_chars": len(text), "seconds": round(seconds, 2)}
+
+
+_reducer: Optional[SectionMapReducer] = None
+_reducer_lock = threading.Lock()
+
+
+def get_section_reducer() -> SectionMapReducer:
+    """Return the process-wide reducer shared by the analysis chains"""
+    global _reducer
+    if _reducer is None:
+        with _reducer_lock:
+            if _reducer is None:
+                _reducer = SectionMapReducer()
+    return _reducer
+
+
+def fit_document_text(text: str, char_limit: int, title: str = "",
+                      callbacks: List[BaseCallbackHandler] = None,
+                      consumer: str = "", calls: int = 1) -> str:
+    """
+    Text for an analysis prompt limited to char_limit characters
+
+    Longer text is condensed with the section map-reduce in map_reduce mode, otherwise
+    truncated. All chains condense to the same CONDENSED_CHARS budget, so they share
+    one map phase per document. In digest mode every prompt gets the document's
+    extractive digest instead; consumer and calls (prompts sent with the result)
+    attribute the saved tokens.
+    """
+    mode = long_document_mode()
+    if mode == DIGEST:
+        return get_document_digester().for_prompt(text, text[:char_limit], consumer, calls)
+    if len(text) <= char_limit:
+        return text
+    if mode == MAP_REDUCE:
+        return get_section_reducer().condense(text, min(char_limit, CONDENSED_CHARS), title, callbacks)["text"]
+
+    logger.warning(
+        f"Analyzing the first {char_limit} of {len(text)} characters of '{title}' "
+        f"(LONG_DOCUMENT_MODE=map_reduce or digest covers the full text)"
+    )
+    return text[:char_limit]
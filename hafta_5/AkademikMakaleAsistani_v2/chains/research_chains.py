@@ -2,18 +2,29 @@
 Research Analysis Chain - Advanced academic research analysis system
 Multi-step chain for comprehensive document analysis and research insights
 """
+import contextvars
 import logging
-from typing import Dict, List, Optional, Any
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Any, Iterator
 from langchain.chains import LLMChain, SequentialChain
 from langchain.prompts import PromptTemplate
 from langchain.schema import BaseOutputParser
-from langchain.chat_models import ChatOpenAI
+from tools.llm_gateway import get_gateway
+from memory.llm_cache import chain_cache
 from langchain.callbacks.base import BaseCallbackHandler
+from chains.executor import StageGraph
+from chains.map_reduce import fit_document_text
+from streaming.handlers import JSONFieldStreamHandler
 import json
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# on_field(step, field, value): a field of a step's output, reported as soon as it is complete
+FieldCallback = Callable[[str, str, Any], None]
+
 class ResearchAnalysisOutputParser(BaseOutputParser):
     """Custom parser for research analysis output"""
     
@@ -45,10 +56,29 @@ class ResearchAnalysisChain:
     - Methodology extraction
     - Key findings identification
     - Research gap analysis
+    
+    The steps run as a dependency graph: methodology extraction needs only the
+    document, so it runs alongside categorization and findings.
     """
     
-    def __init__(self, llm_model: str = "gpt-4o", temperature: float = 0.3):
-        self.llm = ChatOpenAI(model_name=llm_model, temperature=temperature)
+    # Analysis step (output key) -> steps whose outputs its prompt uses
+    STEP_DEPENDENCIES = {
+        "categorization": [],
+        "methodology_analysis": [],
+        "findings_analysis": ["categorization"],
+        "gap_analysis": ["categorization", "findings_analysis"]
+    }
+    
+    # Characters of document text sent to each analysis prompt
+    TEXT_LIMIT = 8000
+    
+    def __init__(self, llm_model: str = "gpt-4o", temperature: float = 0.0, streaming: bool = None):
+        # Steps stream their JSON, so callers can receive fields as they complete (on_field)
+        if streaming is None:
+            streaming = os.getenv("RESEARCH_CHAIN_STREAMING", "true").lower() == "true"
+        # Responses of unchanged prompts are reused across runs (see memory/llm_cache.py)
+        self.llm = get_gateway().chat_model(llm_model, temperature, streaming=streaming, chain="research_analysis",
+                                            cache=chain_cache("research_analysis", llm_model, temperature))
         self.output_parser = ResearchAnalysisOutputParser()
         
         # Define analysis steps
@@ -180,9 +210,16 @@ class ResearchAnalysisChain:
             output_key="gap_analysis",
             output_parser=self.output_parser
         )
+        
+        self.step_chains = {
+            "categorization": self.categorization_chain,
+            "methodology_analysis": self.methodology_chain,
+            "findings_analysis": self.findings_chain,
+            "gap_analysis": self.gap_analysis_chain
+        }
     
     def _setup_sequential_chain(self):
-        """Setup the main sequential chain"""
+        """Setup the serial chains (reference for the graph execution, see analyze_document)"""
         self.sequential_chain = SequentialChain(
             chains=[
                 self.categorization_chain,
@@ -194,9 +231,111 @@ class ResearchAnalysisChain:
             output_variables=["categorization", "methodology_analysis", "findings_analysis", "gap_analysis"],
             verbose=True
         )
+        
+        # Remaining steps when categorization has already been computed separately
+        self.post_categorization_chain = SequentialChain(
+            chains=[
+                self.methodology_chain,
+                self.findings_chain,
+                self.gap_analysis_chain
+            ],
+            input_variables=["document_text", "title", "categorization"],
+            output_variables=["methodology_analysis", "findings_analysis", "gap_analysis"],
+            verbose=True
+        )
+    
+    @staticmethod
+    def _step_callbacks(step: str, callbacks: List[BaseCallbackHandler] = None,
+                        on_field: FieldCallback = None) -> Optional[List[BaseCallbackHandler]]:
+        """Callbacks of one step call, plus a field reporter when on_field is given"""
+        if on_field is None:
+            return callbacks
+        return list(callbacks or []) + [JSONFieldStreamHandler(step, on_field)]
+    
+    def categorize(self, document_text: str, title: str,
+                   callbacks: List[BaseCallbackHandler] = None,
+                   on_field: FieldCallback = None) -> Dict[str, Any]:
+        """
+        Run only the categorization step
+        
+        Lets callers start work that needs the research type (e.g. quality analysis)
+        before the rest of the research analysis has finished. on_field(step, field, value)
+        receives each categorization field as soon as it has been generated.
+        """
+        result = self.categorization_chain({
+            "document_text": fit_document_text(document_text, self.TEXT_LIMIT, title, callbacks,
+                                               consumer="research_analysis"),
+            "title": title
+        }, callbacks=self._step_callbacks("categorization", callbacks, on_field))
+        return result["categorization"]
+    
+    def run_step(self, step: str, document_text: str, title: str,
+                 previous: Dict[str, Any] = None,
+                 callbacks: List[BaseCallbackHandler] = None,
+                 on_field: FieldCallback = None) -> Any:
+        """
+        Run a single analysis step (one of step_chains) and return its parsed output
+        
+        previous holds the outputs of the step's STEP_DEPENDENCIES. Lets callers
+        checkpoint each step, so a failure in a later step does not repeat earlier calls.
+        """
+        chain = self.step_chains[step]
+        step_input = {
+            **(previous or {}),
+            "document_text": fit_document_text(document_text, self.TEXT_LIMIT, title, callbacks,
+                                               consumer="research_analysis"),
+            "title": title
+        }
+        return chain({key: step_input[key] for key in chain.input_keys},
+                     callbacks=self._step_callbacks(step, callbacks, on_field))[step]
+    
+    def finalize_results(self, results: Dict[str, Any], document_text: str, title: str,
+                         execution: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Add analysis metadata to the combined step outputs"""
+        results["analysis_metadata"] = {
+            "document_title": title,
+            "text_length": len(document_text),
+            "analysis_timestamp": str(logger.handlers[0].formatter.formatTime if logger.handlers else "unknown"),
+            "model_used": self.llm.model_name,
+            "execution": execution or {"mode": "steps"}
+        }
+        return results
+    
+    def _run_analysis_graph(self, chain_input: Dict[str, Any],
+                            callbacks: List[BaseCallbackHandler] = None,
+                            on_field: FieldCallback = None) -> tuple:
+        """
+        Run the analysis steps missing from chain_input as a dependency graph
+        
+        Returns:
+            (results, stage_seconds): chain_input plus every step output, and the
+            duration of each step that ran
+        """
+        stage_seconds = {}
+        
+        def step(output_key):
+            chain = self.step_chains[output_key]
+            def run(inputs):
+                start = time.perf_counter()
+                output = chain(inputs, callbacks=self._step_callbacks(output_key, callbacks, on_field))[output_key]
+                stage_seconds[output_key] = round(time.perf_counter() - start, 3)
+                return output
+            return run
+        
+        graph = StageGraph(max_workers=len(self.step_chains))
+        for output_key, depends_on in self.STEP_DEPENDENCIES.items():
+            if output_key in chain_input:
+                continue
+            graph.add_stage(output_key, step(output_key),
+                            depends_on=[d for d in depends_on if d not in chain_input])
+        
+        return {**chain_input, **graph.run(chain_input)}, stage_seconds
     
     def analyze_document(self, document_text: str, title: str, 
-                        callbacks: List[BaseCallbackHandler] = None) -> Dict[str, Any]:
+                        callbacks: List[BaseCallbackHandler] = None,
+                        categorization: Dict[str, Any] = None,
+                        parallel: bool = True,
+                        on_field: FieldCallback = None) -> Dict[str, Any]:
         """
         Run complete research analysis on a document
         
@@ -204,26 +343,44 @@ class ResearchAnalysisChain:
             document_text: Full text of the academic document
             title: Document title
             callbacks: Optional callback handlers for streaming
+            categorization: Result of categorize(), skips the categorization step if given
+            parallel: Run independent steps concurrently (False runs the serial chain,
+                      same results, kept for timing comparisons)
+            on_field: Called as on_field(step, field, value) for each top-level field of
+                      a step's JSON output as soon as it is generated (graph mode only)
             
         Returns:
             Comprehensive analysis results
         """
         try:
             logger.info(f"Starting research analysis for: {title}")
+            start = time.perf_counter()
             
-            # Run the sequential chain
-            results = self.sequential_chain({
-                "document_text": document_text[:8000],  # Limit text length
+            # Every step still to run sends the document text
+            steps_to_run = len(self.STEP_DEPENDENCIES) - (categorization is not None)
+            chain_input = {
+                # Limit text length (long documents are condensed in map_reduce mode)
+                "document_text": fit_document_text(document_text, self.TEXT_LIMIT, title, callbacks,
+                                                   consumer="research_analysis", calls=steps_to_run),
                 "title": title
-            }, callbacks=callbacks)
-            
-            # Add metadata
-            results["analysis_metadata"] = {
-                "document_title": title,
-                "text_length": len(document_text),
-                "analysis_timestamp": str(logger.handlers[0].formatter.formatTime if logger.handlers else "unknown"),
-                "model_used": self.llm.model_name
             }
+            if categorization is not None:
+                chain_input["categorization"] = categorization
+            
+            stage_seconds = {}
+            if parallel:
+                results, stage_seconds = self._run_analysis_graph(chain_input, callbacks=callbacks,
+                                                                  on_field=on_field)
+            elif categorization is not None:
+                results = self.post_categorization_chain(chain_input, callbacks=callbacks)
+            else:
+                results = self.sequential_chain(chain_input, callbacks=callbacks)
+            
+            self.finalize_results(results, document_text, title, execution={
+                "mode": "graph" if parallel else "sequential",
+                "elapsed_seconds": round(time.perf_counter() - start, 3),
+                "stage_seconds": stage_seconds
+            })
             
             logger.info("Research analysis completed successfully")
             return results
@@ -238,30 +395,62 @@ class ResearchAnalysisChain:
                 }
             }
     
+    def iter_document_analyses(self, documents: List[Dict[str, str]],
+                               callbacks: List[BaseCallbackHandler] = None,
+                               max_concurrency: int = 3) -> Iterator[Dict[str, Any]]:
+        """
+        Analyze documents concurrently and yield each result as soon as it completes
+        
+        At most max_concurrency documents are analyzed at once; their LLM calls also
+        share the gateway's global concurrency limit. A failing document yields an
+        error result and does not stop the others. Every result carries its position
+        in documents as analysis_metadata["document_index"].
+        """
+        logger.info(f"Analyzing {len(documents)} documents (max_concurrency={max_concurrency})")
+        
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+            futures = {}
+            for index, doc in enumerate(documents):
+                # Worker threads inherit the caller's context (e.g. the LLM priority class)
+                context_copy = contextvars.copy_context()
+                future = pool.submit(context_copy.run, self.analyze_document,
+                                     document_text=doc["text"], title=doc["title"], callbacks=callbacks)
+                futures[future] = index
+            
+            for future in as_completed(futures):
+                index = futures[future]
+                title = documents[index].get("title", "")
+                try:
+                    analysis = future.result()
+                except Exception as e:
+                    logger.error(f"Error analyzing document {title}: {e}")
+                    analysis = {
+                        "error": str(e),
+                        "analysis_metadata": {"document_title": title, "failed_at": "research_analysis"}
+                    }
+                analysis.setdefault("analysis_metadata", {})["document_index"] = index
+                logger.info(f"Analyzed document {index + 1}/{len(documents)}: {title}")
+                yield analysis
+    
     def analyze_multiple_documents(self, documents: List[Dict[str, str]], 
-                                 callbacks: List[BaseCallbackHandler] = None) -> List[Dict[str, Any]]:
+                                 callbacks: List[BaseCallbackHandler] = None,
+                                 max_concurrency: int = 3) -> List[Dict[str, Any]]:
         """
         Analyze multiple documents in batch
         
         Args:
             documents: List of {"text": str, "title": str} dictionaries
             callbacks: Optional callback handlers
+            max_concurrency: Number of documents analyzed at the same time
             
         Returns:
-            List of analysis results
+            List of analysis results, in the order of documents
+            (use iter_document_analyses to receive them as they complete)
         """
-        results = []
+        results: List[Optional[Dict[str, Any]]] = [None] * len(documents)
         
-        for i, doc in enumerate(documents):
-            logger.info(f"Analyzing document {i+1}/{len(documents)}: {doc['title']}")
-            
-            analysis = self.analyze_document(
-                document_text=doc["text"],
-                title=doc["title"],
-                callbacks=callbacks
-            )
-            
-            results.append(analysis)
+        for analysis in self.iter_document_analyses(documents, callbacks, max_concurrency):
+            results[analysis["analysis_metadata"]["document_index"]] = analysis
         
         return results
     
@@ -2,12 +2,19 @@
 Writing Assistant Chain - Academic writing and structure improvement system
 Multi-step chain for helping with academic writing tasks
 """
+import contextvars
 import logging
-from typing import Dict, List, Optional, Any
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Optional, Any, Tuple
 from langchain.chains import LLMChain, SequentialChain
 from langchain.prompts import PromptTemplate
 from langchain.schema import BaseOutputParser
-from langchain.chat_models import ChatOpenAI
+from tools.llm_gateway import get_gateway
+from tools.context_packer import TokenCounter
+from memory.llm_cache import chain_cache
 from langchain.callbacks.base import BaseCallbackHandler
 import json
 
@@ -45,6 +52,9 @@ class WritingOutputParser(BaseOutputParser):
             logger.warning(f"Error parsing writing output: {e}")
             return {"raw_output": text}
 
+# Severity order used when overlapping windows report the same issue
+SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2}
+
 class AcademicWritingChain:
     """
     Academic writing assistance chain that helps with:
@@ -55,10 +65,27 @@ class AcademicWritingChain:
     - Conclusion formulation
     """
     
-    def __init__(self, llm_model: str = "gpt-4o", temperature: float = 0.3):
-        self.llm = ChatOpenAI(model_name=llm_model, temperature=temperature)
+    def __init__(self, llm_model: str = "gpt-4o", temperature: float = 0.3,
+                 coherence_window_tokens: int = None, coherence_overlap: int = None,
+                 coherence_max_tokens: int = None, max_workers: int = None):
+        # Responses of unchanged prompts are reused across runs (see memory/llm_cache.py)
+        self.llm = get_gateway().chat_model(llm_model, temperature, chain="academic_writing",
+                                            cache=chain_cache("academic_writing", llm_model, temperature))
         self.output_parser = WritingOutputParser()
         
+        # Windowed coherence checking: tokens per window, paragraphs (or paragraph pieces)
+        # shared by neighbouring windows, the longest text checked in a single call, and
+        # windows checked at the same time
+        self.coherence_window_tokens = coherence_window_tokens or \
+            int(os.getenv("COHERENCE_WINDOW_TOKENS", "1500"))
+        self.coherence_overlap = coherence_overlap if coherence_overlap is not None else \
+            int(os.getenv("COHERENCE_WINDOW_OVERLAP", "2"))
+        if self.coherence_overlap < 0:
+            raise ValueError("Coherence window overlap can not be negative")
+        self.coherence_max_tokens = coherence_max_tokens or int(os.getenv("COHERENCE_SINGLE_CALL_TOKENS", "3000"))
+        self.counter = TokenCounter(llm_model)
+        self.max_workers = max_workers or int(os.getenv("WRITING_MAX_WORKERS", "4"))
+        
         self._setup_writing_chains()
         self._setup_sequential_chain()
         
@@ -207,6 +234,39 @@ class AcademicWritingChain:
             output_key="citation_integration",
             output_parser=self.output_parser
         )
+        
+        # 5. Coherence Window Chain (one window of a long text)
+        coherence_window_prompt = PromptTemplate(
+            input_variables=["paragraphs", "first", "last", "total"],
+            template="""
+            Aşağıda {total} paragraflık bir akademik metnin {first}-{last}. paragrafları numaralı olarak verilmiştir.
+            Bu paragrafları tutarlılık (coherence) açısından analiz et: paragraflar arası geçişler,
+            mantıksal akış, argüman tutarlılığı ve tema birliği.
+
+            {paragraphs}
+
+            Yalnızca gerçek sorunları bildir ve her sorun için ilgili paragraf numaralarını ver.
+            JSON formatında yanıt ver:
+            {{
+                "issues": [
+                    {{
+                        "paragraphs": [{first}],
+                        "type": "transition | logical_flow | argument | theme",
+                        "severity": "low | medium | high",
+                        "issue": "Sorunun açıklaması",
+                        "suggestion": "İyileştirme önerisi"
+                    }}
+                ],
+                "summary": "Bu bölümün tutarlılığına dair kısa değerlendirme"
+            }}
+            """
+        )
+        
+        self.coherence_window_chain = LLMChain(
+            llm=self.llm,
+            prompt=coherence_window_prompt,
+            output_key="coherence_window"
+        )
     
     def _setup_sequential_chain(self):
         """Setup sequential writing assistance chain"""
@@ -278,11 +338,17 @@ class AcademicWritingChain:
             }
     
     def improve_paragraph(self, paragraph: str, context: str = "", 
-                         target_style: str = "academic") -> Dict[str, Any]:
+                         target_style: str = "academic", explain: bool = True,
+                         callbacks: List[BaseCallbackHandler] = None) -> Dict[str, Any]:
         """
         Improve a single paragraph
+        
+        With explain=False the response is only the improved paragraph (no list of
+        changes), so it can replace the original in a document.
         """
         try:
+            instruction = "İyileştirilmiş paragrafı ve değişiklikleri açıkla." if explain else \
+                "Yalnızca iyileştirilmiş paragrafı yaz; açıklama, başlık veya tırnak ekleme."
             improvement_prompt = f"""
             Aşağıdaki paragrafı akademik yazım standartlarına göre iyileştir:
 
@@ -292,16 +358,106 @@ class AcademicWritingChain:
             
             Hedef Stil: {target_style}
 
-            İyileştirilmiş paragrafı ve değişiklikleri açıkla.
+            {instruction}
             """
             
-            response = self.llm.predict(improvement_prompt)
-            return {"improved_paragraph": response}
+            response = self.llm.predict(improvement_prompt, callbacks=callbacks)
+            return {"improved_paragraph": response if explain else response.strip()}
             
         except Exception as e:
             logger.error(f"Error improving paragraph: {e}")
             return {"error": str(e)}
     
+    def iter_improved_paragraphs(self, text: str, context: str = "", target_style: str = "academic",
+                                 max_concurrency: int = None,
+                                 callbacks: List[BaseCallbackHandler] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Improve every paragraph of text concurrently and yield each one as soon as it completes
+        
+        At most max_concurrency paragraphs (default WRITING_MAX_WORKERS) are improved at
+        once. Paragraphs are separated by blank lines; hard line breaks inside one are
+        joined before it is sent. Each paragraph sees its neighbours as context. Results
+        carry the paragraph "index", its "start_char"/"end_char" in text and the
+        "original"; a failed paragraph yields an "error" instead of "improved_paragraph".
+        """
+        paragraphs = self._split_paragraphs(text)
+        max_concurrency = max_concurrency or self.max_workers
+        logger.info(f"Improving {len(paragraphs)} paragraphs (max_concurrency={max_concurrency})")
+        
+        def paragraph_context(index: int) -> str:
+            parts = [context] if context else []
+            if index > 0:
+                parts.append("Önceki paragraf: " + self._unwrap(text[slice(*paragraphs[index - 1])]))
+            if index + 1 < len(paragraphs):
+                parts.append("Sonraki paragraf: " + self._unwrap(text[slice(*paragraphs[index + 1])]))
+            return "\n".join(parts)
+        
+        def improve(index: int) -> Dict[str, Any]:
+            start = time.perf_counter()
+            result = self.improve_paragraph(self._unwrap(text[slice(*paragraphs[index])]), paragraph_context(index),
+                                            target_style, explain=False, callbacks=callbacks)
+            result["seconds"] = round(time.perf_counter() - start, 2)
+            return result
+        
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+            # Worker threads inherit the caller's context (e.g. the LLM priority class)
+            futures = {pool.submit(contextvars.copy_context().run, improve, index): index
+                       for index in range(len(paragraphs))}
+            
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Error improving paragraph {index + 1}: {e}")
+                    result = {"error": str(e)}
+                start_char, end_char = paragraphs[index]
+                yield {"index": index, "start_char": start_char, "end_char": end_char,
+                       "original": text[start_char:end_char], **result}
+    
+    def improve_document(self, text: str, context: str = "", target_style: str = "academic",
+                         max_concurrency: int = None,
+                         callbacks: List[BaseCallbackHandler] = None,
+                         on_paragraph: Callable[[Dict[str, Any]], None] = None) -> Dict[str, Any]:
+        """
+        Improve a whole document paragraph by paragraph
+        
+        Args:
+            text: Document text, paragraphs separated by blank lines
+            context: Optional context shared by all paragraphs (topic, audience, ...)
+            target_style: Target writing style
+            max_concurrency: Paragraphs improved at the same time
+            callbacks: Optional callback handlers for streaming
+            on_paragraph: Called with each paragraph result as soon as it completes
+            
+        Returns:
+            Paragraph results in document order and the improved text (failed
+            paragraphs keep their original text)
+        """
+        start = time.perf_counter()
+        results = []
+        for result in self.iter_improved_paragraphs(text, context, target_style, max_concurrency, callbacks):
+            results.append(result)
+            if on_paragraph is not None:
+                on_paragraph(result)
+        results.sort(key=lambda result: result["index"])
+        
+        # Replace the paragraphs in place, keeping the original separators
+        pieces, position = [], 0
+        for result in results:
+            pieces.append(text[position:result["start_char"]])
+            pieces.append(result.get("improved_paragraph") or result["original"])
+            position = result["end_char"]
+        pieces.append(text[position:])
+        
+        failed = [result["index"] for result in results if "error" in result]
+        return {
+            "improved_text": "".join(pieces),
+            "paragraphs": results,
+            "failed_paragraphs": failed,
+            "seconds": round(time.perf_counter() - start, 2)
+        }
+    
     def generate_outline(self, research_topic: str, main_arguments: List[str]) -> Dict[str, Any]:
         """
         Generate a structured outline for academic writing
@@ -330,10 +486,23 @@ class AcademicWritingChain:
             logger.error(f"Error generating outline: {e}")
             return {"error": str(e)}
     
-    def check_coherence(self, text: str) -> Dict[str, Any]:
+    def check_coherence(self, text: str, windowed: Optional[bool] = None,
+                        callbacks: List[BaseCallbackHandler] = None) -> Dict[str, Any]:
         """
         Check text coherence and provide improvement suggestions
+        
+        Texts longer than COHERENCE_SINGLE_CALL_TOKENS (or any text with windowed=True)
+        are checked in overlapping windows of at most COHERENCE_WINDOW_TOKENS, concurrently,
+        so latency stays about one call regardless of length. Paragraphs longer than a
+        window are split at sentence boundaries. The result then lists the issues with
+        their paragraph numbers and character positions.
         """
+        paragraphs = self._split_paragraphs(text)
+        if windowed is None:
+            windowed = self.counter.count(text) > self.coherence_max_tokens
+        if windowed:
+            return self._check_coherence_windowed(text, paragraphs, callbacks)
+        
         try:
             coherence_prompt = f"""
             Aşağıdaki metni tutarlılık (coherence) açısından analiz et:
@@ -350,9 +519,170 @@ class AcademicWritingChain:
             Detaylı analiz ve öneriler ver.
             """
             
-            response = self.llm.predict(coherence_prompt)
-            return {"coherence_analysis": response}
+            response = self.llm.predict(coherence_prompt, callbacks=callbacks)
+            return {"coherence_analysis": response, "mode": "single"}
             
         except Exception as e:
             logger.error(f"Error checking coherence: {e}")
-            return {"error": str(e)}
\ No newline at end of file
+            return {"error": str(e)}
+    
+    @staticmethod
+    def _split_paragraphs(text: str) -> List[Tuple[int, int]]:
+        """
+        (start, end) character spans of the paragraphs, separated by blank lines
+        
+        Single line breaks stay inside their paragraph: text pasted from a PDF is
+        hard-wrapped, and its lines are fragments of sentences, not paragraphs.
+        """
+        bounds = [0] + [position for match in re.finditer(r"\n\s*\n", text) for position in match.span()]
+        bounds.append(len(text))
+        paragraphs = []
+        for start, end in zip(bounds[::2], bounds[1::2]):
+            chunk = text[start:end]
+            if chunk.strip():
+                paragraphs.append((start + len(chunk) - len(chunk.lstrip()), start + len(chunk.rstrip())))
+        return paragraphs
+    
+    @staticmethod
+    def _unwrap(paragraph: str) -> str:
+        """Paragraph text with its hard line breaks joined into spaces"""
+        return " ".join(line.strip() for line in paragraph.splitlines() if line.strip())
+    
+    def _pack(self, parts: List[str], budget: int) -> List[str]:
+        """Parts joined with spaces into as few pieces as fit in the token budget"""
+        pieces, current = [], ""
+        for part in parts:
+            candidate = f"{current} {part}" if current else part
+            if current and self.counter.count(candidate) > budget:
+                pieces.append(current)
+                candidate = part
+            current = candidate
+        if current:
+            pieces.append(current)
+        return pieces
+    
+    def _paragraph_pieces(self, paragraph: str, budget: int) -> List[str]:
+        """A paragraph as one piece, or split at sentence (then word) boundaries to fit the budget"""
+        if self.counter.count(paragraph) <= budget:
+            return [paragraph]
+        parts = []
+        for sentence in re.split(r"(?<=[.!?…])\s+", paragraph):
+            if self.counter.count(sentence) > budget:
+                parts.extend(self._pack(sentence.split(), budget))
+            elif sentence:
+                parts.append(sentence)
+        return self._pack(parts, budget)
+    
+    def _coherence_windows(self, units: List[Tuple[int, str]]) -> List[Tuple[int, int]]:
+        """
+        Overlapping [first, last) ranges of numbered units, each within the window token budget
+        
+        A window is filled until the next unit would exceed the budget; the next window
+        starts coherence_overlap units before its end, but always at least one unit later.
+        """
+        sizes = [self.counter.count(f"[P{index + 1}] {piece}") + 1 for index, piece in units]
+        windows, first = [], 0
+        while True:
+            last, used = first + 1, sizes[first]
+            while last < len(units) and used + sizes[last] <= self.coherence_window_tokens:
+                used += sizes[last]
+                last += 1
+            windows.append((first, last))
+            if last >= len(units):
+                return windows
+            first = max(first + 1, last - self.coherence_overlap)
+    
+    @staticmethod
+    def _parse_window_issues(raw: str) -> Dict[str, Any]:
+        cleaned = raw.strip()
+        if cleaned.startswith("```"):
+            cleaned = re.sub(r"^```(json)?|```$", "", cleaned).strip()
+        return json.loads(cleaned)
+    
+    def _check_coherence_windowed(self, text: str, paragraphs: List[Tuple[int, int]],
+                                  callbacks: List[BaseCallbackHandler] = None) -> Dict[str, Any]:
+        start_time = time.perf_counter()
+        if not paragraphs:
+            return {"coherence_analysis": "", "issues": [], "mode": "windowed", "paragraphs": 0, "windows": 0}
+        
+        # Paragraphs longer than a window (with room for its label) are checked in pieces
+        budget = max(1, self.coherence_window_tokens - 8)
+        units = [(index, piece) for index, span in enumerate(paragraphs)
+                 for piece in self._paragraph_pieces(self._unwrap(text[slice(*span)]), budget)]
+        unit_windows = self._coherence_windows(units)
+        # The paragraphs each window covers, as [first, last) paragraph indexes
+        windows = [(units[first][0], units[last - 1][0] + 1) for first, last in unit_windows]
+        
+        def check_window(first_unit: int, last_unit: int) -> Dict[str, Any]:
+            numbered = "\n\n".join(f"[P{index + 1}] {piece}" for index, piece in units[first_unit:last_unit])
+            result = self.coherence_window_chain({
+                "paragraphs": numbered,
+                "first": units[first_unit][0] + 1,
+                "last": units[last_unit - 1][0] + 1,
+                "total": len(paragraphs)
+            }, callbacks=callbacks)
+            return self._parse_window_issues(result["coherence_window"])
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(windows)))) as pool:
+            # Window calls inherit the caller's context (e.g. the LLM priority class)
+            futures = [pool.submit(contextvars.copy_context().run, check_window, first, last)
+                       for first, last in unit_windows]
+            outputs = []
+            for (first, last), future in zip(windows, futures):
+                try:
+                    outputs.append(((first, last), future.result(), None))
+                except Exception as e:
+                    logger.error(f"Error checking coherence of paragraphs {first + 1}-{last}: {e}")
+                    outputs.append(((first, last), None, str(e)))
+        
+        # Merge: issues found by both windows of an overlap are reported once, at the higher severity
+        merged: Dict[Tuple, Dict[str, Any]] = {}
+        summaries, failed_windows = [], []
+        for (first, last), output, error in outputs:
+            if error:
+                failed_windows.append({"paragraphs": [first + 1, last], "error": error})
+                continue
+            if output.get("summary"):
+                summaries.append(f"Paragraf {first + 1}-{last}: {output['summary']}")
+            for issue in output.get("issues", []):
+                numbers = sorted({int(n) for n in issue.get("paragraphs", []) if str(n).isdigit()
+                                  and first < int(n) <= last})
+                if not numbers:
+                    continue
+                key = (tuple(numbers), issue.get("type", ""))
+                severity = str(issue.get("severity", "medium")).lower()
+                existing = merged.get(key)
+                if existing and SEVERITY_RANK.get(existing["severity"], 1) >= SEVERITY_RANK.get(severity, 1):
+                    continue
+                merged[key] = {
+                    "paragraphs": numbers,
+                    "start_char": paragraphs[numbers[0] - 1][0],
+                    "end_char": paragraphs[numbers[-1] - 1][1],
+                    "type": issue.get("type", ""),
+                    "severity": severity,
+                    "issue": issue.get("issue", ""),
+                    "suggestion": issue.get("suggestion", "")
+                }
+        
+        issues = sorted(merged.values(), key=lambda issue: (issue["paragraphs"], issue["type"]))
+        analysis = "\n".join(
+            f"- Paragraf {', '.join(str(n) for n in issue['paragraphs'])} [{issue['type']}, {issue['severity']}]: "
+            f"{issue['issue']} Öneri: {issue['suggestion']}"
+            for issue in issues
+        )
+        
+        result = {
+            "coherence_analysis": "\n\n".join(part for part in ["\n".join(summaries), analysis] if part),
+            "issues": issues,
+            "mode": "windowed",
+            "paragraphs": len(paragraphs),
+            "windows": len(windows),
+            "seconds": round(time.perf_counter() - start_time, 2)
+        }
+        if failed_windows:
+            result["failed_windows"] = failed_windows
+            if len(failed_windows) == len(windows):
+                result["error"] = failed_windows[0]["error"]
+        logger.info(f"Coherence checked in {len(windows)} windows of {len(paragraphs)} paragraphs: "
+                    f"{len(issues)} issues in {result['seconds']:.1f}s")
+        return result
@@ -558,6 +558,7 @@ if 'chat_history' not in st.session_state:
 if 'assistant' not in st.session_state:
     try:
         st.session_state.assistant = AdvancedAcademicAssistant()
+        st.session_state.assistant.warm_up(background=True)
         st.session_state.pdf_manager = EnhancedPDFManager()
     except Exception as e:
         st.error(f"Sistem başlatılırken hata oluştu: {e}")
@@ -670,7 +671,7 @@ def main():
                     if selected_pdfs:
                         deleted_count = 0
                         for pdf_name in selected_pdfs:
-                            if st.session_state.pdf_manager.delete_pdf(pdf_name):
+                            if st.session_state.assistant.delete_document(pdf_name):
                                 deleted_count += 1
                         
                         if deleted_count > 0:
@@ -924,6 +925,7 @@ def main():
             if st.button("🔄 Sistem Yenile"):
                 try:
                     st.session_state.assistant = AdvancedAcademicAssistant()
+                    st.session_state.assistant.warm_up(background=True)
                     st.success("Sistem yenilendi!")
                 except Exception as e:
                     st.error(f"Yenileme hatası: {e}")
@@ -13,9 +13,13 @@ Main application file that integrates all components:
 import os
 import sys
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from functools import partial
+from typing import Callable, Dict, List, Optional, Any, Iterator
 import json
 
 # Add project root to Python path
@@ -45,10 +49,17 @@ load_dotenv()
 try:
     from chains.research_chains import ResearchAnalysisChain
     from chains.writing_chains import AcademicWritingChain
-    from chains.analysis_chains import DocumentAnalysisChain
+    from chains.analysis_chains import DocumentAnalysisChain, SINGLE_CALL
+    from chains.executor import StageGraph
+    from chains.checkpoints import CheckpointStore
+    from chains.map_reduce import long_document_mode
     
     from memory.research_memory import ResearchSessionMemory
     from memory.project_memory import ProjectMemory
+    from memory.answer_cache import SemanticAnswerCache
+    from memory.llm_cache import get_llm_cache
+    
+    from analytics.chain_usage import ChainUsageHandler, get_usage_tracker
     
     from tools.pdf_manager import EnhancedPDFManager
     from tools.vector_db import EnhancedVectorDB
@@ -56,8 +67,13 @@ try:
     from tools.reference_tool import ReferenceManagerTool
     from tools.citation_manager import citation_manager
     from tools.article_analyzer import article_analyzer
+    from tools.llm_gateway import get_gateway, llm_priority, INTERACTIVE, BACKGROUND
+    from tools.context_packer import ContextPacker
+    from tools.question_router import QuestionRouter, Route, SYNTHESIS
+    from tools.document_digest import DIGEST, get_document_digester
     
     from streaming.handlers import ResearchStreamingHandler, ProgressTracker
+    from langchain.schema import LLMResult, Generation
     
 except ImportError as e:
     logger.error(f"Error importing components: {e}")
@@ -70,13 +86,33 @@ class AdvancedAcademicAssistant:
     Main class that orchestrates the advanced academic research assistant
     """
     
-    def __init__(self, session_id: str = None):
+    def __init__(self, session_id: str = None, lazy: bool = True):
         self.session_id = session_id or f"session_{int(datetime.now().timestamp())}"
         
+        # Processing results keyed by file hash, reused for duplicate uploads
+        self.results_dir = project_root / 'data' / 'processing_results'
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        # Per-stage outputs of documents still being processed, so failed runs resume
+        self.checkpoints = CheckpointStore(project_root / 'data' / 'checkpoints')
+        
+        # Embedding models and the vector store are used by one document at a time
+        self._index_lock = threading.Lock()
+        
         logger.info(f"Initializing Advanced Academic Assistant - Session: {self.session_id}")
         
-        # Initialize core components
-        self._initialize_components()
+        # Cold-start timing: construction, per-component build times, first interaction
+        self._created_at = time.perf_counter()
+        self.startup_metrics = {
+            "lazy": lazy,
+            "construct_seconds": None,
+            "component_seconds": {},
+            "first_interaction_seconds": None
+        }
+        self._component_locks = {name: threading.Lock() for name in self.COMPONENTS}
+        
+        # Components are built on first access unless eager initialization is requested
+        if not lazy:
+            self._initialize_components()
         
         # Setup streaming
         self.streaming_handler = ResearchStreamingHandler(
@@ -84,28 +120,76 @@ class AdvancedAcademicAssistant:
             ui_callback=self._handle_stream_update
         )
         
-        logger.info("Advanced Academic Assistant initialized successfully")
+        self.startup_metrics["construct_seconds"] = time.perf_counter() - self._created_at
+        logger.info(
+            f"Advanced Academic Assistant initialized successfully "
+            f"in {self.startup_metrics['construct_seconds']:.2f}s (lazy={lazy})"
+        )
+    
+    # Component attribute -> factory, built on first access (see __getattr__)
+    COMPONENTS = {
+        # Memory systems
+        "research_memory": lambda self: ResearchSessionMemory(self.session_id),
+        "project_memory": lambda self: ProjectMemory(),
+        "answer_cache": lambda self: SemanticAnswerCache(),
+        
+        # Document processing
+        "pdf_manager": lambda self: EnhancedPDFManager(),
+        "vector_db": lambda self: EnhancedVectorDB(),
+        "context_packer": lambda self: ContextPacker(),
+        "question_router": lambda self: QuestionRouter(),
+        
+        # Analysis chains
+        "research_chain": lambda self: ResearchAnalysisChain(),
+        "writing_chain": lambda self: AcademicWritingChain(),
+        "analysis_chain": lambda self: DocumentAnalysisChain(),
+        
+        # Academic tools
+        "literature_tool": lambda self: LiteratureSearchTool(),
+        "citation_tool": lambda self: CitationManagerTool(),
+        "reference_tool": lambda self: ReferenceManagerTool()
+    }
+    
+    # Warm-up order: the slowest components (embedding models) first
+    WARM_UP_ORDER = [
+        "vector_db", "pdf_manager", "research_memory", "project_memory", "answer_cache", "context_packer",
+        "question_router",
+        "research_chain", "analysis_chain", "writing_chain",
+        "literature_tool", "citation_tool", "reference_tool"
+    ]
+    
+    def __getattr__(self, name: str):
+        """Build a component on first access"""
+        components = type(self).COMPONENTS
+        if name not in components or "_component_locks" not in self.__dict__:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        return self._get_component(name)
+    
+    def _get_component(self, name: str):
+        """Return a component, building it once even under concurrent access"""
+        if name in self.__dict__:
+            return self.__dict__[name]
+        
+        with self._component_locks[name]:
+            if name not in self.__dict__:
+                start = time.perf_counter()
+                try:
+                    component = self.COMPONENTS[name](self)
+                except Exception as e:
+                    logger.error(f"Error initializing component '{name}': {e}")
+                    raise
+                elapsed = time.perf_counter() - start
+                self.startup_metrics["component_seconds"][name] = elapsed
+                logger.info(f"Component '{name}' initialized in {elapsed:.2f}s")
+                self.__dict__[name] = component
+        
+        return self.__dict__[name]
     
     def _initialize_components(self):
         """Initialize all system components"""
         try:
-            # Memory systems
-            self.research_memory = ResearchSessionMemory(self.session_id)
-            self.project_memory = ProjectMemory()
-            
-            # Document processing
-            self.pdf_manager = EnhancedPDFManager()
-            self.vector_db = EnhancedVectorDB()
-            
-            # Analysis chains
-            self.research_chain = ResearchAnalysisChain()
-            self.writing_chain = AcademicWritingChain()
-            self.analysis_chain = DocumentAnalysisChain()
-            
-            # Academic tools
-            self.literature_tool = LiteratureSearchTool()
-            self.citation_tool = CitationManagerTool()
-            self.reference_tool = ReferenceManagerTool()
+            for name in self.WARM_UP_ORDER:
+                self._get_component(name)
             
             logger.info("All components initialized successfully")
             
@@ -113,28 +197,101 @@ class AdvancedAcademicAssistant:
             logger.error(f"Error initializing components: {e}")
             raise
     
+    def warm_up(self, background: bool = True,
+                components: List[str] = None) -> Optional[threading.Thread]:
+        """
+        Build components ahead of their first use
+        
+        Args:
+            background: Run in a daemon thread so the UI can render meanwhile
+            components: Component names to build (default: all, slowest first)
+            
+        Returns:
+            The warm-up thread when background=True, otherwise None
+        """
+        names = components or self.WARM_UP_ORDER
+        
+        def run():
+            start = time.perf_counter()
+            for name in names:
+                try:
+                    self._get_component(name)
+                except Exception as e:
+                    # Surfaced again on first real access
+                    logger.warning(f"Warm-up of '{name}' failed: {e}")
+            logger.info(f"Warm-up finished in {time.perf_counter() - start:.2f}s")
+        
+        if not background:
+            run()
+            return None
+        
+        thread = threading.Thread(target=run, name=f"warm-up-{self.session_id}", daemon=True)
+        thread.start()
+        return thread
+    
+    def _mark_first_interaction(self):
+        """Record time from construction to the first completed user interaction"""
+        if self.startup_metrics["first_interaction_seconds"] is None:
+            self.startup_metrics["first_interaction_seconds"] = time.perf_counter() - self._created_at
+            logger.info(
+                f"Cold start to first interaction: "
+                f"{self.startup_metrics['first_interaction_seconds']:.2f}s"
+            )
+    
+    def get_startup_metrics(self) -> Dict[str, Any]:
+        """Cold-start timing and which components are built so far"""
+        metrics = dict(self.startup_metrics)
+        metrics["component_seconds"] = dict(self.startup_metrics["component_seconds"])
+        metrics["initialized_components"] = [name for name in self.COMPONENTS if name in self.__dict__]
+        return metrics
+    
     def _handle_stream_update(self, update: Dict[str, Any]):
         """Handle streaming updates (can be overridden by UI)"""
         timestamp = update.get('timestamp', datetime.now().isoformat())
         message = update.get('message', '')
         
+        # Streamed answer text is printed inline as it arrives
+        if update.get('type') == 'token_stream':
+            print(update.get('content', ''), end='', flush=True)
+            return
+        
         # Simple console output - will be replaced by Streamlit UI
         print(f"[{timestamp[:19]}] {message}")
     
-    def process_document(self, pdf_path: str, project_id: str = None) -> Dict[str, Any]:
+    def process_document(self, pdf_path: str, project_id: str = None,
+                         on_field: Callable[[str, str, Any], None] = None) -> Dict[str, Any]:
         """
         Process a PDF document through the complete analysis pipeline
         
+        Its LLM calls run in the background priority class, so questions asked
+        meanwhile are admitted by the LLM gateway ahead of queued analysis calls.
+        
         Args:
             pdf_path: Path to PDF file
             project_id: Optional project ID to associate document with
+            on_field: Called as on_field(step, field, value) with each research analysis
+                      field as soon as it is generated (e.g. categorization.research_type),
+                      from worker threads
             
         Returns:
             Comprehensive processing results
         """
+        with llm_priority(BACKGROUND):
+            return self._process_document(pdf_path, project_id, on_field)
+    
+    def _process_document(self, pdf_path: str, project_id: str = None,
+                          on_field: Callable[[str, str, Any], None] = None) -> Dict[str, Any]:
+        """Pipeline body of process_document"""
         try:
             logger.info(f"Processing document: {pdf_path}")
             
+            # Same content already processed (possibly under another name) - reuse everything
+            file_hash = self.pdf_manager.get_file_hash(pdf_path)
+            cached_results = self._load_reusable_results(file_hash)
+            if cached_results:
+                logger.info(f"Duplicate document {pdf_path}, reusing results of {cached_results.get('document_path')}")
+                return self._reuse_processing_results(cached_results, pdf_path, project_id)
+            
             # Setup progress tracking
             tracker = ProgressTracker("Document Processing")
             tracker.add_stage("PDF Text Extraction", 10)
@@ -145,11 +302,25 @@ class AdvancedAcademicAssistant:
             
             results = {"document_path": pdf_path, "processing_stages": {}}
             
+            # Completed stages of an earlier, interrupted run are reused
+            checkpoints = self.checkpoints.for_document(file_hash) if file_hash else None
+            if checkpoints is not None:
+                checkpoints.start(pdf_path, ["extraction"])
+            
             # Stage 1: Extract text and metadata
             tracker.start_stage("PDF Text Extraction")
-            text, metadata = self.pdf_manager.process_pdf(pdf_path)
+            found, extraction = checkpoints.load("extraction") if checkpoints else (False, None)
+            if found:
+                text, metadata = extraction["text"], extraction["metadata"]
+            else:
+                text, metadata = self.pdf_manager.process_pdf(pdf_path)
+                if text and checkpoints is not None:
+                    checkpoints.save("extraction", {"text": text, "metadata": metadata})
             
             if not text:
+                # Nothing was checkpointed; the document must not stay listed as partially processed
+                if checkpoints is not None:
+                    checkpoints.clear()
                 return {"error": "Failed to extract text from PDF"}
             
             results["processing_stages"]["extraction"] = {
@@ -159,44 +330,35 @@ class AdvancedAcademicAssistant:
             }
             tracker.complete_stage("PDF Text Extraction")
             
-            # Stage 2: Add to vector database
-            tracker.start_stage("Vector Indexing")
-            pdf_name = Path(pdf_path).name
-            self.vector_db.add_document(text, metadata, pdf_name)
+            # With LONG_DOCUMENT_MODE=digest every analysis prompt gets one shared
+            # extractive digest, built here once and stored by file hash
+            if long_document_mode() == DIGEST:
+                get_document_digester().build(text, file_hash=file_hash)
             
-            results["processing_stages"]["indexing"] = {
-                "success": True,
-                "pdf_name": pdf_name
-            }
-            tracker.complete_stage("Vector Indexing")
-            
-            # Stage 3: Research analysis
-            tracker.start_stage("Research Analysis")
-            research_analysis = self.research_chain.analyze_document(
-                text, 
-                metadata.get('title', 'Unknown Title'),
-                callbacks=[self.streaming_handler]
-            )
+            # Stages 2-4: vector indexing, research analysis and quality analysis run
+            # concurrently, each as soon as its inputs are ready
+            pdf_name = Path(pdf_path).name
+            usage = ChainUsageHandler(document=pdf_name)
+            stage_outputs = self._run_analysis_stages(text, metadata, pdf_name, tracker, checkpoints,
+                                                      on_field, usage)
             
+            results["processing_stages"]["indexing"] = stage_outputs["indexing"]
+            research_analysis = stage_outputs["research_analysis"]
             results["processing_stages"]["research_analysis"] = research_analysis
-            tracker.complete_stage("Research Analysis")
-            
-            # Stage 4: Quality analysis
-            tracker.start_stage("Quality Analysis")
-            document_data = {
-                "text": text,
-                "title": metadata.get('title', 'Unknown Title'),
-                "abstract": "",  # Could extract from text
-                "research_type": research_analysis.get("categorization", {}).get("research_type", "Unknown")
-            }
-            
-            quality_analysis = self.analysis_chain.analyze_document(
-                document_data,
-                callbacks=[self.streaming_handler]
-            )
-            
-            results["processing_stages"]["quality_analysis"] = quality_analysis
-            tracker.complete_stage("Quality Analysis")
+            # Heuristic metadata leaves the research field empty; the categorization fills it
+            categorization = research_analysis.get("categorization", {})
+            if self.pdf_manager.apply_research_categorization(pdf_name, categorization):
+                for field in ("research_field", "research_type"):
+                    if not metadata.get(field) and categorization.get(field):
+                        metadata[field] = categorization[field]
+            results["processing_stages"]["quality_analysis"] = stage_outputs["quality_analysis"]
+            if long_document_mode() == DIGEST:
+                results["processing_stages"]["digest"] = get_document_digester().report(text)
+            # Tokens, latency and cache status of this document's LLM calls per chain step
+            results["usage"] = usage.report()
+            logger.info(f"LLM usage for {pdf_name}: {results['usage']['calls']} calls, "
+                        f"{results['usage']['prompt_tokens']}+{results['usage']['completion_tokens']} tokens, "
+                        f"slowest steps {results['usage']['slowest_steps']}")
             
             # Stage 5: Update memory systems
             tracker.start_stage("Memory Integration")
@@ -233,8 +395,24 @@ class AdvancedAcademicAssistant:
             # Generate summary
             results["summary"] = self._generate_processing_summary(results)
             results["processing_complete"] = True
+            results["file_hash"] = file_hash
+            
+            if checkpoints is not None and checkpoints.restored:
+                results["resumed_stages"] = list(checkpoints.restored)
+            
+            failed_stages = [name for name, output in stage_outputs.items()
+                             if isinstance(output, dict) and "error" in output]
+            if failed_stages:
+                # Keep the checkpoints: a re-run only repeats the failed stages
+                results["failed_stages"] = failed_stages
+                logger.warning(f"Document {pdf_name} has failed stages {failed_stages}; re-run to resume")
+            else:
+                self._save_processing_results(file_hash, results)
+                if checkpoints is not None:
+                    checkpoints.clear()
             
             logger.info(f"Document processing completed: {pdf_name}")
+            self._mark_first_interaction()
             return results
             
         except Exception as e:
@@ -242,6 +420,281 @@ class AdvancedAcademicAssistant:
             logger.error(error_msg)
             return {"error": error_msg, "processing_complete": False}
     
+    def process_documents(self, pdf_paths: List[str], max_concurrency: int = 3,
+                          project_id: str = None,
+                          on_field: Callable[[str, str, str, Any], None] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Process several PDFs with their stages pipelined across documents
+        
+        Up to max_concurrency documents are in flight, so extraction of one document
+        overlaps embedding and LLM analysis of others. LLM requests of all documents share
+        the LLM gateway's global concurrency limit and vector indexing runs one document at a time.
+        
+        Args:
+            pdf_paths: Paths of the PDF files to process
+            max_concurrency: Number of documents processed at the same time
+            project_id: Optional project ID to associate documents with
+            on_field: Called as on_field(pdf_path, step, field, value) with research analysis
+                      fields as soon as they are generated, from worker threads
+            
+        Yields:
+            Per-document results (as returned by process_document) in completion order
+        """
+        logger.info(f"Batch processing {len(pdf_paths)} documents (max_concurrency={max_concurrency})")
+        
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+            futures = {
+                pool.submit(self.process_document, pdf_path, project_id,
+                            partial(on_field, pdf_path) if on_field else None): pdf_path
+                for pdf_path in pdf_paths
+            }
+            
+            for future in as_completed(futures):
+                pdf_path = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"error": f"Error processing document: {e}", "processing_complete": False}
+                result.setdefault("document_path", pdf_path)
+                yield result
+    
+    def _run_analysis_stages(self, text: str, metadata: Dict[str, Any], pdf_name: str,
+                             tracker: ProgressTracker, checkpoints=None,
+                             on_field: Callable[[str, str, Any], None] = None,
+                             usage: ChainUsageHandler = None) -> Dict[str, Any]:
+        """
+        Run indexing, research analysis and quality analysis as a dependency graph
+        
+        Only categorization gates other work: the quality methodology step needs its
+        research type and the remaining research steps need the categorization itself.
+        Indexing, research methodology and the other three quality steps start right after
+        extraction, so the critical path drops from 8 sequential LLM calls to 3
+        (categorization -> findings -> gap analysis).
+        
+        With checkpoints, stages finished by an earlier run are restored, not re-run. Every
+        LLM step is its own stage, so a re-run after a failure repeats only the failed calls.
+        The usage handler records every LLM call of the stages (restored stages make none).
+        The session streaming handler is not attached: the steps run and stream concurrently,
+        and their fields are reported per step through on_field instead.
+        """
+        title = metadata.get('title') or 'Unknown Title'
+        callbacks = [usage] if usage else []
+        
+        document_data = {
+            "text": text,
+            "title": title,
+            "abstract": "",  # Could extract from text
+            "research_type": "Unknown"
+        }
+        
+        def analysis_input():
+            # Built inside the stages: with LONG_DOCUMENT_MODE=map_reduce this condenses the
+            # full text once (shared with categorization) while indexing already runs
+            return self.analysis_chain.prepare_input(document_data, callbacks=callbacks)
+        
+        def index_document(inputs):
+            with self._index_lock:
+                self.vector_db.add_document(text, metadata, pdf_name)
+            # Answers built on an earlier version of this PDF are stale
+            self.answer_cache.invalidate([pdf_name])
+            return {"success": True, "pdf_name": pdf_name}
+        
+        def categorize(inputs):
+            try:
+                return self.research_chain.categorize(text, title, callbacks=callbacks, on_field=on_field)
+            except Exception as e:
+                logger.error(f"Error in research categorization: {e}")
+                return {"error": str(e)}
+        
+        # The research steps after categorization, each checkpointed on its own so a
+        # failing step does not repeat the calls of the steps that succeeded
+        research_steps = [step for step in self.research_chain.STEP_DEPENDENCIES if step != "categorization"]
+        
+        def research_stage(step):
+            return step if step == "categorization" else f"research:{step}"
+        
+        def research_step(step):
+            dependencies = self.research_chain.STEP_DEPENDENCIES[step]
+            def run(inputs):
+                previous = {dependency: inputs[research_stage(dependency)] for dependency in dependencies}
+                failed = [output for output in previous.values() if isinstance(output, dict) and "error" in output]
+                if failed:
+                    return {"error": failed[0]["error"]}
+                try:
+                    return self.research_chain.run_step(step, text, title, previous,
+                                                        callbacks=callbacks, on_field=on_field)
+                except Exception as e:
+                    logger.error(f"Error in research analysis step {step}: {e}")
+                    return {"error": str(e)}
+            return run
+        
+        def research_analysis(inputs):
+            step_results = {step: inputs[research_stage(step)] for step in self.research_chain.STEP_DEPENDENCIES}
+            errors = [r["error"] for r in step_results.values() if isinstance(r, dict) and "error" in r]
+            if errors:
+                return {
+                    "error": errors[0],
+                    "analysis_metadata": {"document_title": title, "failed_at": "research_analysis"}
+                }
+            return self.research_chain.finalize_results({"title": title, **step_results}, text, title)
+        
+        def with_research_type(inputs):
+            categorization = inputs["categorization"]
+            research_type = categorization.get("research_type", "Unknown") if isinstance(categorization, dict) else "Unknown"
+            return {**analysis_input(), "research_type": research_type}
+        
+        def quality_step(step):
+            def run(inputs):
+                try:
+                    if step in self.analysis_chain.RESEARCH_TYPE_STEPS:
+                        step_input = with_research_type(inputs)
+                    else:
+                        step_input = analysis_input()
+                    return self.analysis_chain.run_step(step, step_input, callbacks=callbacks)
+                except Exception as e:
+                    logger.error(f"Error in quality analysis step {step}: {e}")
+                    return {"error": str(e)}
+            return run
+        
+        def structured_quality(inputs):
+            try:
+                return self.analysis_chain.run_structured(with_research_type(inputs), callbacks=callbacks)
+            except Exception as e:
+                logger.error(f"Error in single-call quality analysis: {e}")
+                return {"error": str(e)}
+        
+        # Single-call mode asks for all four assessments in one request
+        single_call = self.analysis_chain.mode == SINGLE_CALL
+        quality_steps = ["structured"] if single_call else list(self.analysis_chain.step_chains)
+        
+        def quality_analysis(inputs):
+            if single_call:
+                structured = inputs["quality:structured"]
+                step_results = {"structured": structured} if "error" in structured else structured
+            else:
+                step_results = {step: inputs[f"quality:{step}"] for step in quality_steps}
+            errors = [r["error"] for r in step_results.values() if isinstance(r, dict) and "error" in r]
+            if errors:
+                return {
+                    "error": errors[0],
+                    "analysis_metadata": {"document_title": title, "failed_at": "comprehensive_analysis"}
+                }
+            return self.analysis_chain.finalize_results(step_results, document_data)
+        
+        graph = StageGraph(
+            max_workers=len(quality_steps) + len(research_steps) + 2,
+            on_group_start=tracker.start_stage,
+            on_group_complete=tracker.complete_stage
+        )
+        graph.add_stage("indexing", index_document, group="Vector Indexing")
+        graph.add_stage("categorization", categorize, group="Research Analysis")
+        for step in research_steps:
+            graph.add_stage(research_stage(step), research_step(step), group="Research Analysis",
+                            depends_on=[research_stage(d) for d in self.research_chain.STEP_DEPENDENCIES[step]])
+        graph.add_stage("research_analysis", research_analysis,
+                        depends_on=[research_stage(step) for step in self.research_chain.STEP_DEPENDENCIES],
+                        group="Research Analysis")
+        if single_call:
+            graph.add_stage("quality:structured", structured_quality,
+                            depends_on=["categorization"], group="Quality Analysis")
+        else:
+            for step in quality_steps:
+                depends_on = ["categorization"] if step in self.analysis_chain.RESEARCH_TYPE_STEPS else []
+                graph.add_stage(f"quality:{step}", quality_step(step), depends_on=depends_on, group="Quality Analysis")
+        graph.add_stage("quality_analysis", quality_analysis,
+                        depends_on=[f"quality:{step}" for step in quality_steps], group="Quality Analysis")
+        
+        if checkpoints is not None:
+            checkpoints.expect(list(graph.stages))
+        
+        return graph.run(checkpoints=checkpoints)
+    
+    def _load_processing_results(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        """Load stored processing results for a file hash"""
+        if not file_hash:
+            return None
+        try:
+            results_file = self.results_dir / f"{file_hash}.json"
+            if results_file.exists():
+                with open(results_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading processing results for {file_hash}: {e}")
+        return None
+    
+    def _load_reusable_results(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Stored results for a file hash, only while the document is still in the library
+        and its chunks are still in the vector store (a deleted and re-uploaded document
+        must be indexed again)
+        """
+        cached_results = self._load_processing_results(file_hash)
+        if not cached_results:
+            return None
+        
+        if self.pdf_manager.find_pdf_by_hash(file_hash) is None:
+            logger.info(f"Stored results for {file_hash} ignored: document no longer in the library")
+            return None
+        indexing = cached_results.get("processing_stages", {}).get("indexing", {})
+        indexed_name = indexing.get("pdf_name") or Path(cached_results.get("document_path", "")).name
+        with self._index_lock:
+            indexed = self.vector_db.has_document(indexed_name)
+        if not indexed:
+            logger.info(f"Stored results for {file_hash} ignored: {indexed_name} is not in the vector store")
+            return None
+        return cached_results
+    
+    def _save_processing_results(self, file_hash: str, results: Dict[str, Any]):
+        """Persist processing results so duplicate uploads can reuse them"""
+        if not file_hash:
+            return
+        try:
+            with open(self.results_dir / f"{file_hash}.json", 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False, default=str)
+        except Exception as e:
+            logger.error(f"Error saving processing results for {file_hash}: {e}")
+    
+    def delete_document(self, pdf_name: str) -> bool:
+        """Remove a document from the vector store, the answer cache, its stored results and the library"""
+        try:
+            file_hashes = self.pdf_manager.get_file_hashes(pdf_name)
+            with self._index_lock:
+                self.vector_db.delete_document(pdf_name)
+            self.answer_cache.invalidate([pdf_name])
+            
+            for file_hash in file_hashes:
+                results_file = self.results_dir / f"{file_hash}.json"
+                if results_file.exists():
+                    results_file.unlink()
+                self.checkpoints.for_document(file_hash).clear()
+            
+            return self.pdf_manager.delete_pdf(pdf_name)
+            
+        except Exception as e:
+            logger.error(f"Error deleting document {pdf_name}: {e}")
+            return False
+    
+    def _reuse_processing_results(self, cached_results: Dict[str, Any], pdf_path: str,
+                                  project_id: str = None) -> Dict[str, Any]:
+        """Build the result of a duplicate upload from the original document's results"""
+        results = dict(cached_results)
+        results["document_path"] = pdf_path
+        results["duplicate_of"] = cached_results.get("document_path")
+        results["reused_existing_results"] = True
+        
+        if project_id:
+            metadata = results.get("processing_stages", {}).get("extraction", {}).get("metadata", {})
+            research_analysis = results.get("processing_stages", {}).get("research_analysis", {})
+            self.project_memory.add_resource(
+                project_id=project_id,
+                name=metadata.get('title') or Path(pdf_path).name,
+                resource_type="pdf",
+                path=pdf_path,
+                summary=research_analysis.get("categorization", {}).get("research_field", "")
+            )
+        
+        return results
+    
     def ask_question(self, question: str, pdf_names: List[str] = None, 
                     use_memory: bool = True) -> Dict[str, Any]:
         """
@@ -258,60 +711,40 @@ class AdvancedAcademicAssistant:
         try:
             logger.info(f"Processing question: {question}")
             
-            # Search relevant documents
-            documents, metadatas = self.vector_db.search_documents(
-                query=question,
-                pdf_names=pdf_names,
-                top_k=5
+            documents, metadatas, enhanced_question, query_embedding = self._prepare_question(
+                question, pdf_names, use_memory
             )
             
             if not documents:
-                return {
-                    "answer": "İlgili dokumanlarda bu soruya yanıt bulunamadı.",
-                    "sources": [],
-                    "confidence": "low"
-                }
+                return self._no_documents_answer()
             
-            # Get memory context if requested
-            memory_context = ""
-            if use_memory:
-                memory_context = self.research_memory.get_contextual_prompt_addition()
+            cached = self._lookup_cached_answer(query_embedding, documents, metadatas)
+            if cached:
+                result = self._finish_question(question, cached["result"]["answer"],
+                                               cached["result"]["sources"], documents, use_memory)
+                result["cache"] = self._cache_info(cached)
+                self._mark_first_interaction()
+                return result
             
-            # Enhanced prompt with context
-            enhanced_question = question + memory_context
+            # Simple lookups go to a smaller model, synthesis questions to the large one
+            route = self.question_router.route(question)
             
             # Generate enhanced answer with citations
+            start = time.perf_counter()
             answer, citations = self._generate_enhanced_answer(
                 question=enhanced_question,
                 documents=documents,
-                metadatas=metadatas
+                metadatas=metadatas,
+                route=route
             )
+            self._store_cached_answer(question, query_embedding, documents, metadatas,
+                                      answer, citations, time.perf_counter() - start)
             
-            # Add to memory
-            if use_memory:
-                context_data = {
-                    "question": question,
-                    "finding": answer[:200],
-                    "topics": [question.split()[0] if question.split() else "general"]
-                }
-                
-                self.research_memory.add_interaction(
-                    user_input=question,
-                    ai_response=answer,
-                    context_data=context_data
-                )
-            
-            result = {
-                "answer": answer,
-                "sources": citations,
-                "documents_searched": len(documents),
-                "confidence": "high",
-                "memory_used": use_memory,
-                "question_timestamp": datetime.now().isoformat(),
-                "citations": citations
-            }
+            result = self._finish_question(question, answer, citations, documents, use_memory)
+            result["route"] = self._route_info(route)
             
             logger.info(f"Question answered successfully")
+            self._mark_first_interaction()
             return result
             
         except Exception as e:
@@ -319,6 +752,181 @@ class AdvancedAcademicAssistant:
             logger.error(error_msg)
             return {"error": error_msg}
     
+    def ask_question_stream(self, question: str, pdf_names: List[str] = None,
+                            use_memory: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of ask_question
+        
+        Yields {"type": "token", "content": ...} events as the answer is generated,
+        followed by one {"type": "result", "result": ...} event carrying the same
+        result dict as ask_question (sources, confidence, ...) plus streaming timings.
+        Tokens are also reported to the ResearchStreamingHandler.
+        """
+        try:
+            logger.info(f"Processing question (streaming): {question}")
+            start = time.perf_counter()
+            
+            documents, metadatas, enhanced_question, query_embedding = self._prepare_question(
+                question, pdf_names, use_memory
+            )
+            
+            if not documents:
+                result = self._no_documents_answer()
+                yield {"type": "token", "content": result["answer"]}
+                yield {"type": "result", "result": result}
+                return
+            
+            cached = self._lookup_cached_answer(query_embedding, documents, metadatas)
+            if cached:
+                result = self._finish_question(question, cached["result"]["answer"],
+                                               cached["result"]["sources"], documents, use_memory)
+                result["cache"] = self._cache_info(cached)
+                self._mark_first_interaction()
+                yield {"type": "token", "content": result["answer"]}
+                yield {"type": "result", "result": result}
+                return
+            
+            route = self.question_router.route(question)
+            messages, citations = self._build_answer_messages(enhanced_question, documents, metadatas, route)
+            
+            parts = []
+            first_token_at = None
+            generation_start = time.perf_counter()
+            stream_status = {}
+            for token in self._stream_enhanced_answer(messages, metadatas, stream_status, route):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(token)
+                yield {"type": "token", "content": token}
+            
+            answer = "".join(parts)
+            if stream_status.get("complete"):
+                self._store_cached_answer(question, query_embedding, documents, metadatas,
+                                          answer, citations, time.perf_counter() - generation_start)
+            
+            result = self._finish_question(question, answer, citations, documents, use_memory)
+            result["route"] = self._route_info(route)
+            result["streaming"] = {
+                "time_to_first_token": (first_token_at - start) if first_token_at else None,
+                "total_seconds": time.perf_counter() - start
+            }
+            
+            logger.info(f"Question answered successfully (streaming)")
+            self._mark_first_interaction()
+            yield {"type": "result", "result": result}
+            
+        except Exception as e:
+            error_msg = f"Error answering question: {e}"
+            logger.error(error_msg)
+            yield {"type": "result", "result": {"error": error_msg}}
+    
+    def _prepare_question(self, question: str, pdf_names: List[str] = None,
+                          use_memory: bool = True) -> tuple:
+        """Retrieve relevant chunks and add memory context to the question"""
+        # The query embedding is shared by the search and the answer cache
+        query_embedding = self.vector_db.embed_query(question)
+        
+        # Search relevant documents
+        documents, metadatas = self.vector_db.search_documents(
+            query=question,
+            pdf_names=pdf_names,
+            top_k=5,
+            query_embedding=query_embedding
+        )
+        
+        # Get memory context if requested
+        memory_context = ""
+        if documents and use_memory:
+            memory_context = self.research_memory.get_contextual_prompt_addition()
+        
+        # Enhanced prompt with context
+        return documents, metadatas, question + memory_context, query_embedding
+    
+    def _lookup_cached_answer(self, query_embedding: List[float], documents: List[str],
+                              metadatas: List[Dict]) -> Optional[Dict[str, Any]]:
+        """Cached answer for a similar question over the same retrieved chunks"""
+        if not self.vector_db.has_semantic_embeddings:
+            # Hash-based fallback embeddings make every question look identical
+            return None
+        
+        chunk_ids = [meta.get('chunk_ref', '') for meta in metadatas]
+        cached = self.answer_cache.lookup(query_embedding, chunk_ids, documents)
+        if cached:
+            logger.info(
+                f"Answer cache hit (similarity {cached['similarity']:.3f}, "
+                f"saved {cached['saved_seconds']:.1f}s): {cached['cached_question']}"
+            )
+        return cached
+    
+    def _store_cached_answer(self, question: str, query_embedding: List[float],
+                             documents: List[str], metadatas: List[Dict], answer: str,
+                             citations: List[Dict], generation_seconds: float):
+        """Cache a freshly generated answer (never the fallback text)"""
+        if not self.vector_db.has_semantic_embeddings or answer == self._fallback_answer(metadatas):
+            return
+        
+        self.answer_cache.store(
+            question=question,
+            query_embedding=query_embedding,
+            chunk_ids=[meta.get('chunk_ref', '') for meta in metadatas],
+            chunk_texts=documents,
+            pdf_names=[meta.get('pdf_name', '') for meta in metadatas],
+            result={"answer": answer, "sources": citations},
+            generation_seconds=generation_seconds
+        )
+    
+    def _cache_info(self, cached: Dict[str, Any]) -> Dict[str, Any]:
+        """Cache details attached to an answer served from the cache"""
+        return {
+            "hit": True,
+            "similarity": round(cached["similarity"], 4),
+            "cached_question": cached["cached_question"],
+            "saved_seconds": round(cached["saved_seconds"], 2)
+        }
+    
+    def _route_info(self, route: Route) -> Dict[str, Any]:
+        """Route details attached to a generated answer"""
+        return {"name": route.name, "model": route.model, "max_tokens": route.max_tokens}
+    
+    def _default_route(self) -> Route:
+        """Route of callers that do not classify the question: the full synthesis settings"""
+        return self.question_router.routes[SYNTHESIS]
+    
+    def _no_documents_answer(self) -> Dict[str, Any]:
+        """Answer returned when retrieval finds nothing"""
+        return {
+            "answer": "İlgili dokumanlarda bu soruya yanıt bulunamadı.",
+            "sources": [],
+            "confidence": "low"
+        }
+    
+    def _finish_question(self, question: str, answer: str, citations: List[Dict],
+                         documents: List[str], use_memory: bool) -> Dict[str, Any]:
+        """Record the interaction in memory and build the answer result"""
+        # Add to memory
+        if use_memory:
+            context_data = {
+                "question": question,
+                "finding": answer[:200],
+                "topics": [question.split()[0] if question.split() else "general"]
+            }
+            
+            self.research_memory.add_interaction(
+                user_input=question,
+                ai_response=answer,
+                context_data=context_data
+            )
+        
+        return {
+            "answer": answer,
+            "sources": citations,
+            "documents_searched": len(documents),
+            "confidence": "high",
+            "memory_used": use_memory,
+            "question_timestamp": datetime.now().isoformat(),
+            "citations": citations
+        }
+    
     def search_literature(self, query: str) -> Dict[str, Any]:
         """Search academic literature using the literature tool"""
         try:
@@ -351,17 +959,53 @@ class AdvancedAcademicAssistant:
             logger.error(f"Reference management error: {e}")
             return {"error": str(e)}
     
+    def get_system_status(self) -> Dict[str, Any]:
+        """Component, LLM and document processing status of the assistant"""
+        try:
+            processed = len(list(self.results_dir.glob("*.json")))
+            partial = self.checkpoints.list_partial()
+            
+            return {
+                "session_id": self.session_id,
+                "timestamp": datetime.now().isoformat(),
+                "startup": self.get_startup_metrics(),
+                "llm": get_gateway().get_stats(),
+                "answer_cache": self.answer_cache.get_stats() if "answer_cache" in self.__dict__ else None,
+                "routing": self.question_router.get_stats() if "question_router" in self.__dict__ else None,
+                "metadata_extraction": (self.pdf_manager.get_metadata_source_counts()
+                                        if "pdf_manager" in self.__dict__ else None),
+                "llm_cache": get_llm_cache().get_stats(),
+                "long_document_mode": long_document_mode(),
+                "document_digest": get_document_digester().get_stats(),
+                "chain_usage": get_usage_tracker().get_stats(),
+                "documents": {
+                    "processed": processed,
+                    "partially_processed_count": len(partial),
+                    "partially_processed": partial
+                }
+            }
+            
+        except Exception as e:
+            logger.error(f"Error getting system status: {e}")
+            return {"error": str(e)}
+    
     def get_research_summary(self) -> Dict[str, Any]:
         """Get comprehensive research session summary"""
         try:
             research_summary = self.research_memory.get_research_summary()
             project_analytics = self.project_memory.get_global_analytics()
-            vector_stats = self.vector_db.get_document_stats()
+            # Do not force the embedding models to load just to render a summary
+            if "vector_db" in self.__dict__:
+                vector_stats = self.vector_db.get_document_stats()
+            else:
+                vector_stats = {"status": "loading"}
             
             summary = {
                 "session_summary": research_summary,
                 "project_analytics": project_analytics,
                 "document_stats": vector_stats,
+                "startup": self.get_startup_metrics(),
+                "answer_cache": self.answer_cache.get_stats(),
                 "capabilities": {
                     "document_processing": True,
                     "literature_search": True,
@@ -377,35 +1021,48 @@ class AdvancedAcademicAssistant:
             logger.error(f"Error generating research summary: {e}")
             return {"error": str(e)}
     
-    def _generate_enhanced_answer(self, question: str, documents: List[str], 
-                                metadatas: List[Dict]) -> tuple[str, List[Dict]]:
+    def _build_answer_messages(self, question: str, documents: List[str],
+                               metadatas: List[Dict], route: Route = None) -> tuple:
         """
-        Generate enhanced answer with proper APA7 citations
+        Build the chat messages for an answer with APA7 citations
+        
+        Concise routes (lookups) get a short direct-answer prompt instead of the
+        multi-paragraph academic one.
+        
+        Returns:
+            (messages, citations_data)
         """
-        try:
-            from openai import OpenAI
-            
-            # Prepare context
-            context = "\n\n".join(documents)
-            
-            # Create in-text citations
-            in_text_citations = []
-            citations_data = []
-            
-            for meta in metadatas:
-                pdf_name = meta.get('pdf_name', 'Unknown')
-                if pdf_name != 'Unknown':
-                    citation = citation_manager.create_in_text_citation(pdf_name, meta)
-                    in_text_citations.append(citation)
-                    citations_data.append({
-                        'pdf_name': pdf_name,
-                        'metadata': meta
-                    })
-            
-            citations_text = ", ".join(set(in_text_citations)) if in_text_citations else ""
-            
-            # Enhanced academic prompt
-            prompt = f"""Sen bir akademik araştırma uzmanısın. Aşağıdaki soru ve bağlam bilgisine göre MUTLAKA ŞU KURALLARA UYARAK detaylı bir akademik yanıt oluştur:
+        route = route or self._default_route()
+        
+        # Fit the retrieved chunks into the context token budget
+        packed = self.context_packer.pack(documents, metadatas, max_tokens=route.context_tokens)
+        
+        # Prepare context
+        context = "\n\n".join(packed["documents"])
+        
+        # Create in-text citations
+        in_text_citations = []
+        citations_data = []
+        
+        for meta in packed["metadatas"]:
+            pdf_name = meta.get('pdf_name', 'Unknown')
+            if pdf_name != 'Unknown':
+                citation = citation_manager.create_in_text_citation(pdf_name, meta)
+                in_text_citations.append(citation)
+                citations_data.append({
+                    'pdf_name': pdf_name,
+                    'metadata': meta
+                })
+        
+        citations_text = ", ".join(set(in_text_citations)) if in_text_citations else ""
+        
+        if route.concise:
+            messages = self._concise_answer_messages(question, context, citations_text)
+            self._log_answer_prompt(messages, packed, documents)
+            return messages, citations_data
+        
+        # Enhanced academic prompt
+        prompt = f"""Sen bir akademik araştırma uzmanısın. Aşağıdaki soru ve bağlam bilgisine göre MUTLAKA ŞU KURALLARA UYARAK detaylı bir akademik yanıt oluştur:
 
 KURALLAR:
 1. YANIT UZUNLUĞU: Minimum 3 paragraf, 12 cümle olmalıdır. Her paragraf en az 4 cümle içermelidir.
@@ -422,34 +1079,54 @@ Bağlam (Akademik Makalelerden):
 {context}
 
 DETAYLI AKADEMİK YANIT (Minimum 3 paragraf, 12 cümle + APA7 metin içi alıntılar):"""
+        
+        messages = [
+            {
+                "role": "system", 
+                "content": """Sen bir akademik araştırma uzmanısın. Detaylı, kapsamlı ve bilimsel yanıtlar üretirsin. 
+                Her yanıt en az 3 paragraf ve 12 cümle içermelidir. 
+                APA7 formatında metin içi alıntıları mutlaka kullanmalısın.
+                İkincil kaynaklar için '(Özgün Yazar, Yıl, Aktaran Makale'de belirtildiği gibi)' formatını kullan."""
+            },
+            {"role": "user", "content": prompt}
+        ]
+        
+        self._log_answer_prompt(messages, packed, documents)
+        
+        return messages, citations_data
+    
+    def _concise_answer_messages(self, question: str, context: str, citations_text: str) -> List[Dict]:
+        """Short direct-answer prompt for factual lookups"""
+        prompt = f"""Aşağıdaki bağlama göre soruyu KISA ve DOĞRUDAN yanıtla (en fazla 3 cümle).
+Yanıtta APA7 metin içi alıntı kullan: {citations_text}
+Bağlamda yanıt yoksa bunu açıkça belirt.
 
-            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-            
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": """Sen bir akademik araştırma uzmanısın. Detaylı, kapsamlı ve bilimsel yanıtlar üretirsin. 
-                        Her yanıt en az 3 paragraf ve 12 cümle içermelidir. 
-                        APA7 formatında metin içi alıntıları mutlaka kullanmalısın.
-                        İkincil kaynaklar için '(Özgün Yazar, Yıl, Aktaran Makale'de belirtildiği gibi)' formatını kullan."""
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=2000
-            )
-            
-            answer = response.choices[0].message.content
-            
-            return answer, citations_data
-            
-        except Exception as e:
-            logger.error(f"Error generating enhanced answer: {e}")
-            
-            # Fallback answer
-            fallback_answer = f"""
+Soru: {question}
+
+Bağlam (Akademik Makalelerden):
+{context}
+
+KISA YANIT:"""
+        
+        return [
+            {
+                "role": "system",
+                "content": "Sen bir akademik araştırma asistanısın. Olgusal sorulara kısa, doğru ve kaynaklı yanıtlar verirsin."
+            },
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _log_answer_prompt(self, messages: List[Dict], packed: Dict[str, Any], documents: List[str]):
+        logger.info(
+            f"Answer prompt: {self.context_packer.counter.count_messages(messages)} tokens "
+            f"(context {packed['context_tokens']}/{packed['budget']} from {packed['original_tokens']}, "
+            f"{len(packed['documents'])}/{len(documents)} chunks, "
+            f"{packed['overlap_chars_removed']} overlapping chars removed)"
+        )
+    
+    def _fallback_answer(self, metadatas: List[Dict]) -> str:
+        """Answer used when generation fails"""
+        fallback_answer = f"""
 Bu soruya ilişkin bulgular akademik kaynaklarda incelenmiştir. 
 
 Araştırmalar, konuyla ilgili önemli bulgular ortaya koymaktadır. 
@@ -458,8 +1135,113 @@ Daha detaylı bilgi için kaynak metinleri inceleyebilirsiniz.
 
 Kaynak: {metadatas[0].get('pdf_name', 'Bilinmeyen kaynak') if metadatas else 'Kaynak bulunamadı'}
 """
+        
+        return fallback_answer
+    
+    def _generate_enhanced_answer(self, question: str, documents: List[str], 
+                                metadatas: List[Dict], route: Route = None) -> tuple[str, List[Dict]]:
+        """
+        Generate enhanced answer with proper APA7 citations
+        """
+        route = route or self._default_route()
+        citations_data = []
+        start = time.perf_counter()
+        try:
+            messages, citations_data = self._build_answer_messages(question, documents, metadatas, route)
             
-            return fallback_answer, citations_data if 'citations_data' in locals() else []
+            client = get_gateway().client
+            
+            # Questions are interactive traffic: admitted before queued document analysis
+            with llm_priority(INTERACTIVE):
+                response = client.chat.completions.create(
+                    model=route.model,
+                    messages=messages,
+                    temperature=route.temperature,
+                    max_tokens=route.max_tokens
+                )
+            
+            answer = response.choices[0].message.content
+            usage = response.usage
+            self.question_router.record(
+                route, time.perf_counter() - start,
+                prompt_tokens=usage.prompt_tokens if usage else 0,
+                completion_tokens=usage.completion_tokens if usage else 0
+            )
+            
+            return answer, citations_data
+            
+        except Exception as e:
+            logger.error(f"Error generating enhanced answer: {e}")
+            self.question_router.record(route, time.perf_counter() - start, error=True)
+            return self._fallback_answer(metadatas), citations_data
+    
+    def _stream_enhanced_answer(self, messages: List[Dict], metadatas: List[Dict],
+                                status: Dict[str, Any] = None, route: Route = None) -> Iterator[str]:
+        """
+        Stream answer tokens from the model, reporting them to the streaming handler
+        
+        Falls back to the static answer if the request fails before any token arrives.
+        status["complete"] is set to True only when the model finished the answer.
+        """
+        route = route or self._default_route()
+        status = status if status is not None else {}
+        status["complete"] = False
+        handler = self.streaming_handler
+        handler.on_llm_start({"name": route.model}, [messages[-1]["content"]])
+        
+        parts = []
+        usage = None
+        start = time.perf_counter()
+        try:
+            client = get_gateway().client
+            
+            # Questions are interactive traffic: admitted before queued document analysis
+            with llm_priority(INTERACTIVE):
+                stream = client.chat.completions.create(
+                    model=route.model,
+                    messages=messages,
+                    temperature=route.temperature,
+                    max_tokens=route.max_tokens,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+            
+            try:
+                for chunk in stream:
+                    if chunk.usage:
+                        usage = chunk.usage
+                    if not chunk.choices:
+                        continue
+                    token = chunk.choices[0].delta.content
+                    if token:
+                        parts.append(token)
+                        handler.on_llm_new_token(token)
+                        yield token
+            finally:
+                # Frees the pooled connection and gateway slot if the consumer stops early
+                stream.response.close()
+            status["complete"] = True
+            if usage:
+                prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+            else:
+                counter = self.context_packer.counter
+                prompt_tokens = counter.count_messages(messages)
+                completion_tokens = counter.count("".join(parts))
+            self.question_router.record(route, time.perf_counter() - start,
+                                        prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+            
+        except Exception as e:
+            logger.error(f"Error streaming enhanced answer: {e}")
+            self.question_router.record(route, time.perf_counter() - start, error=True)
+            handler.on_llm_error(e)
+            if parts:
+                # Keep the partial answer rather than mixing in the fallback
+                return
+            fallback = self._fallback_answer(metadatas)
+            parts.append(fallback)
+            yield fallback
+        
+        handler.on_llm_end(LLMResult(generations=[[Generation(text="".join(parts))]]))
     
     def _generate_processing_summary(self, results: Dict[str, Any]) -> Dict[str, Any]:
         """Generate a summary of document processing results"""
@@ -508,6 +1290,8 @@ def main():
     try:
         # Initialize assistant
         assistant = AdvancedAcademicAssistant()
+        assistant.warm_up(background=True)
+        print(f"⚡ Ready in {assistant.startup_metrics['construct_seconds']:.2f}s (components loading in background)")
         
         # Test basic functionality
         print("\n📊 System Status:")
@@ -521,6 +1305,7 @@ def main():
         print("- ask <question> : Ask a research question") 
         print("- search <query> : Search literature")
         print("- summary : Get research summary")
+        print("- status : Show system status and partially processed documents")
         
         while True:
             try:
@@ -541,7 +1326,12 @@ def main():
                 elif user_input.startswith('ask '):
                     question = user_input[4:].strip()
                     print("🤔 Answering question...")
-                    result = assistant.ask_question(question)
+                    # Tokens are printed by the streaming handler as they arrive
+                    for event in assistant.ask_question_stream(question):
+                        if event["type"] == "result":
+                            result = event["result"]
+                    print()
+                    result.pop("answer", None)
                     print(json.dumps(result, indent=2, ensure_ascii=False))
                 
                 elif user_input.startswith('search '):
@@ -550,6 +1340,10 @@ def main():
                     result = assistant.search_literature(query)
                     print(json.dumps(result, indent=2, ensure_ascii=False))
                 
+                elif user_input == 'status':
+                    result = assistant.get_system_status()
+                    print(json.dumps(result, indent=2, ensure_ascii=False))
+                
                 elif user_input == 'summary':
                     print("📈 Generating summary...")
                     result = assistant.get_research_summary()
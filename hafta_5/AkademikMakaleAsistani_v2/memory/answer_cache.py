@@ -0,0 +1,184 @@
+"""
+Answer Cache - Semantic cache of generated answers for repeated research questions
+Near-identical questions over the same retrieved chunks reuse the earlier answer
+"""
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Any, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@dataclass
+class CachedAnswer:
+    """Data class for one cached answer"""
+    question: str
+    embedding: List[float]
+    context_key: Tuple[str, str]
+    pdf_names: List[str]
+    result: Dict[str, Any]
+    generation_seconds: float
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+
+class SemanticAnswerCache:
+    """
+    LRU/TTL cache of answers keyed by:
+    - the exact set of retrieved chunk IDs plus a digest of their text, and
+    - question embedding similarity (cosine >= similarity_threshold)
+
+    Because the chunk text is part of the key, an entry is never served after the
+    PDF behind it was re-indexed with different content; invalidate() drops such
+    entries eagerly.
+    """
+
+    def __init__(self, similarity_threshold: float = None, max_entries: int = None,
+                 ttl_seconds: float = None):
+        self.similarity_threshold = similarity_threshold if similarity_threshold is not None else \
+            float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+        self.max_entries = max_entries or int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else \
+            float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "lookups": 0,
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+            "saved_seconds": 0.0
+        }
+
+        logger.info(
+            f"Semantic answer cache ready (threshold={self.similarity_threshold}, "
+            f"max_entries={self.max_entries}, ttl={self.ttl_seconds}s)"
+        )
+
+    @staticmethod
+    def context_key(chunk_ids: List[str], chunk_texts: List[str]) -> Tuple[str, str]:
+        """Order-independent key of the retrieved chunks and their content"""
+        pairs = sorted(zip(chunk_ids, chunk_texts))
+        digest = hashlib.sha1()
+        for chunk_id, text in pairs:
+            digest.update(chunk_id.encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(text.encode("utf-8"))
+            digest.update(b"\0")
+        return "|".join(chunk_id for chunk_id, _ in pairs), digest.hexdigest()
+
+    @staticmethod
+    def _cosine(a: List[float], b: List[float]) -> float:
+        dot = sum(x * y for x, y in zip(a, b))
+        norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+        return dot / norm if norm else 0.0
+
+    def _expired(self, entry: CachedAnswer, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry.created_at > self.ttl_seconds
+
+    def lookup(self, query_embedding: List[float], chunk_ids: List[str],
+               chunk_texts: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached answer for a semantically similar question over the same chunks
+
+        Returns:
+            {"result", "similarity", "cached_question", "saved_seconds"} or None
+        """
+        key = self.context_key(chunk_ids, chunk_texts)
+        now = time.time()
+
+        with self._lock:
+            self.stats["lookups"] += 1
+
+            best_id, best_similarity = None, -1.0
+            for entry_id, entry in list(self._entries.items()):
+                if self._expired(entry, now):
+                    del self._entries[entry_id]
+                    self.stats["expirations"] += 1
+                    continue
+                if entry.context_key != key:
+                    continue
+                similarity = self._cosine(query_embedding, entry.embedding)
+                if similarity > best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+
+            if best_id is None or best_similarity < self.similarity_threshold:
+                self.stats["misses"] += 1
+                return None
+
+            entry = self._entries[best_id]
+            self._entries.move_to_end(best_id)
+            entry.hits += 1
+            self.stats["hits"] += 1
+            self.stats["saved_seconds"] += entry.generation_seconds
+
+            return {
+                "result": dict(entry.result),
+                "similarity": best_similarity,
+                "cached_question": entry.question,
+                "saved_seconds": entry.generation_seconds
+            }
+
+    def store(self, question: str, query_embedding: List[float], chunk_ids: List[str],
+              chunk_texts: List[str], pdf_names: List[str], result: Dict[str, Any],
+              generation_seconds: float):
+        """Cache an answer, evicting the least recently used entry when full"""
+        entry = CachedAnswer(
+            question=question,
+            embedding=list(query_embedding),
+            context_key=self.context_key(chunk_ids, chunk_texts),
+            pdf_names=sorted(set(pdf_names)),
+            result=dict(result),
+            generation_seconds=generation_seconds
+        )
+
+        with self._lock:
+            self._entries[self._next_id] = entry
+            self._next_id += 1
+            self.stats["stores"] += 1
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, pdf_names: List[str] = None) -> int:
+        """Drop entries built on any of the given PDFs (all entries if None)"""
+        with self._lock:
+            if pdf_names is None:
+                removed = len(self._entries)
+                self._entries.clear()
+            else:
+                targets = set(pdf_names)
+                stale = [entry_id for entry_id, entry in self._entries.items()
+                         if targets.intersection(entry.pdf_names)]
+                for entry_id in stale:
+                    del self._entries[entry_id]
+                removed = len(stale)
+
+            self.stats["invalidations"] += removed
+
+        if removed:
+            logger.info(f"Answer cache: invalidated {removed} entries")
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rate, saved generation time and size"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+
+        stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        stats["saved_seconds"] = round(stats["saved_seconds"], 2)
+        stats["similarity_threshold"] = self.similarity_threshold
+        return stats
@@ -0,0 +1,330 @@
+"""
+LLM Response Cache - Persistent prompt-level cache of chain LLM calls
+Responses are stored in SQLite keyed by (model, temperature, rendered prompt hash),
+so re-running a chain on unchanged inputs does not call the API again
+
+Command line:
+    python -m memory.llm_cache stats
+    python -m memory.llm_cache list [--chain NAME] [--limit N]
+    python -m memory.llm_cache purge [--chain NAME] [--older-than DAYS]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    cache_key TEXT PRIMARY KEY,
+    chain TEXT NOT NULL,
+    model TEXT NOT NULL,
+    temperature REAL NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_hit_at REAL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_responses_chain ON responses (chain);
+CREATE TABLE IF NOT EXISTS chain_stats (
+    chain TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    bypassed INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Result of the last lookup on each thread ("hit", "miss" or "bypassed"), read by
+# usage accounting right after the LLM call that made it
+_lookup_status = threading.local()
+
+
+def pop_lookup_status() -> Optional[str]:
+    """Status of this thread's last cache lookup since the previous call, None without one"""
+    status = getattr(_lookup_status, "value", None)
+    _lookup_status.value = None
+    return status
+
+
+class LLMResponseCache:
+    """
+    SQLite store of LLM responses shared by all chains
+
+    Calls with a temperature above max_temperature (default 0, LLM_CACHE_MAX_TEMPERATURE)
+    bypass the cache: sampling is meant to give a different answer each time, and a
+    cached sample would freeze one of them. The analysis chains run at temperature 0
+    so their calls are cached.
+    Hits, misses and bypasses are counted per chain in the database, so hit rates
+    survive restarts.
+    """
+
+    def __init__(self, db_path: str = None, max_temperature: float = None):
+        self.db_path = Path(db_path or os.getenv("LLM_CACHE_PATH", "") or
+                            Path(__file__).parent.parent / 'data' / 'llm_cache.sqlite3')
+        self.max_temperature = max_temperature if max_temperature is not None else \
+            float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0"))
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    @staticmethod
+    def prompt_hash(prompt: str, params: str = "") -> str:
+        """Hash of the rendered prompt plus the remaining call parameters (max_tokens, stop, ...)"""
+        return hashlib.sha256(f"{prompt}\x00{params}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def cache_key(model: str, temperature: float, prompt_hash: str) -> str:
+        return f"{model}:{float(temperature):g}:{prompt_hash}"
+
+    def cacheable(self, temperature: float) -> bool:
+        return temperature <= self.max_temperature
+
+    def _count(self, chain: str, column: str):
+        self._conn.execute(
+            f"INSERT INTO chain_stats (chain, {column}) VALUES (?, 1) "
+            f"ON CONFLICT(chain) DO UPDATE SET {column} = {column} + 1",
+            (chain,)
+        )
+
+    def lookup(self, chain: str, model: str, temperature: float, prompt_hash: str) -> Optional[str]:
+        """Return the stored response, or None on a miss or bypass"""
+        with self._lock:
+            try:
+                if not self.cacheable(temperature):
+                    self._count(chain, "bypassed")
+                    _lookup_status.value = "bypassed"
+                    return None
+
+                key = self.cache_key(model, temperature, prompt_hash)
+                row = self._conn.execute(
+                    "SELECT response FROM responses WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    self._count(chain, "misses")
+                    _lookup_status.value = "miss"
+                    return None
+
+                self._conn.execute(
+                    "UPDATE responses SET hits = hits + 1, last_hit_at = ? WHERE cache_key = ?",
+                    (time.time(), key)
+                )
+                self._count(chain, "hits")
+                _lookup_status.value = "hit"
+                return row[0]
+            except sqlite3.Error as e:
+                logger.error(f"LLM cache lookup failed: {e}")
+                return None
+            finally:
+                self._conn.commit()
+
+    def store(self, chain: str, model: str, temperature: float, prompt_hash: str, response: str):
+        """Persist a response (ignored for calls that bypass the cache)"""
+        if not self.cacheable(temperature):
+            return
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses "
+                    "(cache_key, chain, model, temperature, prompt_hash, response, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (self.cache_key(model, temperature, prompt_hash), chain, model,
+                     float(temperature), prompt_hash, response, time.time())
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"LLM cache store failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Stored entries and hit rate per chain"""
+        with self._lock:
+            entries = dict(self._conn.execute(
+                "SELECT chain, COUNT(*) FROM responses GROUP BY chain"
+            ).fetchall())
+            rows = self._conn.execute("SELECT chain, hits, misses, bypassed FROM chain_stats").fetchall()
+
+        chains = {}
+        for chain, hits, misses, bypassed in rows:
+            lookups = hits + misses
+            chains[chain] = {
+                "entries": entries.get(chain, 0),
+                "hits": hits,
+                "misses": misses,
+                "bypassed": bypassed,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+            }
+        for chain, count in entries.items():
+            chains.setdefault(chain, {"entries": count, "hits": 0, "misses": 0, "bypassed": 0, "hit_rate": 0.0})
+
+        return {
+            "db_path": str(self.db_path),
+            "max_temperature": self.max_temperature,
+            "entries": sum(entries.values()),
+            "size_bytes": self.db_path.stat().st_size if self.db_path.exists() else 0,
+            "chains": chains
+        }
+
+    def list_entries(self, chain: str = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recently created entries, optionally of one chain"""
+        query = "SELECT chain, model, temperature, prompt_hash, hits, created_at, last_hit_at, " \
+                "LENGTH(response) FROM responses"
+        params: list = []
+        if chain:
+            query += " WHERE chain = ?"
+            params.append(chain)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {
+                "chain": row[0],
+                "model": row[1],
+                "temperature": row[2],
+                "prompt_hash": row[3][:16],
+                "hits": row[4],
+                "created_at": datetime.fromtimestamp(row[5]).isoformat(timespec="seconds"),
+                "last_hit_at": datetime.fromtimestamp(row[6]).isoformat(timespec="seconds") if row[6] else None,
+                "response_chars": row[7]
+            }
+            for row in rows
+        ]
+
+    def purge(self, chain: str = None, older_than_days: float = None) -> int:
+        """Delete entries (all, one chain's, and/or older ones); returns the number removed"""
+        conditions, params = [], []
+        if chain:
+            conditions.append("chain = ?")
+            params.append(chain)
+        if older_than_days is not None:
+            conditions.append("created_at < ?")
+            params.append(time.time() - older_than_days * 86400)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._lock:
+            removed = self._conn.execute(f"DELETE FROM responses{where}", params).rowcount
+            if not conditions:
+                self._conn.execute("DELETE FROM chain_stats")
+            elif chain and older_than_days is None:
+                self._conn.execute("DELETE FROM chain_stats WHERE chain = ?", (chain,))
+            self._conn.commit()
+        logger.info(f"Purged {removed} LLM cache entries")
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Return the process-wide response cache, opening it on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMResponseCache()
+    return _cache
+
+
+def chain_cache(chain: str, model: str, temperature: float):
+    """
+    LangChain cache for one chain's chat model (pass as ChatOpenAI(cache=...))
+
+    Returns None when LLM_CACHE_ENABLED is false.
+    """
+    if os.getenv("LLM_CACHE_ENABLED", "true").lower() != "true":
+        return None
+
+    from langchain.schema.cache import BaseCache
+    from langchain.load import dumps, loads
+
+    store = get_llm_cache()
+
+    class ChainResponseCache(BaseCache):
+        """Adapter from LangChain's cache interface to the shared SQLite store"""
+
+        def lookup(self, prompt: str, llm_string: str):
+            # llm_string carries the remaining call parameters, so they are part of the key
+            cached = store.lookup(chain, model, temperature, store.prompt_hash(prompt, llm_string))
+            if cached is None:
+                return None
+            try:
+                return [loads(generation) for generation in json.loads(cached)]
+            except Exception as e:
+                logger.warning(f"Unreadable LLM cache entry for {chain}: {e}")
+                _lookup_status.value = "miss"
+                return None
+
+        def update(self, prompt: str, llm_string: str, return_val):
+            store.store(chain, model, temperature, store.prompt_hash(prompt, llm_string),
+                        json.dumps([dumps(generation) for generation in return_val]))
+
+        def clear(self, **kwargs):
+            store.purge(chain=chain)
+
+    return ChainResponseCache()
+
+
+def main():
+    """Command-line entry point: inspect and purge the response cache"""
+    parser = argparse.ArgumentParser(description="Inspect and purge the persistent LLM response cache")
+    parser.add_argument("--db", default=None, help="Cache database (default: data/llm_cache.sqlite3)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("stats", help="Entries and hit rate per chain")
+
+    list_parser = commands.add_parser("list", help="Most recent entries")
+    list_parser.add_argument("--chain", default=None, help="Only entries of this chain")
+    list_parser.add_argument("--limit", type=int, default=20, help="Number of entries (default: 20)")
+
+    purge_parser = commands.add_parser("purge", help="Delete entries")
+    purge_parser.add_argument("--chain", default=None, help="Only entries of this chain")
+    purge_parser.add_argument("--older-than", type=float, default=None, metavar="DAYS",
+                              help="Only entries created more than DAYS days ago")
+    args = parser.parse_args()
+
+    cache = LLMResponseCache(args.db)
+
+    if args.command == "stats":
+        stats = cache.get_stats()
+        print(f"📦 {stats['db_path']}: {stats['entries']} entries, {stats['size_bytes'] / 1024:.1f} KB "
+              f"(cached up to temperature {stats['max_temperature']})")
+        for chain, entry in sorted(stats["chains"].items()):
+            print(f"  {chain:<20} {entry['entries']:6d} entries  {entry['hit_rate']:6.1%} hit rate  "
+                  f"({entry['hits']} hits, {entry['misses']} misses, {entry['bypassed']} bypassed)")
+
+    elif args.command == "list":
+        for entry in cache.list_entries(args.chain, args.limit):
+            print(f"  {entry['created_at']}  {entry['chain']:<20} {entry['model']:<12} "
+                  f"t={entry['temperature']:g}  {entry['prompt_hash']}  {entry['hits']} hits  "
+                  f"{entry['response_chars']} chars")
+
+    elif args.command == "purge":
+        removed = cache.purge(args.chain, args.older_than)
+        print(f"🗑️ Removed {removed} entries")
+
+    cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
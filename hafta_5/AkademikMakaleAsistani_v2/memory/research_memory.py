@@ -11,7 +11,7 @@ from pathlib import Path
 from langchain.memory import ConversationSummaryBufferMemory, ConversationBufferWindowMemory
 from langchain.memory.chat_message_histories import FileChatMessageHistory
 from langchain.schema import BaseMessage, HumanMessage, AIMessage
-from langchain.chat_models import ChatOpenAI
+from tools.llm_gateway import get_gateway
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -31,7 +31,7 @@ class ResearchSessionMemory:
         self.memory_dir.mkdir(parents=True, exist_ok=True)
         
         # LLM for memory summarization
-        self.llm = ChatOpenAI(model_name=llm_model, temperature=0.1)
+        self.llm = get_gateway().chat_model(llm_model, 0.1, chain="research_memory")
         
         # File paths
         self.session_file = self.memory_dir / f"session_{session_id}.json"
@@ -3,11 +3,13 @@ Streaming Handlers - Real-time streaming interface for academic research assista
 Provides progressive response display and progress tracking
 """
 import logging
+import threading
 import time
 from typing import Dict, List, Optional, Any, Union
 from datetime import datetime
 from langchain.callbacks.base import BaseCallbackHandler
 from langchain.schema import LLMResult
+from streaming.json_stream import IncrementalJSONParser
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -30,6 +32,7 @@ class ResearchStreamingHandler(BaseCallbackHandler):
         self.start_time = None
         self.tokens_streamed = 0
         self.current_response = ""
+        self.first_token_time = None
         
         # Stream buffer
         self.stream_buffer = []
@@ -42,6 +45,7 @@ class ResearchStreamingHandler(BaseCallbackHandler):
     ) -> None:
         """Called when LLM starts generating"""
         self.start_time = datetime.now()
+        self.first_token_time = None
         self.tokens_streamed = 0
         self.current_response = ""
         
@@ -56,6 +60,16 @@ class ResearchStreamingHandler(BaseCallbackHandler):
     
     def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
         """Called for each new token generated"""
+        if self.first_token_time is None:
+            self.first_token_time = datetime.now()
+            if self.ui_callback and self.start_time:
+                self.ui_callback({
+                    "type": "first_token",
+                    "message": "✍️ Yanıt akıyor...",
+                    "time_to_first_token": (self.first_token_time - self.start_time).total_seconds(),
+                    "timestamp": self.first_token_time.isoformat()
+                })
+        
         self.tokens_streamed += 1
         self.current_response += token
         self.stream_buffer.append(token)
@@ -98,6 +112,7 @@ class ResearchStreamingHandler(BaseCallbackHandler):
                 "type": "llm_end",
                 "message": "✅ Yanıt tamamlandı",
                 "duration": duration,
+                "time_to_first_token": self.get_time_to_first_token(),
                 "tokens_generated": self.tokens_streamed,
                 "timestamp": end_time.isoformat()
             })
@@ -237,17 +252,66 @@ class ResearchStreamingHandler(BaseCallbackHandler):
                 "timestamp": datetime.now().isoformat()
             })
     
+    def get_time_to_first_token(self) -> Optional[float]:
+        """Seconds from LLM start to the first streamed token"""
+        if self.start_time and self.first_token_time:
+            return (self.first_token_time - self.start_time).total_seconds()
+        return None
+    
     def get_stream_stats(self) -> Dict[str, Any]:
         """Get streaming statistics"""
         return {
             "session_id": self.session_id,
             "tokens_streamed": self.tokens_streamed,
+            "time_to_first_token": self.get_time_to_first_token(),
             "completed_steps": self.completed_steps,
             "total_steps": self.total_steps,
             "current_step": self.current_step,
             "start_time": self.start_time.isoformat() if self.start_time else None
         }
 
+class JSONFieldStreamHandler(BaseCallbackHandler):
+    """
+    Reports the fields of one chain step's JSON output as soon as each is complete
+    
+    Attach to a single step call (one handler per step, so concurrent steps do not
+    mix their tokens). on_field(step, field, value) is called once per top-level
+    field; nested fields are joined with dots when max_depth > 1. Responses that
+    were not streamed (e.g. served from the LLM cache) are reported at on_llm_end.
+    """
+    
+    def __init__(self, step: str, on_field, max_depth: int = 1):
+        self.step = step
+        self.on_field = on_field
+        self.max_depth = max_depth
+        self.parser = IncrementalJSONParser(max_depth)
+        self.reported = set()
+        self.start_time = None
+        self.field_seconds: Dict[str, float] = {}
+    
+    def _report(self, fields):
+        for path, value in fields:
+            field = ".".join(path)
+            if field in self.reported:
+                continue
+            self.reported.add(field)
+            self.field_seconds[field] = round(time.perf_counter() - self.start_time, 3) if self.start_time else 0.0
+            try:
+                self.on_field(self.step, field, value)
+            except Exception as e:
+                logger.warning(f"Field callback failed for {self.step}.{field}: {e}")
+    
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any) -> None:
+        self.parser = IncrementalJSONParser(self.max_depth)
+        self.start_time = time.perf_counter()
+    
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self._report(self.parser.feed(token))
+    
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        if not self.parser.buffer and response.generations and response.generations[0]:
+            self._report(self.parser.feed(response.generations[0][0].text))
+
 class ProgressTracker:
     """
     Progress tracking system for long-running research operations
@@ -259,6 +323,8 @@ class ProgressTracker:
         self.stages = []
         self.current_stage = None
         self.progress_callbacks = []
+        # Stages may be started and completed from several worker threads
+        self._lock = threading.RLock()
     
     def add_stage(self, stage_name: str, estimated_duration: int = None):
         """Add a stage to the operation"""
@@ -274,31 +340,34 @@ class ProgressTracker:
     
     def start_stage(self, stage_name: str):
         """Start a specific stage"""
-        for stage in self.stages:
-            if stage["name"] == stage_name:
-                stage["status"] = "running"
-                stage["start_time"] = datetime.now()
-                self.current_stage = stage
-                self._notify_progress()
-                break
+        with self._lock:
+            for stage in self.stages:
+                if stage["name"] == stage_name:
+                    stage["status"] = "running"
+                    stage["start_time"] = datetime.now()
+                    self.current_stage = stage
+                    self._notify_progress()
+                    break
     
     def complete_stage(self, stage_name: str):
         """Complete a specific stage"""
-        for stage in self.stages:
-            if stage["name"] == stage_name:
-                stage["status"] = "completed"
-                stage["end_time"] = datetime.now()
-                stage["progress"] = 100
-                self._notify_progress()
-                break
+        with self._lock:
+            for stage in self.stages:
+                if stage["name"] == stage_name:
+                    stage["status"] = "completed"
+                    stage["end_time"] = datetime.now()
+                    stage["progress"] = 100
+                    self._notify_progress()
+                    break
     
     def update_stage_progress(self, stage_name: str, progress: float):
         """Update progress of a specific stage"""
-        for stage in self.stages:
-            if stage["name"] == stage_name:
-                stage["progress"] = min(100, max(0, progress))
-                self._notify_progress()
-                break
+        with self._lock:
+            for stage in self.stages:
+                if stage["name"] == stage_name:
+                    stage["progress"] = min(100, max(0, progress))
+                    self._notify_progress()
+                    break
     
     def add_progress_callback(self, callback):
         """Add a callback function for progress updates"""
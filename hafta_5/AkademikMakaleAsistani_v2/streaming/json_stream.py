@@ -0,0 +1,121 @@
+"""
+Incremental JSON Parsing - Fields of a streamed JSON response as soon as they are complete
+Lets the UI show e.g. the research type while the rest of the analysis is still generating
+"""
+import json
+import logging
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Path = Tuple[str, ...]
+
+
+class IncrementalJSONParser:
+    """
+    Scans a JSON object chunk by chunk and reports each member value once it is complete
+
+    feed() returns (path, value) pairs, where path is the tuple of object keys leading
+    to the value, for members up to max_depth levels deep (1: top-level fields only).
+    Text before the first "{" (e.g. a ```json fence) and after the closing "}" is ignored.
+    """
+
+    def __init__(self, max_depth: int = 1):
+        self.max_depth = max_depth
+        self.buffer = ""
+        self.position = 0
+        self.started = False
+        self.done = False
+
+        # Open containers: [kind ("object"/"array"), path, pending key, expecting a key]
+        self._stack: List[list] = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._value_start: Optional[int] = None  # start of an unfinished number/literal
+        self._container_starts: List[int] = []
+
+    def feed(self, chunk: str) -> List[Tuple[Path, Any]]:
+        """Add streamed text and return the member values it completed"""
+        self.buffer += chunk
+        completed = []
+
+        while self.position < len(self.buffer) and not self.done:
+            index = self.position
+            char = self.buffer[index]
+            self.position += 1
+
+            if not self.started:
+                if char == "{":
+                    self.started = True
+                    self._open("object", index)
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    self._string_done(index, completed)
+                continue
+
+            if self._value_start is not None:
+                if char in ",}] \t\r\n":
+                    self._complete(self._value_start, index, completed)
+                    self._value_start = None
+                else:
+                    continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char in "{[":
+                self._open("object" if char == "{" else "array", index)
+            elif char in "}]":
+                start = self._container_starts.pop()
+                self._stack.pop()
+                if not self._stack:
+                    self.done = True
+                else:
+                    self._complete(start, index + 1, completed)
+            elif char == ",":
+                if self._stack[-1][0] == "object":
+                    self._stack[-1][3] = True
+            elif char not in ": \t\r\n":
+                self._value_start = index
+
+        return completed
+
+    def _open(self, kind: str, index: int):
+        path = self._child_path()
+        self._stack.append([kind, path, None, kind == "object"])
+        self._container_starts.append(index)
+
+    def _child_path(self) -> Path:
+        if not self._stack:
+            return ()
+        kind, path, key, _ = self._stack[-1]
+        return path + (key,) if kind == "object" else path
+
+    def _string_done(self, index: int, completed: List[Tuple[Path, Any]]):
+        container = self._stack[-1]
+        if container[0] == "object" and container[3]:
+            container[2] = json.loads(self.buffer[self._string_start:index + 1])
+            container[3] = False
+        else:
+            self._complete(self._string_start, index + 1, completed)
+
+    def _complete(self, start: int, end: int, completed: List[Tuple[Path, Any]]):
+        """Record a finished value if it is an object member within max_depth"""
+        container = self._stack[-1]
+        if container[0] != "object":
+            return
+        path = container[1] + (container[2],)
+        if len(path) > self.max_depth:
+            return
+        try:
+            completed.append((path, json.loads(self.buffer[start:end])))
+        except json.JSONDecodeError as e:
+            logger.debug(f"Skipping unparsable streamed value at {path}: {e}")
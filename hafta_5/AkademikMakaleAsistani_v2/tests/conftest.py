@@ -0,0 +1,77 @@
+"""
+Shared test fixtures
+"""
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+
+@pytest.fixture
+def scripted_llm(monkeypatch, tmp_path):
+    """
+    Replace the chat models built through the LLM gateway with scripted ones
+
+    Call the fixture with respond(prompt) -> response text; it returns the list of
+    models created afterwards (with their model_name, temperature, cache and
+    metadata). Chains are then constructed normally and run through LangChain,
+    including its response cache hook, which points at a temporary database.
+    Models created with streaming=True send the response to the callbacks in tokens.
+    """
+    pytest.importorskip("langchain")
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    import memory.llm_cache as llm_cache
+    from tools.llm_gateway import LLMGateway
+
+    class ScriptedChatModel(BaseChatModel):
+        respond: object
+        model_name: str = "gpt-4o"
+        temperature: float = 0.3
+        streaming: bool = False
+        calls: int = 0
+
+        @property
+        def _llm_type(self) -> str:
+            return "scripted"
+
+        @property
+        def _identifying_params(self):
+            return {"model_name": self.model_name, "temperature": self.temperature}
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            with calls_lock:
+                self.calls += 1
+            text = self.respond("\n".join(str(message.content) for message in messages))
+            if self.streaming and run_manager:
+                for index in range(0, len(text), 4):
+                    run_manager.on_llm_new_token(text[index:index + 4])
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    calls_lock = threading.Lock()
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm_cache.sqlite3"))
+    monkeypatch.setattr(llm_cache, "_cache", None)
+
+    def install(respond):
+        created = []
+
+        def chat_model(gateway, model_name="gpt-4o-mini", temperature=0.3, chain=None, **kwargs):
+            model = ScriptedChatModel(respond=respond, model_name=model_name, temperature=temperature,
+                                      streaming=kwargs.get("streaming", False), cache=kwargs.get("cache"),
+                                      metadata={"chain": chain} if chain else None)
+            created.append(model)
+            return model
+
+        monkeypatch.setattr(LLMGateway, "chat_model", chat_model)
+        return created
+
+    yield install
+    if llm_cache._cache is not None:
+        llm_cache._cache.close()
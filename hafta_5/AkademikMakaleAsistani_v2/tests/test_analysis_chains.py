@@ -0,0 +1,93 @@
+"""
+Tests for schema validation of the single-call DocumentAnalysisChain mode
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("langchain")
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from chains.analysis_chains import DocumentAnalysisChain, STRUCTURED_SCHEMA, SINGLE_CALL
+
+
+def filled(spec, score=8):
+    if isinstance(spec, dict):
+        return {key: filled(value, score) for key, value in spec.items()}
+    return {"score": score, "text": "açıklama", "list": ["madde"]}[spec]
+
+
+def unexpected_call(prompt):
+    pytest.fail("validation and scoring should not call the LLM")
+
+
+@pytest.fixture
+def make_chain(scripted_llm):
+    def make(respond=unexpected_call):
+        models = scripted_llm(respond)
+        return DocumentAnalysisChain(mode=SINGLE_CALL), models
+    return make
+
+
+def test_valid_response_is_normalized_and_scored(make_chain):
+    chain, _ = make_chain()
+    raw = {step: filled(spec) for step, spec in STRUCTURED_SCHEMA.items()}
+    raw["content_quality_analysis"]["content_depth"]["conceptual_clarity"] = "7/10"
+    raw["citation_evaluation"]["improvement_recommendations"] = "Daha güncel kaynak"
+
+    outputs, problems = chain._validate_structured(raw)
+
+    assert problems == []
+    assert outputs["content_quality_analysis"]["content_depth"]["conceptual_clarity"] == 7
+    assert outputs["citation_evaluation"]["improvement_recommendations"] == ["Daha güncel kaynak"]
+    overall = chain._calculate_overall_scores(outputs)
+    assert overall["total_metrics_evaluated"] == 27
+    assert 7.9 < overall["overall_score"] <= 8.0
+
+
+def test_schema_problems_are_reported(make_chain):
+    chain, _ = make_chain()
+    raw = {step: filled(spec) for step, spec in STRUCTURED_SCHEMA.items()}
+    raw["methodology_evaluation"]["validity_reliability"]["internal_validity"] = "yüksek"
+    raw["structure_language_analysis"]["language_quality"]["clarity"] = 14
+    del raw["citation_evaluation"]
+
+    _, problems = chain._validate_structured(raw)
+
+    assert len(problems) == 3
+    assert any(problem.startswith("citation_evaluation") for problem in problems)
+    assert chain._validate_structured("not json")[1] == ["response is not a JSON object"]
+
+
+def test_counts_in_text_fields_are_not_scores(make_chain):
+    chain, _ = make_chain()
+    outputs = {step: filled(spec) for step, spec in STRUCTURED_SCHEMA.items()}
+    outputs["citation_evaluation"]["reference_analysis"]["primary_sources"] = "3"
+
+    assert chain._calculate_overall_scores(outputs)["total_metrics_evaluated"] == 27
+
+
+@pytest.mark.parametrize("conforming", [True, False])
+def test_single_call_falls_back_to_the_steps_on_schema_problems(make_chain, conforming):
+    """A conforming JSON response is one request; otherwise the four steps run separately"""
+    structured = {step: filled(spec) for step, spec in STRUCTURED_SCHEMA.items()}
+    if not conforming:
+        del structured["citation_evaluation"]
+
+    def respond(prompt):
+        if "tek seferde değerlendir" in prompt:
+            return json.dumps(structured)
+        return json.dumps({"analysis": "adım"})
+
+    chain, (llm, json_llm) = make_chain(respond)
+    results = chain.analyze_document({"text": "Makale metni", "title": "Başlık"})
+
+    assert "error" not in results
+    assert json_llm.calls == 1
+    assert llm.calls == (0 if conforming else len(chain.step_chains))
+    assert set(chain.step_chains) <= set(results)
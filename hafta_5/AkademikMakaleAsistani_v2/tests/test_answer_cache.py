@@ -0,0 +1,79 @@
+"""
+Tests for the semantic answer cache used by ask_question
+Embeddings are small hand-made vectors, so no models are loaded
+"""
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from memory.answer_cache import SemanticAnswerCache
+
+CHUNK_IDS = ["paper.pdf_chunk_0", "paper.pdf_chunk_3"]
+CHUNK_TEXTS = ["Deep learning improves accuracy.", "The sample size was 120."]
+RESULT = {"answer": "Accuracy improves.", "sources": [{"pdf_name": "paper.pdf"}]}
+
+
+def make_cache(**options):
+    options.setdefault("similarity_threshold", 0.95)
+    options.setdefault("max_entries", 10)
+    options.setdefault("ttl_seconds", 0)
+    cache = SemanticAnswerCache(**options)
+    cache.store("What improves accuracy?", [1.0, 0.0, 0.0], CHUNK_IDS, CHUNK_TEXTS,
+                ["paper.pdf"], RESULT, generation_seconds=8.0)
+    return cache
+
+
+def test_similar_question_over_same_chunks_hits():
+    """A near-identical question with the same retrieved chunks reuses the answer"""
+    cache = make_cache()
+
+    # Chunk order from the search does not matter
+    hit = cache.lookup([0.99, 0.05, 0.0], list(reversed(CHUNK_IDS)), list(reversed(CHUNK_TEXTS)))
+
+    assert hit is not None
+    assert hit["result"] == RESULT
+    assert hit["cached_question"] == "What improves accuracy?"
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["hit_rate"] == 1.0
+    assert stats["saved_seconds"] == 8.0
+
+
+def test_threshold_and_chunk_set_are_both_required():
+    """Different questions, or the same question over other chunks, miss"""
+    cache = make_cache()
+
+    assert cache.lookup([0.0, 1.0, 0.0], CHUNK_IDS, CHUNK_TEXTS) is None
+    assert cache.lookup([1.0, 0.0, 0.0], CHUNK_IDS[:1], CHUNK_TEXTS[:1]) is None
+    assert cache.get_stats()["misses"] == 2
+
+
+def test_changed_pdf_content_is_never_served():
+    """Re-indexed chunks with the same IDs but new text do not match old entries"""
+    cache = make_cache()
+
+    assert cache.lookup([1.0, 0.0, 0.0], CHUNK_IDS, ["Updated text.", CHUNK_TEXTS[1]]) is None
+    assert cache.invalidate(["paper.pdf"]) == 1
+    assert cache.lookup([1.0, 0.0, 0.0], CHUNK_IDS, CHUNK_TEXTS) is None
+
+
+def test_lru_and_ttl_eviction():
+    """The least recently used entry goes first; expired entries are dropped on lookup"""
+    cache = make_cache(max_entries=2)
+    cache.store("Second?", [0.0, 1.0, 0.0], CHUNK_IDS, CHUNK_TEXTS, ["paper.pdf"], RESULT, 1.0)
+    # Touch the first entry so the second becomes least recently used
+    assert cache.lookup([1.0, 0.0, 0.0], CHUNK_IDS, CHUNK_TEXTS) is not None
+    cache.store("Third?", [0.0, 0.0, 1.0], CHUNK_IDS, CHUNK_TEXTS, ["paper.pdf"], RESULT, 1.0)
+
+    assert cache.lookup([0.0, 1.0, 0.0], CHUNK_IDS, CHUNK_TEXTS) is None
+    assert cache.lookup([1.0, 0.0, 0.0], CHUNK_IDS, CHUNK_TEXTS) is not None
+    assert cache.get_stats()["evictions"] == 1
+
+    expiring = make_cache(ttl_seconds=0.05)
+    time.sleep(0.1)
+    assert expiring.lookup([1.0, 0.0, 0.0], CHUNK_IDS, CHUNK_TEXTS) is None
+    assert expiring.get_stats()["expirations"] == 1
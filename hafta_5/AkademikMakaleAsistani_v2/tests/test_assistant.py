@@ -0,0 +1,212 @@
+"""
+Tests for the assistant's lazy components, reuse of stored processing results and document deletion
+Library and vector store state decide whether stored results are still valid
+"""
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("langchain")
+pytest.importorskip("chromadb")
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+# main builds the article analyzer at import time, which requires a key; no request is made
+if "OPENAI_API_KEY" in os.environ:
+    from main import AdvancedAcademicAssistant
+else:
+    os.environ["OPENAI_API_KEY"] = "sk-test"
+    try:
+        from main import AdvancedAcademicAssistant
+    finally:
+        del os.environ["OPENAI_API_KEY"]
+from chains.checkpoints import CheckpointStore
+from memory.answer_cache import SemanticAnswerCache
+from streaming.handlers import ProgressTracker
+from tools.pdf_manager import EnhancedPDFManager
+
+
+class FakeVectorDB:
+    def __init__(self):
+        self.documents = set()
+
+    def add_document(self, text, metadata, pdf_name):
+        self.documents.add(pdf_name)
+        return True
+
+    def has_document(self, pdf_name):
+        return pdf_name in self.documents
+
+    def delete_document(self, pdf_name):
+        self.documents.discard(pdf_name)
+        return True
+
+
+@pytest.fixture
+def assistant(tmp_path):
+    assistant = AdvancedAcademicAssistant(session_id="test")
+    assistant.results_dir = tmp_path / "processing_results"
+    assistant.results_dir.mkdir()
+    assistant.pdf_manager = EnhancedPDFManager(pdf_dir=tmp_path / "pdfs", data_dir=tmp_path / "data")
+    assistant.vector_db = FakeVectorDB()
+    assistant.answer_cache = SemanticAnswerCache()
+    return assistant
+
+
+def add_processed_document(assistant, pdf_name="paper.pdf", file_hash="abc123"):
+    pdf_path = assistant.pdf_manager.pdf_dir / pdf_name
+    pdf_path.write_bytes(b"%PDF-1.4 feedback timing")
+    assistant.pdf_manager.register_file_hash(file_hash, pdf_name)
+    assistant.vector_db.documents.add(pdf_name)
+    assistant._save_processing_results(file_hash, {
+        "document_path": str(pdf_path),
+        "processing_stages": {"indexing": {"success": True, "pdf_name": pdf_name}}
+    })
+    return pdf_path
+
+
+def test_stored_results_need_the_library_entry_and_vectors(assistant):
+    """Results are reused only while the document is both in the library and indexed"""
+    pdf_path = add_processed_document(assistant)
+    assert assistant._load_reusable_results("abc123")["document_path"] == str(pdf_path)
+
+    assistant.vector_db.documents.clear()
+    assert assistant._load_reusable_results("abc123") is None
+
+    assistant.vector_db.documents.add("paper.pdf")
+    pdf_path.unlink()
+    assert assistant._load_reusable_results("abc123") is None
+
+
+def test_deleted_document_is_processed_again_on_reupload(assistant):
+    """Deleting removes vectors, stored results and hashes, so a re-upload is not a duplicate"""
+    add_processed_document(assistant)
+
+    assert assistant.delete_document("paper.pdf")
+
+    assert not (assistant.results_dir / "abc123.json").exists()
+    assert assistant.pdf_manager.load_library_index()["hashes"] == {}
+    assert assistant.pdf_manager.find_pdf_by_hash("abc123") is None
+    assert not assistant.vector_db.has_document("paper.pdf")
+
+    # Re-upload: the library knows the file again, but its vectors are gone until re-indexed
+    (assistant.pdf_manager.pdf_dir / "paper.pdf").write_bytes(b"%PDF-1.4 feedback timing")
+    assistant.pdf_manager.register_file_hash("abc123", "paper.pdf")
+    assert assistant._load_reusable_results("abc123") is None
+
+
+@pytest.fixture
+def counted_components(monkeypatch):
+    """Replace the component factories with counting ones that block until released"""
+    builds = {}
+    entered = threading.Event()
+    release = threading.Event()
+    lock = threading.Lock()
+
+    def factory(name):
+        def build(assistant):
+            with lock:
+                builds[name] = builds.get(name, 0) + 1
+            entered.set()
+            release.wait(timeout=5)
+            return object()
+        return build
+
+    names = ["vector_db", "pdf_manager", "research_chain"]
+    monkeypatch.setattr(AdvancedAcademicAssistant, "COMPONENTS", {name: factory(name) for name in names})
+    monkeypatch.setattr(AdvancedAcademicAssistant, "WARM_UP_ORDER", names)
+    return builds, entered, release
+
+
+def test_construction_builds_no_components(counted_components):
+    builds, _, release = counted_components
+    release.set()
+
+    assistant = AdvancedAcademicAssistant(session_id="test")
+
+    assert builds == {}
+    assert assistant.get_startup_metrics()["initialized_components"] == []
+
+    # First access builds only the component asked for
+    assert assistant.pdf_manager is assistant.pdf_manager
+    assert builds == {"pdf_manager": 1}
+    with pytest.raises(AttributeError):
+        assistant.not_a_component
+
+
+def test_warm_up_and_concurrent_access_build_each_component_once(counted_components):
+    builds, entered, release = counted_components
+    assistant = AdvancedAcademicAssistant(session_id="test")
+    seen = []
+
+    def access():
+        seen.append(tuple(getattr(assistant, name) for name in assistant.WARM_UP_ORDER))
+
+    warm_up = assistant.warm_up(background=True)
+    readers = [threading.Thread(target=access) for _ in range(8)]
+    for reader in readers:
+        reader.start()
+    # Hold the first build until everyone is racing for the components
+    assert entered.wait(timeout=5)
+    release.set()
+    warm_up.join(timeout=5)
+    for reader in readers:
+        reader.join(timeout=5)
+
+    assert builds == {name: 1 for name in assistant.WARM_UP_ORDER}
+    assert len(set(seen)) == 1 and len(seen) == len(readers)
+    assert assistant.get_startup_metrics()["initialized_components"] == assistant.WARM_UP_ORDER
+
+
+def test_failed_research_step_is_the_only_call_repeated_on_resume(assistant, scripted_llm, tmp_path):
+    """A re-run after the gap analysis failed restores every other LLM step from its checkpoint"""
+    research_steps = {"kategorizasyon yap": "categorization", "metodoloji bölümünü": "methodology_analysis",
+                      "ana bulgularını": "findings_analysis", "literatürdeki boşlukları": "gap_analysis"}
+    prompts = []
+    failures = {"gap_analysis": 1}
+
+    def respond(prompt):
+        step = next((step for marker, step in research_steps.items() if marker in prompt), "quality")
+        prompts.append(step)
+        if failures.get(step):
+            failures[step] -= 1
+            raise RuntimeError("rate limited")
+        return '{"research_type": "Ampirik", "step": "%s"}' % step
+
+    scripted_llm(respond)
+    checkpoints = CheckpointStore(tmp_path / "checkpoints")
+
+    def run():
+        tracker = ProgressTracker("Document Processing")
+        for stage in ["Vector Indexing", "Research Analysis", "Quality Analysis"]:
+            tracker.add_stage(stage)
+        document = checkpoints.for_document("abc123")
+        document.start("paper.pdf")
+        return assistant._run_analysis_stages("Feedback timing study text.", {"title": "paper"}, "paper.pdf",
+                                              tracker, document)
+
+    first = run()
+    assert "error" in first["research_analysis"] and "error" in first["research:gap_analysis"]
+    calls_before = len(prompts)
+
+    second = run()
+
+    assert prompts[calls_before:] == ["gap_analysis"]
+    assert checkpoints.list_partial()[0]["pending_stages"] == []
+    research = second["research_analysis"]
+    assert [research[step]["step"] for step in research_steps.values()] == list(research_steps.values())
+
+
+def test_failed_extraction_leaves_no_partial_document(assistant, monkeypatch, tmp_path):
+    assistant.checkpoints = CheckpointStore(tmp_path / "checkpoints")
+    pdf_path = assistant.pdf_manager.pdf_dir / "scanned.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 image only")
+    monkeypatch.setattr(assistant.pdf_manager, "process_pdf", lambda path: ("", {}))
+
+    assert assistant.process_document(str(pdf_path)) == {"error": "Failed to extract text from PDF"}
+    assert assistant.checkpoints.list_partial() == []
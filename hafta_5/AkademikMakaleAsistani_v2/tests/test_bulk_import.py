@@ -0,0 +1,152 @@
+"""
+Tests for the resumable bulk importer and the shared library store behind it
+"""
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+from PyPDF2 import PdfWriter
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from bulk_import import BulkImporter
+from tools.pdf_manager import EnhancedPDFManager
+
+
+class FakeVectorDB:
+    """Records embedded documents; fail_for simulates a run interrupted while embedding"""
+
+    def __init__(self, fail_for=()):
+        self.fail_for = set(fail_for)
+        self.added = []
+        self.deleted = []
+
+    def delete_document(self, pdf_name):
+        self.deleted.append(pdf_name)
+        return True
+
+    def add_document(self, text, metadata, pdf_name):
+        if metadata["title"] in self.fail_for:
+            raise RuntimeError("interrupted")
+        self.added.append(pdf_name)
+        return True
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    manager = EnhancedPDFManager(pdf_dir=tmp_path / "pdfs", data_dir=tmp_path / "data")
+    # Blank test pages carry no text; the title stands in for the page content
+    monkeypatch.setattr(manager, "extract_text", lambda path: f"Text of {Path(path).stem}")
+    return manager
+
+
+def write_pdf(path, title):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    writer = PdfWriter()
+    writer.add_blank_page(width=595, height=842)
+    writer.add_metadata({"/Title": title})
+    with open(path, "wb") as f:
+        writer.write(f)
+    return path
+
+
+def make_folder(tmp_path, titles):
+    folder = tmp_path / "incoming"
+    for i, title in enumerate(titles):
+        write_pdf(folder / f"scan_{i}.pdf", title)
+    return folder
+
+
+def importer(manager, tmp_path, vector_db=None, workers=2):
+    return BulkImporter(manager, vector_db=vector_db, workers=workers,
+                        state_file=tmp_path / "state.json")
+
+
+TITLES = ["Online Learning in Rural Schools", "Teacher Feedback and Motivation",
+          "Crisis Detection with Transformer Models"]
+
+
+def test_interrupted_import_resumes_with_embedding_only(manager, tmp_path):
+    folder = make_folder(tmp_path, TITLES)
+
+    first = importer(manager, tmp_path, FakeVectorDB(fail_for=[TITLES[1]])).run(folder)
+    assert (first["imported"], first["failed"]) == (2, 1)
+    pending = importer(manager, tmp_path).state.data["pending_embedding"]
+    assert list(pending.values()) == ["Teacher Feedback and Motivation.pdf"]
+
+    vector_db = FakeVectorDB()
+    resumed = importer(manager, tmp_path, vector_db)
+    resumed.run(folder)
+    second = resumed.state.data
+
+    # Only the interrupted file is embedded again; it is not registered a second time
+    assert vector_db.added == ["Teacher Feedback and Motivation.pdf"]
+    # Chunks of the interrupted attempt are cleared first
+    assert vector_db.deleted == ["Teacher Feedback and Motivation.pdf"]
+    assert resumed.timer.counts["library"] == 0
+    assert second["pending_embedding"] == {}
+    assert len(second["completed"]) == 3
+    assert sorted(manager.load_metadata()) == sorted(f"{title}.pdf" for title in TITLES)
+
+
+def test_known_hashes_are_skipped(manager, tmp_path):
+    folder = make_folder(tmp_path, TITLES[:2])
+    # Already in the library from an earlier upload, not from an import run
+    existing = folder / "scan_0.pdf"
+    manager.add_to_library(existing, "text", {"title": TITLES[0]}, manager.get_file_hash(str(existing)))
+    # Same content again under another name
+    (folder / "copy_of_scan_1.pdf").write_bytes((folder / "scan_1.pdf").read_bytes())
+
+    report = importer(manager, tmp_path, workers=1).run(folder)
+    assert (report["imported"], report["skipped"]) == (1, 2)
+
+    report = importer(manager, tmp_path, workers=1).run(folder)
+    assert (report["imported"], report["skipped"]) == (0, 3)
+    assert len(manager.load_metadata()) == 2
+
+
+def test_concurrent_additions_keep_every_entry(manager, tmp_path):
+    """Same-titled files added from many threads get distinct names and no entry is lost"""
+    sources = [write_pdf(tmp_path / "incoming" / f"scan_{i}.pdf", f"Same Title {i}") for i in range(8)]
+    barrier = threading.Barrier(len(sources))
+    names = []
+
+    def add(i, source):
+        barrier.wait()
+        names.append(manager.add_to_library(source, "text", {"title": "Shared Title"}, f"hash{i}")[1])
+
+    threads = [threading.Thread(target=add, args=(i, source)) for i, source in enumerate(sources)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(names)) == len(sources)
+    assert sorted(manager.load_metadata()) == sorted(names)
+    assert sorted(manager.load_library_index()["documents"]) == sorted(names)
+    assert {manager.find_pdf_by_hash(f"hash{i}")[1] for i in range(len(sources))} == set(names)
+
+
+def test_find_pdf_by_hash(manager):
+    pdf_path = write_pdf(manager.pdf_dir / "paper.pdf", TITLES[0])
+    manager.save_metadata({"paper.pdf": {"file_path": str(pdf_path),
+                                         "extracted_metadata": {"file_hash": "legacy"}}})
+
+    assert manager.find_pdf_by_hash("unknown") is None
+    assert manager.find_pdf_by_hash("") is None
+
+    # Entries from before the hash index are found through their metadata and then indexed
+    assert manager.find_pdf_by_hash("legacy") == (str(pdf_path), "paper.pdf")
+    assert manager.load_library_index()["hashes"] == {"legacy": "paper.pdf"}
+
+    manager.register_file_hash("renamed", "paper.pdf")
+    assert manager.find_pdf_by_hash("renamed") == (str(pdf_path), "paper.pdf")
+    assert manager.get_file_hashes("paper.pdf") == ["legacy", "renamed"]
+
+    # A hash pointing at a file that is gone is not a duplicate
+    pdf_path.unlink()
+    assert manager.find_pdf_by_hash("renamed") is None
@@ -0,0 +1,95 @@
+"""
+Tests for per-chain token, latency and cache accounting
+LangChain callbacks are driven directly, as an LLMChain run would call them
+"""
+import sys
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+
+pytest.importorskip("langchain")
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from langchain.schema import LLMResult, Generation
+
+from analytics.chain_usage import ChainUsageHandler, ChainUsageTracker
+from memory.llm_cache import LLMResponseCache
+
+
+def run_step(handler, step, response_text, usage=None, chain="research_analysis", before_end=None):
+    """One LLMChain with the given output key making one chat model call"""
+    chain_run, llm_run = uuid4(), uuid4()
+    handler.on_chain_start({"kwargs": {"output_key": step}}, {}, run_id=chain_run)
+    handler.on_llm_start({}, ["Analyze this paper about feedback timing"], run_id=llm_run,
+                         parent_run_id=chain_run, metadata={"chain": chain},
+                         invocation_params={"model_name": "gpt-4o-mini"})
+    if before_end:
+        before_end()
+    llm_output = {"token_usage": usage, "model_name": "gpt-4o-mini"} if usage else None
+    handler.on_llm_end(LLMResult(generations=[[Generation(text=response_text)]], llm_output=llm_output),
+                       run_id=llm_run, parent_run_id=chain_run)
+    handler.on_chain_end({}, run_id=chain_run)
+
+
+def test_calls_are_attributed_to_chain_steps(tmp_path):
+    """Reported usage, cache hits and streamed (estimated) usage land on the right step"""
+    tracker = ChainUsageTracker()
+    handler = ChainUsageHandler(document="paper.pdf", tracker=tracker)
+    cache = LLMResponseCache(tmp_path / "llm_cache.db")
+
+    run_step(handler, "categorization", '{"research_field": "Education"}',
+             usage={"prompt_tokens": 1200, "completion_tokens": 80},
+             before_end=lambda: cache.lookup("research_analysis", "gpt-4o-mini", 0.0, "p1"))
+    cache.store("research_analysis", "gpt-4o-mini", 0.0, "p1", "response")
+    run_step(handler, "categorization", '{"research_field": "Education"}',
+             before_end=lambda: cache.lookup("research_analysis", "gpt-4o-mini", 0.0, "p1"))
+    run_step(handler, "findings_analysis", "Immediate feedback improved scores " * 20)
+
+    report = handler.report()
+    assert report["document"] == "paper.pdf"
+    assert report["calls"] == 3
+
+    categorization = report["by_step"]["research_analysis.categorization"]
+    assert categorization["calls"] == 2
+    assert categorization["prompt_tokens"] == 1200 and categorization["completion_tokens"] == 80
+    assert categorization["cache"]["miss"] == 1 and categorization["cache"]["hit"] == 1
+    assert categorization["cost"] > 0
+
+    # Streamed responses carry no usage: tokens are counted locally
+    findings = report["by_step"]["research_analysis.findings_analysis"]
+    assert findings["estimated_calls"] == 1
+    assert findings["completion_tokens"] > 0
+    assert findings["cache"]["off"] == 1
+
+    stats = tracker.get_stats()
+    assert stats["research_analysis.categorization"]["cache_hit_rate"] == 0.5
+    assert stats["research_analysis.categorization"]["p95_prompt_tokens"] == 1200
+
+
+def test_errors_and_direct_calls_with_rolling_percentiles():
+    """Calls outside an LLMChain are "direct"; failures count without skewing percentiles"""
+    tracker = ChainUsageTracker(history_size=10)
+    handler = ChainUsageHandler(tracker=tracker)
+
+    for tokens in range(1, 21):
+        run_id = uuid4()
+        handler.on_chat_model_start({}, [[Generation(text="Summarize the session")]], run_id=run_id,
+                                    metadata={"chain": "research_memory"})
+        handler.on_llm_end(LLMResult(generations=[[Generation(text="ok")]],
+                                     llm_output={"token_usage": {"prompt_tokens": tokens, "completion_tokens": 1}}),
+                           run_id=run_id)
+    failed = uuid4()
+    handler.on_llm_start({}, ["prompt"], run_id=failed, metadata={"chain": "research_memory"})
+    handler.on_llm_error(RuntimeError("timeout"), run_id=failed)
+
+    stats = tracker.get_stats()["research_memory.direct"]
+    assert stats["calls"] == 21 and stats["errors"] == 1
+    # Only the last 10 successful calls (prompt tokens 11-20) are in the rolling window
+    assert stats["p50_prompt_tokens"] == 15
+    assert stats["p95_prompt_tokens"] == 20
+    assert stats["prompt_tokens"] == sum(range(1, 21))
+    assert handler.report()["errors"] == 1
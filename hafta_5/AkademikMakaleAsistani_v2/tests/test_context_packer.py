@@ -0,0 +1,69 @@
+"""
+Tests for token-budgeted context packing
+Work with tiktoken or with the character-based estimate when it is unavailable
+"""
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from tools.context_packer import ContextPacker
+
+OVERLAP = "The participants were randomly assigned to two groups of sixty students each. "
+FIRST = "This study examines feedback in online courses. " * 4 + OVERLAP
+SECOND = OVERLAP + "Results show that immediate feedback improved exam scores significantly. " * 3
+
+
+def meta(pdf_name, chunk_id, score):
+    return {"pdf_name": pdf_name, "chunk_id": chunk_id, "similarity_score": score}
+
+
+def test_chunks_are_ordered_by_score():
+    """Higher similarity chunks come first in the packed context"""
+    packer = ContextPacker(max_tokens=2000)
+
+    packed = packer.pack(["low", "high", "mid"], [meta("a.pdf", 0, 0.2), meta("b.pdf", 0, 0.9), meta("c.pdf", 0, 0.5)])
+
+    assert packed["documents"] == ["high", "mid", "low"]
+    assert [m["pdf_name"] for m in packed["metadatas"]] == ["b.pdf", "c.pdf", "a.pdf"]
+
+
+def test_overlap_between_adjacent_chunks_is_removed():
+    """The splitter overlap shared by neighbouring chunks appears only once"""
+    packer = ContextPacker(max_tokens=2000)
+
+    packed = packer.pack([SECOND, FIRST], [meta("a.pdf", 1, 0.9), meta("a.pdf", 0, 0.8)])
+    context = "\n\n".join(packed["documents"])
+
+    assert context.count(OVERLAP.strip()) == 1
+    assert packed["overlap_chars_removed"] >= len(OVERLAP.strip())
+    # Overlap between different papers is not touched
+    other = packer.pack([SECOND, FIRST], [meta("a.pdf", 1, 0.9), meta("b.pdf", 0, 0.8)])
+    assert other["overlap_chars_removed"] == 0
+
+
+def test_budget_is_respected():
+    """The packed context never exceeds the budget; the last chunk may be truncated"""
+    chunks = ["Sentence about learning outcomes number %d. " % i * 20 for i in range(5)]
+    metadatas = [meta("a.pdf", i * 10, 1 - i / 10) for i in range(5)]
+    packer = ContextPacker(max_tokens=300, min_chunk_tokens=20)
+
+    packed = packer.pack(chunks, metadatas)
+    context = "\n\n".join(packed["documents"])
+
+    assert packer.counter.count(context) <= 300
+    assert packed["context_tokens"] <= 300
+    assert packed["truncated"] + packed["dropped"] > 0
+    assert packed["original_tokens"] > 300
+
+
+def test_duplicate_chunk_is_dropped():
+    """A chunk fully contained in an already packed chunk adds nothing"""
+    packer = ContextPacker(max_tokens=2000)
+
+    packed = packer.pack([FIRST, OVERLAP], [meta("a.pdf", 0, 0.9), meta("a.pdf", 1, 0.5)])
+
+    assert packed["documents"] == [FIRST]
+    assert packed["dropped"] == 1
@@ -0,0 +1,134 @@
+"""
+Tests for the extractive document digest shared by the analysis prompts
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from tools.document_digest import DocumentDigester
+
+FILLER = "The classroom observations were recorded by two trained observers during the semester. "
+
+PAPER = "\n".join([
+    "Feedback Timing and Learning Outcomes",
+    "Abstract",
+    "This study examines how the timing of feedback affects exam performance of university students.",
+    "Immediate feedback improved final exam scores compared with delayed feedback.",
+    "1. Introduction",
+    FILLER * 40,
+    "Prior work on feedback timing reports mixed results for learning outcomes in higher education.",
+    "2. Method",
+    FILLER * 40,
+    "The sample consisted of 240 undergraduate students randomly assigned to two feedback conditions.",
+    "3. Results",
+    FILLER * 40,
+    "Results show that immediate feedback significantly increased exam scores (p < .01, r = .34).",
+    "4. Discussion",
+    FILLER * 40,
+    "A limitation of this study is that all participants came from a single university.",
+    "References",
+    "Smith, J. (2020). Feedback in higher education settings and student achievement. Journal of Learning, 12, 1-20.",
+])
+
+
+def make_digester(tmp_path, max_chars=1500):
+    return DocumentDigester(max_chars=max_chars, cache_dir=tmp_path / "digests")
+
+
+def test_digest_keeps_structure_within_budget(tmp_path):
+    """Headings, the abstract and one key sentence per content section fit in max_chars"""
+    digest = make_digester(tmp_path).build(PAPER)
+
+    assert digest["headings"] == ["Abstract", "1. Introduction", "2. Method", "3. Results",
+                                  "4. Discussion", "References"]
+    assert digest["abstract"].startswith("This study examines how the timing of feedback")
+    assert len(digest["text"]) <= 1500
+    assert digest["digest_tokens"] < digest["original_tokens"] / 4
+
+    sections = {sentence["section"] for sentence in digest["key_sentences"]}
+    assert {"1. Introduction", "2. Method", "3. Results", "4. Discussion"} <= sections
+    # Cue phrases and statistics outrank the repeated filler sentence
+    assert "Results show that immediate feedback significantly increased exam scores" in digest["text"]
+    assert "Smith, J. (2020)" not in digest["text"]
+
+
+def test_digest_is_stored_by_file_hash(tmp_path, monkeypatch):
+    """A new digester reuses the stored digest of the same file instead of rebuilding it"""
+    make_digester(tmp_path).build(PAPER, file_hash="abc123")
+    assert (tmp_path / "digests" / "abc123.json").exists()
+
+    reopened = make_digester(tmp_path)
+    monkeypatch.setattr(reopened, "_extract", lambda text: pytest.fail("digest rebuilt"))
+    assert reopened.build(PAPER, file_hash="abc123")["file_hash"] == "abc123"
+
+    # Different text under the same hash (e.g. a new extractor) is rebuilt
+    monkeypatch.undo()
+    assert reopened.build(PAPER + "\nAppendix", file_hash="abc123")["text_hash"] != \
+        reopened.build(PAPER)["text_hash"]
+
+
+def test_prompt_substitution_reports_saved_tokens(tmp_path):
+    """Each prompt given the digest counts the excerpt tokens it replaced"""
+    digester = make_digester(tmp_path)
+
+    assert digester.for_prompt(PAPER, PAPER[:8000], consumer="research_analysis", calls=3) == \
+        digester.build(PAPER)["text"]
+    digester.for_prompt(PAPER, PAPER[-8000:], consumer="article_analyzer")
+    # Short excerpts are sent unchanged and not counted
+    assert digester.for_prompt(PAPER, PAPER[:200], consumer="article_analyzer") == PAPER[:200]
+
+    report = digester.report(PAPER)
+    assert report["prompt_calls"] == 4
+    assert report["consumers"]["research_analysis"]["calls"] == 3
+    assert report["input_tokens_with_digest"] == 4 * report["digest_tokens"]
+    assert report["tokens_saved"] == report["input_tokens_without_digest"] - report["input_tokens_with_digest"]
+    assert report["tokens_saved"] > 0
+    assert digester.get_stats()["tokens_saved"] == report["tokens_saved"]
+
+
+def test_digest_mode_sends_the_digest_to_every_research_step(tmp_path, monkeypatch, scripted_llm):
+    """With LONG_DOCUMENT_MODE=digest a real analysis chain prompts with the shared digest"""
+    pytest.importorskip("langchain")
+    import tools.document_digest as document_digest
+    from chains.research_chains import ResearchAnalysisChain
+
+    digester = make_digester(tmp_path)
+    monkeypatch.setattr(document_digest, "_digester", digester)
+    monkeypatch.setenv("LONG_DOCUMENT_MODE", "digest")
+    prompts = []
+    scripted_llm(lambda prompt: prompts.append(prompt) or "{}")
+
+    ResearchAnalysisChain().analyze_document(PAPER, "Feedback Timing and Learning Outcomes")
+
+    digest = digester.build(PAPER)["text"]
+    assert len(prompts) == 4
+    assert all(digest in prompt and FILLER * 2 not in prompt for prompt in prompts)
+    assert digester.report(PAPER)["consumers"]["research_analysis"]["calls"] == 4
+
+
+def test_article_prompts_are_labelled_as_digest_or_excerpt(tmp_path, monkeypatch):
+    """The article analyzer's prompt says whether it carries the digest or a raw excerpt"""
+    pytest.importorskip("langchain")
+    import tools.document_digest as document_digest
+    from tools.article_analyzer import EnhancedArticleAnalyzer
+
+    digester = make_digester(tmp_path)
+    monkeypatch.setattr(document_digest, "_digester", digester)
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    analyzer = EnhancedArticleAnalyzer()
+
+    monkeypatch.setenv("LONG_DOCUMENT_MODE", "digest")
+    digest_prompt = analyzer._prompt_text(PAPER, PAPER[:8000], "İlk 8000 karakter")
+    assert digest_prompt == "Makale Metni (tam metinden seçilmiş cümlelerle özet):\n" + digester.build(PAPER)["text"]
+    # An excerpt shorter than the digest is sent, and labelled, as is
+    assert analyzer._prompt_text(PAPER, PAPER[:200], "İlk 200 karakter") == \
+        "Makale Metni (İlk 200 karakter):\n" + PAPER[:200]
+
+    monkeypatch.setenv("LONG_DOCUMENT_MODE", "truncate")
+    assert analyzer._prompt_text(PAPER, PAPER[-8000:], "Son 8000 karakter") == \
+        "Makale Metni (Son 8000 karakter):\n" + PAPER[-8000:]
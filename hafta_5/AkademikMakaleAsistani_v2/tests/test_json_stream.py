@@ -0,0 +1,87 @@
+"""
+Tests for incremental parsing of streamed JSON chain output
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from streaming.json_stream import IncrementalJSONParser
+
+CATEGORIZATION = {
+    "research_field": "Eğitim teknolojileri",
+    "research_type": "Ampirik",
+    "methodology": "Yarı deneysel \"ön test-son test\" desen, {kontrol grubu}",
+    "novelty_score": 7,
+    "keywords": ["geri bildirim", "sınav, başarı"],
+    "scores": {"rigor": 8.5, "clarity": None},
+}
+RESPONSE = "```json\n" + json.dumps(CATEGORIZATION, ensure_ascii=False, indent=2) + "\n```"
+
+
+def stream(text, chunk_size):
+    return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 64, len(RESPONSE)])
+def test_every_field_is_reported_once_for_any_chunking(chunk_size):
+    """Chunk boundaries inside strings, escapes or numbers do not change the result"""
+    parser = IncrementalJSONParser()
+    fields = []
+    for chunk in stream(RESPONSE, chunk_size):
+        fields += parser.feed(chunk)
+
+    assert dict((path[0], value) for path, value in fields) == CATEGORIZATION
+    assert [path for path, _ in fields] == [(key,) for key in CATEGORIZATION]
+    assert parser.done
+
+
+def test_fields_are_reported_as_soon_as_they_are_complete():
+    """The research type is available before the rest of the response has arrived"""
+    parser = IncrementalJSONParser()
+    cut = RESPONSE.index('"methodology"')
+
+    early = parser.feed(RESPONSE[:cut])
+    assert early == [(("research_field",), "Eğitim teknolojileri"), (("research_type",), "Ampirik")]
+
+    # A number is complete only once the character after it arrives
+    number_end = RESPONSE.index("7,") + 1
+    assert [path for path, _ in parser.feed(RESPONSE[cut:number_end])] == [("methodology",)]
+    assert parser.feed(RESPONSE[number_end:number_end + 1]) == [(("novelty_score",), 7)]
+
+
+def test_nested_fields_up_to_max_depth():
+    """Nested members are reported before their parent object when max_depth allows"""
+    parser = IncrementalJSONParser(max_depth=2)
+    paths = [path for path, _ in parser.feed(RESPONSE)]
+
+    assert paths[-3:] == [("scores", "rigor"), ("scores", "clarity"), ("scores",)]
+
+
+def test_handler_reports_step_fields_and_unstreamed_responses():
+    """The callback handler reports streamed tokens, or the whole response at the end"""
+    pytest.importorskip("langchain")
+    from langchain.schema import LLMResult, Generation
+    from streaming.handlers import JSONFieldStreamHandler
+
+    reported = []
+    handler = JSONFieldStreamHandler("categorization", lambda *field: reported.append(field))
+    handler.on_llm_start({}, ["prompt"])
+    for token in stream(RESPONSE, 3):
+        handler.on_llm_new_token(token)
+    handler.on_llm_end(LLMResult(generations=[[Generation(text=RESPONSE)]]))
+    assert reported[:2] == [("categorization", "research_field", "Eğitim teknolojileri"),
+                            ("categorization", "research_type", "Ampirik")]
+    assert len(reported) == len(CATEGORIZATION)
+
+    # A cached response produces no tokens; its fields are reported at on_llm_end
+    cached = []
+    handler = JSONFieldStreamHandler("categorization", lambda *field: cached.append(field))
+    handler.on_llm_start({}, ["prompt"])
+    handler.on_llm_end(LLMResult(generations=[[Generation(text=RESPONSE)]]))
+    assert cached == reported
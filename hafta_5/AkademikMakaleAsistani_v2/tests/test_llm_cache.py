@@ -0,0 +1,94 @@
+"""
+Tests for the persistent LLM response cache
+"""
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from memory.llm_cache import LLMResponseCache
+
+
+def make_cache(tmp_path, max_temperature=0.0):
+    return LLMResponseCache(tmp_path / "llm_cache.sqlite3", max_temperature=max_temperature)
+
+
+def test_responses_survive_reopening(tmp_path):
+    """A stored response is found again by a new cache instance on the same file"""
+    cache = make_cache(tmp_path)
+    prompt_hash = cache.prompt_hash("Categorize this paper", "model_name=gpt-4o")
+
+    assert cache.lookup("research_analysis", "gpt-4o", 0.0, prompt_hash) is None
+    cache.store("research_analysis", "gpt-4o", 0.0, prompt_hash, '{"research_field": "Eğitim"}')
+    cache.close()
+
+    reopened = make_cache(tmp_path)
+    assert reopened.lookup("research_analysis", "gpt-4o", 0.0, prompt_hash) == '{"research_field": "Eğitim"}'
+    # Model and parameters are part of the key
+    assert reopened.lookup("research_analysis", "gpt-4o-mini", 0.0, prompt_hash) is None
+    assert reopened.lookup("research_analysis", "gpt-4o", 0.0,
+                           reopened.prompt_hash("Categorize this paper", "model_name=gpt-4o, stop=x")) is None
+
+
+def test_sampling_temperatures_bypass_the_cache(tmp_path):
+    cache = make_cache(tmp_path)
+    prompt_hash = cache.prompt_hash("Write an introduction")
+
+    cache.store("academic_writing", "gpt-4o", 0.7, prompt_hash, "draft")
+
+    assert cache.lookup("academic_writing", "gpt-4o", 0.7, prompt_hash) is None
+    stats = cache.get_stats()
+    assert stats["entries"] == 0
+    assert stats["chains"]["academic_writing"]["bypassed"] == 1
+    assert stats["chains"]["academic_writing"]["misses"] == 0
+
+
+def test_hit_rates_per_chain_and_purge(tmp_path):
+    cache = make_cache(tmp_path)
+    for chain in ("research_analysis", "document_analysis"):
+        prompt_hash = cache.prompt_hash(f"{chain} prompt")
+        cache.lookup(chain, "gpt-4o", 0.0, prompt_hash)
+        cache.store(chain, "gpt-4o", 0.0, prompt_hash, "response")
+    for _ in range(3):
+        cache.lookup("research_analysis", "gpt-4o", 0.0, cache.prompt_hash("research_analysis prompt"))
+
+    stats = cache.get_stats()["chains"]
+    assert stats["research_analysis"]["hit_rate"] == 0.75
+    assert stats["document_analysis"]["hit_rate"] == 0.0
+    assert cache.list_entries("research_analysis")[0]["hits"] == 3
+
+    assert cache.purge(older_than_days=1) == 0
+    assert cache.purge(chain="document_analysis") == 1
+    assert cache.get_stats()["entries"] == 1
+    assert cache.purge() == 1
+    assert cache.get_stats()["chains"] == {}
+
+
+def test_default_chains_are_cached(scripted_llm):
+    """The analysis chains run at temperature 0 and are cached; the sampling writing chain is not"""
+    from chains.analysis_chains import DocumentAnalysisChain
+    from chains.research_chains import ResearchAnalysisChain
+    from chains.writing_chains import AcademicWritingChain
+    from memory.llm_cache import get_llm_cache
+
+    prompts = []
+    models = scripted_llm(lambda prompt: prompts.append(prompt) or
+                          '{"research_field": "Eğitim", "research_type": "Ampirik"}')
+    research = ResearchAnalysisChain()
+    writing = AcademicWritingChain()
+    DocumentAnalysisChain()
+
+    first = research.categorize("Feedback timing and exam performance of students.", "Feedback Timing")
+    assert research.categorize("Feedback timing and exam performance of students.", "Feedback Timing") == first
+    writing.improve_paragraph("Feedback was given fast.")
+    writing.improve_paragraph("Feedback was given fast.")
+    assert len(prompts) == 3
+
+    cache = get_llm_cache()
+    assert [model.temperature for model in models] == [0.0, 0.3, 0.0, 0.0]
+    chains = cache.get_stats()["chains"]
+    assert chains["research_analysis"]["hits"] == 1
+    assert chains["academic_writing"]["hits"] == 0
+    assert chains["academic_writing"]["bypassed"] == 2
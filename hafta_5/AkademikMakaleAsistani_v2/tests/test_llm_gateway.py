@@ -0,0 +1,265 @@
+"""
+Tests for the pooled LLM gateway against a local fake OpenAI-compatible server
+No API key or network access needed
+"""
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("httpx")
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from tools.llm_gateway import LLMGateway, llm_priority, INTERACTIVE, BACKGROUND
+
+
+class FakeOpenAIServer:
+    """Minimal /v1/chat/completions endpoint with scripted failures and latency"""
+
+    def __init__(self, delay: float = 0.0, fail_first: int = 0):
+        self.delay = delay
+        self.fail_first = fail_first
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.client_ports = set()
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server._lock:
+                    server.requests += 1
+                    attempt = server.requests
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                    server.client_ports.add(self.client_address[1])
+                try:
+                    time.sleep(server.delay)
+                    if attempt <= server.fail_first:
+                        self._send_json(429, {"error": {"message": "rate limited", "type": "rate_limit"}},
+                                        {"Retry-After": "0"})
+                    elif body.get("stream"):
+                        self._send_stream(body["model"])
+                    else:
+                        self._send_json(200, {
+                            "id": "chatcmpl-test", "object": "chat.completion", "created": 0,
+                            "model": body["model"],
+                            "choices": [{"index": 0, "finish_reason": "stop",
+                                         "message": {"role": "assistant", "content": "ok"}}],
+                            "usage": {"prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15}
+                        })
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, model):
+                events = []
+                for token in ["a", "b", "c"]:
+                    events.append({"id": "chatcmpl-test", "object": "chat.completion.chunk", "created": 0,
+                                   "model": model,
+                                   "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]})
+                data = b"".join(f"data: {json.dumps(event)}\n\n".encode() for event in events)
+                data += b"data: [DONE]\n\n"
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_port}/v1"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def make_gateway():
+    servers, gateways = [], []
+
+    def factory(max_concurrency=4, max_retries=3, background_limit=None, **server_options):
+        server = FakeOpenAIServer(**server_options)
+        gateway = LLMGateway(api_key="sk-test", base_url=server.base_url,
+                             max_concurrency=max_concurrency, max_retries=max_retries,
+                             backoff_base=0.01, background_limit=background_limit or max_concurrency)
+        servers.append(server)
+        gateways.append(gateway)
+        return gateway, server
+
+    yield factory
+
+    for gateway in gateways:
+        gateway.close()
+    for server in servers:
+        server.close()
+
+
+def ask(gateway, model="gpt-4o-mini"):
+    return gateway.chat_completion(model=model, messages=[{"role": "user", "content": "hi"}])
+
+
+def test_sequential_calls_reuse_one_connection(make_gateway):
+    """The pooled client keeps the connection alive between calls"""
+    gateway, server = make_gateway()
+
+    for _ in range(5):
+        assert ask(gateway).choices[0].message.content == "ok"
+
+    assert server.requests == 5
+    assert len(server.client_ports) == 1
+
+
+def test_rate_limited_calls_are_retried(make_gateway):
+    """429 responses are retried with backoff and counted in the stats"""
+    gateway, server = make_gateway(fail_first=2)
+
+    response = ask(gateway)
+
+    assert response.choices[0].message.content == "ok"
+    assert server.requests == 3
+    stats = gateway.get_stats()
+    assert stats["calls"] == 1
+    assert stats["retries"] == 2
+    assert stats["errors"] == 0
+
+
+def test_retries_give_up_after_limit(make_gateway):
+    """After max_retries the error reaches the caller and is recorded"""
+    import openai
+
+    gateway, server = make_gateway(max_retries=1, fail_first=10)
+
+    with pytest.raises(openai.RateLimitError):
+        ask(gateway)
+
+    assert server.requests == 2
+    assert gateway.get_stats()["errors"] == 1
+
+
+def test_global_concurrency_limit(make_gateway):
+    """No more than max_concurrency requests are in flight at once"""
+    gateway, server = make_gateway(max_concurrency=2, delay=0.05)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: ask(gateway), range(8)))
+
+    assert server.requests == 8
+    assert server.max_in_flight <= 2
+
+
+def test_timing_and_token_accounting(make_gateway):
+    """Usage from each response is accumulated per model"""
+    gateway, server = make_gateway()
+
+    ask(gateway, model="gpt-4o")
+    ask(gateway, model="gpt-4o-mini")
+    ask(gateway, model="gpt-4o-mini")
+
+    stats = gateway.get_stats()
+    assert stats["calls"] == 3
+    assert stats["prompt_tokens"] == 36
+    assert stats["completion_tokens"] == 9
+    assert stats["by_model"]["gpt-4o-mini"]["calls"] == 2
+    assert stats["total_seconds"] > 0
+
+
+def test_streaming_releases_slot_after_consumption(make_gateway):
+    """A streamed call holds its slot until the stream is read, then is recorded"""
+    gateway, server = make_gateway(max_concurrency=1)
+
+    stream = gateway.chat_completion(model="gpt-4o", stream=True,
+                                     messages=[{"role": "user", "content": "hi"}])
+    tokens = [chunk.choices[0].delta.content for chunk in stream if chunk.choices]
+
+    assert "".join(tokens) == "abc"
+    # The single slot is free again, so a second call does not block
+    assert ask(gateway).choices[0].message.content == "ok"
+
+    stats = gateway.get_stats()
+    assert stats["calls"] == 2
+    assert stats["completion_tokens"] == 3 + 3
+
+
+def test_interactive_requests_preempt_queued_background_work(make_gateway):
+    """A question queued behind background analysis is admitted before it"""
+    gateway, server = make_gateway(max_concurrency=1, delay=0.05)
+    finished = []
+    lock = threading.Lock()
+
+    def call(priority_class, label):
+        with llm_priority(priority_class):
+            ask(gateway)
+        with lock:
+            finished.append(label)
+
+    background = [threading.Thread(target=call, args=(BACKGROUND, f"analysis-{i}")) for i in range(6)]
+    for thread in background:
+        thread.start()
+    # Let the analysis calls fill the slot and the queue
+    while gateway.get_stats()["scheduling"]["classes"][BACKGROUND]["queued"] < 5:
+        time.sleep(0.005)
+
+    question = threading.Thread(target=call, args=(INTERACTIVE, "question"))
+    question.start()
+    for thread in background + [question]:
+        thread.join()
+
+    # Only the analysis call already running finishes before the question
+    assert finished.index("question") <= 1
+    scheduling = gateway.get_stats()["scheduling"]["classes"]
+    assert scheduling[INTERACTIVE]["requests"] == 1
+    assert scheduling[BACKGROUND]["requests"] == 6
+    assert scheduling[BACKGROUND]["max_wait"] > scheduling[INTERACTIVE]["max_wait"]
+
+
+def test_background_limit_leaves_headroom_for_questions(make_gateway):
+    """Background traffic never takes every slot, so a question starts immediately"""
+    gateway, server = make_gateway(max_concurrency=3, background_limit=2, delay=0.1)
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        def background_call(_):
+            with llm_priority(BACKGROUND):
+                return ask(gateway)
+
+        futures = [pool.submit(background_call, i) for i in range(6)]
+        time.sleep(0.02)
+        assert gateway.get_stats()["scheduling"]["classes"][BACKGROUND]["running"] <= 2
+
+        start = time.perf_counter()
+        ask(gateway)
+        question_latency = time.perf_counter() - start
+        for future in futures:
+            future.result()
+
+    assert server.max_in_flight <= 3
+    # One server round trip, no queueing behind the six analysis calls
+    assert question_latency < 0.25
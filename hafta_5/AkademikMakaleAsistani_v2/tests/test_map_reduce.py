@@ -0,0 +1,91 @@
+"""
+Tests for the section map-reduce used on long documents
+The map LLM calls go to a scripted chat model
+"""
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("langchain")
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from chains.map_reduce import SectionMapReducer
+
+PARAGRAPH = "Participants who received immediate feedback scored higher on the final exam. " * 10
+
+
+class ConcurrentNotes:
+    """Map responses that wait briefly for a second call in flight, recording the peak"""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.condition = threading.Condition()
+
+    def __call__(self, prompt):
+        with self.condition:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.condition.notify_all()
+            self.condition.wait_for(lambda: self.peak >= 2, timeout=1)
+            self.active -= 1
+        index = re.search(r"(\d+)/\d+\. bölümüdür", prompt).group(1)
+        return f"notes of section {index} " * 200
+
+
+@pytest.fixture
+def make_reducer(scripted_llm):
+    def make(max_section_tokens=2000):
+        respond = ConcurrentNotes()
+        models = scripted_llm(respond)
+        reducer = SectionMapReducer(max_section_tokens=max_section_tokens, max_workers=8)
+        return reducer, models[0], respond
+    return make
+
+
+def test_sections_respect_the_token_limit_and_keep_all_text(make_reducer):
+    reducer, _, _ = make_reducer()
+    text = "\n\n".join(PARAGRAPH for _ in range(40))
+
+    sections = reducer.split(text)
+
+    assert len(sections) > 1
+    assert all(reducer.counter.count(section) <= 2000 for section in sections)
+    assert "".join(sections).replace("\n", "").replace(" ", "") == text.replace("\n", "").replace(" ", "")
+
+
+def test_long_text_is_condensed_concurrently_and_shared(make_reducer):
+    """Sections are mapped in parallel; concurrent callers for the same text share one map phase"""
+    reducer, model, respond = make_reducer()
+    text = "\n\n".join(PARAGRAPH for _ in range(40))
+    sections = len(reducer.split(text))
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = list(pool.map(lambda _: reducer.condense(text, 8000, title="Feedback"), range(3)))
+
+    assert model.calls == sections
+    assert respond.peak >= 2
+    assert model.metadata == {"chain": "section_notes"}
+    result = results[0]
+    assert result["condensed"] and result["sections"] == sections
+    assert len(result["text"]) <= 8000
+    assert result["text"].startswith("[Bölüm 1/")
+    # Reduced in document order whatever order the map calls finished in
+    assert result["text"].index("notes of section 1 ") < result["text"].index("notes of section 2 ")
+    assert all(r["text"] == result["text"] for r in results)
+
+
+def test_short_text_is_unchanged(make_reducer):
+    reducer, model, _ = make_reducer()
+
+    result = reducer.condense(PARAGRAPH, 8000)
+
+    assert result["text"] == PARAGRAPH and not result["condensed"]
+    assert model.calls == 0
@@ -0,0 +1,224 @@
+"""
+Tests for local metadata extraction and the library store of the PDF manager
+"""
+import hashlib
+import io
+import sys
+from pathlib import Path
+
+import pytest
+from PyPDF2 import PdfWriter
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from tools.pdf_manager import EnhancedPDFManager
+
+TITLE = "Online Learning and Student Achievement in Rural Schools"
+AUTHORS = "Ayşe Yılmaz; John Smith"
+# First page with the publication year on the journal line and older years in citations
+FIRST_PAGE = ("Journal of Rural Education, Vol. 12, 2021\n"
+              "Received 3 March 2019; revised 8 January 2020\n"
+              "Earlier studies (Smith, 2015) reported mixed effects.")
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    return EnhancedPDFManager(pdf_dir=tmp_path / "pdfs", data_dir=tmp_path / "data")
+
+
+class Upload(io.BytesIO):
+    """In-memory upload like Streamlit's UploadedFile, optionally without a size attribute"""
+
+    def __init__(self, data, name="paper.pdf"):
+        super().__init__(data)
+        self.name = name
+
+
+class SizedUpload(Upload):
+    def __init__(self, data, name="paper.pdf", size=None):
+        super().__init__(data, name)
+        self.size = len(data) if size is None else size
+        self.reads = 0
+
+    def read(self, *args):
+        self.reads += 1
+        return super().read(*args)
+
+
+def write_pdf(path, title=None, author=AUTHORS):
+    writer = PdfWriter()
+    writer.add_blank_page(width=595, height=842)
+    if title:
+        writer.add_metadata({"/Title": title})
+    if author:
+        writer.add_metadata({"/Author": author})
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+def font_lines(monkeypatch, candidates, body_size=10.0):
+    monkeypatch.setattr(EnhancedPDFManager, "_get_large_font_lines",
+                        lambda self, page: (candidates, body_size))
+
+
+def test_title_confidence_follows_the_agreeing_sources(manager, tmp_path, monkeypatch):
+    """Info title and layout agreeing score highest, a single source scores below the threshold"""
+    with_info = write_pdf(tmp_path / "info.pdf", title=TITLE)
+    without_info = write_pdf(tmp_path / "plain.pdf")
+
+    font_lines(monkeypatch, [{"text": TITLE, "size": 18.0}])
+    assert manager.extract_metadata_heuristically(with_info, FIRST_PAGE)["metadata_confidence"] == 0.95
+
+    font_lines(monkeypatch, [])
+    metadata = manager.extract_metadata_heuristically(with_info, FIRST_PAGE)
+    assert metadata["title"] == TITLE
+    assert metadata["metadata_confidence"] == 0.7
+
+    # A font candidate alone, with and without a clearly larger size than the body text
+    font_lines(monkeypatch, [{"text": TITLE, "size": 11.0}])
+    assert manager.extract_metadata_heuristically(without_info, FIRST_PAGE)["metadata_confidence"] == 0.6
+    font_lines(monkeypatch, [{"text": TITLE, "size": 12.0}])
+    assert manager.extract_metadata_heuristically(without_info, FIRST_PAGE)["metadata_confidence"] == 0.75
+
+
+def test_missing_authors_or_year_keep_a_sure_title_below_the_threshold(manager, tmp_path, monkeypatch):
+    font_lines(monkeypatch, [{"text": TITLE, "size": 18.0}])
+    no_authors = write_pdf(tmp_path / "no_authors.pdf", title=TITLE, author=None)
+    with_authors = write_pdf(tmp_path / "authors.pdf", title=TITLE)
+
+    metadata = manager.extract_metadata_heuristically(no_authors, FIRST_PAGE)
+    assert (metadata["authors"], metadata["publication_year"]) == ([], "2021")
+    assert metadata["metadata_confidence"] < manager.heuristic_confidence_threshold
+
+    metadata = manager.extract_metadata_heuristically(with_authors, "Introduction without dates.")
+    assert metadata["publication_year"] == ""
+    assert metadata["metadata_confidence"] < manager.heuristic_confidence_threshold
+
+    assert manager.extract_metadata_heuristically(no_authors, "No dates.")["metadata_confidence"] < 0.5
+
+
+def test_publication_year_avoids_received_dates_and_citations(manager):
+    assert manager._find_publication_year(FIRST_PAGE) == "2021"
+    assert manager._find_publication_year("Published online: 4 May 2022\n(Smith, 2015)") == "2022"
+    assert manager._find_publication_year("© 2018 Elsevier Ltd. All rights reserved.") == "2018"
+    # A single year is unambiguous; several without a publication line are not
+    assert manager._find_publication_year("Conference paper, September 2020") == "2020"
+    assert manager._find_publication_year("Received 2019, revised 2020. As shown by Lee (2011)") == ""
+
+
+def test_heuristic_metadata_guesses_language_and_research_type(manager, tmp_path, monkeypatch):
+    pdf_path = write_pdf(tmp_path / "paper.pdf", title=TITLE)
+    font_lines(monkeypatch, [])
+
+    english = manager.extract_metadata_heuristically(
+        pdf_path, "Abstract: We ran a survey of 400 students and a regression on their grades.")
+    turkish = manager.extract_metadata_heuristically(
+        pdf_path, "Özet: Bu çalışmada öğretmenlerle yarı yapılandırılmış görüşmeler yapılmıştır.")
+
+    assert (english["language"], english["research_type"]) == ("english", "nicel")
+    assert (turkish["language"], turkish["research_type"]) == ("turkish", "nitel")
+    assert english["research_field"] == ""
+
+
+def test_threshold_decides_between_heuristics_and_llm(manager, monkeypatch):
+    """Confidence at the threshold skips the LLM; below it one call is made and cached per file"""
+    llm_calls = []
+    manager.openai_client = object()
+    monkeypatch.setattr(manager, "_extract_metadata_with_llm",
+                        lambda text: llm_calls.append(text) or {"title": "LLM title", "journal": "Journal"})
+
+    def heuristic(confidence):
+        monkeypatch.setattr(manager, "extract_metadata_heuristically", lambda path, text="": {
+            "title": "Heuristic title", "journal": "", "metadata_confidence": confidence})
+
+    heuristic(0.8)
+    metadata = manager.extract_document_metadata("paper.pdf", "text", file_hash="abc")
+    assert (metadata["title"], metadata["metadata_source"]) == ("Heuristic title", "heuristic")
+    assert llm_calls == []
+
+    heuristic(0.79)
+    metadata = manager.extract_document_metadata("paper.pdf", "text", file_hash="abc")
+    assert (metadata["title"], metadata["journal"], metadata["metadata_source"]) == ("LLM title", "Journal", "llm")
+    manager.extract_document_metadata("paper.pdf", "text", file_hash="abc")
+    assert len(llm_calls) == 1
+
+    assert manager.get_metadata_source_counts() == {"heuristic": 1, "llm": 1, "llm_cache": 1}
+    assert manager.get_pdf_library_info()["metadata_extraction"]["llm_cache"] == 1
+
+
+def test_research_categorization_fills_missing_fields_once(manager):
+    manager.save_metadata({"paper.pdf": {"extracted_metadata": {
+        "research_field": "", "research_type": "nicel", "metadata_source": "heuristic"}}})
+    manager._update_library_index("paper.pdf", {"title": TITLE}, "")
+
+    categorization = {"research_field": "Eğitim Teknolojileri", "research_type": "Ampirik"}
+    assert manager.apply_research_categorization("paper.pdf", categorization)
+    assert not manager.apply_research_categorization("paper.pdf", categorization)
+
+    extracted = manager.get_pdf_metadata("paper.pdf")["extracted_metadata"]
+    assert (extracted["research_field"], extracted["research_type"]) == ("Eğitim Teknolojileri", "nicel")
+    assert manager.load_library_index()["categories"] == {"Eğitim Teknolojileri": ["paper.pdf"]}
+
+    library = manager.get_pdf_library_info()
+    assert library["research_fields"] == ["Eğitim Teknolojileri"]
+    assert library["metadata_sources"] == {"heuristic": 1}
+
+
+def test_oversized_upload_without_size_is_stopped_while_streaming(tmp_path, monkeypatch):
+    """Without a declared size the limit is enforced on the bytes read, and no partial file is left"""
+    monkeypatch.setenv("MAX_UPLOAD_SIZE", "1")
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    manager = EnhancedPDFManager(pdf_dir=tmp_path / "pdfs", data_dir=tmp_path / "data")
+    upload = Upload(b"%PDF-1.4" + b"0" * (3 * 1024 * 1024))
+    assert not hasattr(upload, "size")
+
+    with pytest.raises(ValueError, match="upload limit"):
+        manager.save_pdf(upload)
+
+    # Reading stopped at the first chunk past the limit
+    assert upload.tell() <= manager.max_upload_bytes + manager.UPLOAD_CHUNK_SIZE
+    assert list(manager.pdf_dir.iterdir()) == []
+    assert manager.load_metadata() == {}
+
+
+def test_declared_oversized_upload_is_rejected_before_reading(tmp_path, monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    manager = EnhancedPDFManager(pdf_dir=tmp_path / "pdfs", data_dir=tmp_path / "data", max_upload_size_mb=1)
+    upload = SizedUpload(b"%PDF-1.4", size=2 * 1024 * 1024)
+
+    with pytest.raises(ValueError, match="limit is 1 MB"):
+        manager.save_pdf(upload)
+
+    assert upload.reads == 0
+    assert list(manager.pdf_dir.iterdir()) == []
+
+
+def test_failed_stream_removes_the_partial_file(manager):
+    class BrokenUpload(Upload):
+        def read(self, *args):
+            if self.tell():
+                raise OSError("connection reset")
+            return super().read(*args)
+
+    manager.UPLOAD_CHUNK_SIZE = 4
+    target = manager.pdf_dir / "paper.pdf.part"
+
+    with pytest.raises(OSError):
+        manager._stream_upload(BrokenUpload(b"%PDF-1.4 body"), target)
+
+    assert not target.exists()
+
+
+def test_upload_within_the_limit_is_hashed_while_written(manager):
+    data = b"%PDF-1.4" + b"1" * 5000
+    manager.UPLOAD_CHUNK_SIZE = 1024
+    target = manager.pdf_dir / "paper.pdf.part"
+
+    file_hash, written = manager._stream_upload(SizedUpload(data), target)
+
+    assert (file_hash, written) == (hashlib.md5(data).hexdigest(), len(data))
+    assert target.read_bytes() == data
@@ -0,0 +1,76 @@
+"""
+Tests for complexity-based question routing
+"""
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from tools.question_router import QuestionRouter, LOOKUP, SUMMARY, SYNTHESIS, estimate_cost
+
+
+def test_questions_are_classified_by_complexity():
+    """Fact lookups, summaries and synthesis questions get their own routes"""
+    router = QuestionRouter()
+
+    assert router.classify("What year was this paper published?")[0] == LOOKUP
+    assert router.classify("Makalenin yazarları kimlerdir?")[0] == LOOKUP
+    assert router.classify("Örneklem büyüklüğü kaç?")[0] == LOOKUP
+    assert router.classify("Summarize the main findings")[0] == SUMMARY
+    assert router.classify("Bu çalışmanın ana bulguları nedir?")[0] == SUMMARY
+    assert router.classify("Compare the methods of the two studies")[0] == SYNTHESIS
+    assert router.classify("Çevrimiçi öğrenme ile başarı arasındaki ilişkiyi değerlendir")[0] == SYNTHESIS
+    # A comparison wins over the lookup keyword it contains
+    assert router.classify("How do the authors' findings differ from earlier work?")[0] == SYNTHESIS
+
+
+def test_open_questions_are_not_routed_as_lookups():
+    """Lookup keywords inside open questions, and unclassified questions, get the full-quality route"""
+    router = QuestionRouter()
+
+    for question in [
+        "What do the authors conclude about transformer robustness?",
+        "Yazarların önerdiği model nasıl çalışıyor?",
+        "Which methods were published for crisis detection and how do they perform?",
+        "How does the attention mechanism work in SatCoBiLSTM?",
+        "What limitations does the study report?",
+    ]:
+        assert router.classify(question)[0] == SYNTHESIS, question
+
+    assert router.classify("Who are the authors of the SatCoBiLSTM paper?")[0] == LOOKUP
+    assert router.classify("Makale hangi yıl yayımlandı?")[0] == LOOKUP
+    assert router.classify("Kaç katılımcı vardı?")[0] == LOOKUP
+
+
+def test_lookups_use_the_smaller_model():
+    router = QuestionRouter()
+
+    lookup = router.route("Who wrote this article?")
+    synthesis = router.route("Why did the intervention fail in rural schools?")
+
+    assert lookup.model == "gpt-4o-mini"
+    assert lookup.concise
+    assert lookup.max_tokens < synthesis.max_tokens
+    assert synthesis.model == "gpt-4o"
+
+
+def test_latency_and_cost_are_reported_per_route():
+    router = QuestionRouter()
+    lookup = router.routes[LOOKUP]
+    synthesis = router.routes[SYNTHESIS]
+
+    for seconds in (0.4, 0.5, 0.6):
+        router.record(lookup, seconds, prompt_tokens=1000, completion_tokens=50)
+    router.record(synthesis, 6.0, prompt_tokens=3000, completion_tokens=900)
+    router.record(synthesis, 0.1, error=True)
+
+    stats = router.get_stats()
+    assert stats[LOOKUP]["calls"] == 3
+    assert stats[LOOKUP]["p50_seconds"] == 0.5
+    assert stats[LOOKUP]["total_cost"] == round(3 * estimate_cost("gpt-4o-mini", 1000, 50), 6)
+    assert stats[SYNTHESIS]["calls"] == 2
+    assert stats[SYNTHESIS]["errors"] == 1
+    assert stats[SYNTHESIS]["avg_cost"] > stats[LOOKUP]["avg_cost"]
+    assert stats[SUMMARY]["calls"] == 0
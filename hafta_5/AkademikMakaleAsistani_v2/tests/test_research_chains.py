@@ -0,0 +1,144 @@
+"""
+Tests for the dependency-graph execution of ResearchAnalysisChain
+The LLM steps go to a scripted chat model that records when each step runs
+"""
+import json
+import re
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("langchain")
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from chains.research_chains import ResearchAnalysisChain
+
+# Text identifying each step's prompt
+STEP_PROMPTS = {
+    "categorization": "kategorizasyon yap",
+    "methodology_analysis": "metodoloji bölümünü",
+    "findings_analysis": "ana bulgularını",
+    "gap_analysis": "literatürdeki boşlukları"
+}
+
+
+class ScriptedSteps:
+    """
+    Answers each step with the document and the earlier step outputs found in its prompt
+
+    hold maps a step to a condition on this recorder; the step's response waits
+    (briefly) until it holds, so tests can require overlapping calls without timing.
+    """
+
+    def __init__(self, hold=None):
+        self.hold = hold or {}
+        self.events = []
+        self.in_flight = {}
+        self.peak_documents = 0
+        self.condition = threading.Condition()
+
+    def order(self):
+        return [(kind, step) for kind, step, _ in self.events]
+
+    def __call__(self, prompt):
+        step = next(step for step, marker in STEP_PROMPTS.items() if marker in prompt)
+        document = re.search(r"belge-\d+", prompt).group(0)
+        seen = [earlier for earlier in STEP_PROMPTS if f"'step': '{earlier}'" in prompt]
+
+        with self.condition:
+            self.events.append(("start", step, document))
+            self.in_flight[document] = self.in_flight.get(document, 0) + 1
+            self.peak_documents = max(self.peak_documents, sum(1 for n in self.in_flight.values() if n))
+            self.condition.notify_all()
+            if step in self.hold:
+                self.condition.wait_for(lambda: self.hold[step](self), timeout=1)
+            self.in_flight[document] -= 1
+            self.events.append(("end", step, document))
+            self.condition.notify_all()
+
+        return json.dumps({"step": step, "document": document, "seen": seen})
+
+
+@pytest.fixture
+def make_chain(scripted_llm):
+    def make(steps):
+        models = scripted_llm(steps)
+        return ResearchAnalysisChain(), models
+    return make
+
+
+def test_graph_overlaps_independent_steps_and_matches_serial_results(make_chain):
+    # Categorization only answers once methodology, which does not depend on it, has started
+    steps = ScriptedSteps(hold={"categorization": lambda s: ("start", "methodology_analysis") in s.order()})
+    chain, models = make_chain(steps)
+
+    results = chain.analyze_document("belge-0", "title")
+    execution = results.pop("analysis_metadata")["execution"]
+
+    order = steps.order()
+    assert order.index(("start", "methodology_analysis")) < order.index(("end", "categorization"))
+    assert order.index(("end", "categorization")) < order.index(("start", "findings_analysis"))
+    assert order.index(("end", "findings_analysis")) < order.index(("start", "gap_analysis"))
+    assert results["gap_analysis"]["seen"] == ["categorization", "findings_analysis"]
+    assert execution["mode"] == "graph"
+    assert set(execution["stage_seconds"]) == set(chain.step_chains)
+
+    # The serial chain sends the same prompts (answered from the response cache) and gets the same results
+    serial = chain.analyze_document("belge-0", "title", parallel=False)
+    assert serial.pop("analysis_metadata")["execution"]["mode"] == "sequential"
+    assert serial == results
+    assert models[0].calls == 4
+
+
+def test_precomputed_categorization_is_not_rerun(make_chain):
+    steps = ScriptedSteps()
+    chain, models = make_chain(steps)
+    categorization = {"research_type": "Ampirik"}
+
+    results = chain.analyze_document("belge-0", "title", categorization=categorization)
+    execution = results.pop("analysis_metadata")["execution"]
+
+    assert results["categorization"] == categorization
+    assert "categorization" not in execution["stage_seconds"]
+    assert {step for _, step in steps.order()} == {"methodology_analysis", "findings_analysis", "gap_analysis"}
+    assert models[0].calls == 3
+
+
+def test_multiple_documents_are_analyzed_concurrently(make_chain):
+    """Results stream back as they complete; a failing document does not stop the batch"""
+    # Every call waits until a second document has been in flight
+    steps = ScriptedSteps(hold={step: lambda s: s.peak_documents >= 2 for step in STEP_PROMPTS})
+    chain, models = make_chain(steps)
+    documents = [{"text": f"belge-{i}", "title": f"paper {i}"} for i in range(4)]
+    documents.insert(2, {"text": None, "title": "broken"})
+
+    streamed = list(chain.iter_document_analyses(documents, max_concurrency=5))
+
+    assert sorted(r["analysis_metadata"]["document_index"] for r in streamed) == list(range(5))
+    assert "error" in next(r for r in streamed if r["analysis_metadata"]["document_index"] == 2)
+    assert steps.peak_documents >= 2
+    assert models[0].calls == 4 * len(STEP_PROMPTS)
+
+    results = chain.analyze_multiple_documents(documents, max_concurrency=2)
+    assert [r["analysis_metadata"]["document_title"] for r in results if "error" not in r] == \
+        [f"paper {i}" for i in range(4)]
+    assert results[3]["gap_analysis"]["document"] == "belge-2"
+
+
+def test_step_fields_are_reported_while_streaming(make_chain):
+    """Each step's fields reach on_field tagged with the step, categorization's first"""
+    chain, _ = make_chain(ScriptedSteps())
+    reported = []
+
+    chain.analyze_document("belge-0", "title", on_field=lambda *field: reported.append(field))
+
+    assert sorted((step, field) for step, field, _ in reported) == \
+        sorted((step, field) for step in chain.step_chains for field in ["step", "document", "seen"])
+    assert ("categorization", "document", "belge-0") in reported
+    steps = [step for step, _, _ in reported]
+    assert steps.index("findings_analysis") > max(i for i, step in enumerate(steps) if step == "categorization")
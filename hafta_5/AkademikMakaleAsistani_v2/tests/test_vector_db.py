@@ -0,0 +1,49 @@
+"""
+Tests for the embedding model status reported by the vector database
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("langchain")
+pytest.importorskip("chromadb")
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import tools.vector_db as vector_db
+
+
+class FakeModel:
+    def __init__(self, name):
+        self.name = name
+
+
+def failing_model(name):
+    raise OSError(f"Can't load {name}: no connection")
+
+
+@pytest.fixture
+def make_db(tmp_path, monkeypatch):
+    """Vector DB with the LangChain store stubbed and the given SentenceTransformer class"""
+    monkeypatch.setattr(vector_db, "SENTENCE_TRANSFORMERS_AVAILABLE", True)
+    monkeypatch.setattr(vector_db, "HuggingFaceEmbeddings", lambda **kwargs: None)
+    monkeypatch.setattr(vector_db, "Chroma", lambda **kwargs: None)
+
+    def make(model_class):
+        monkeypatch.setattr(vector_db, "SentenceTransformer", model_class)
+        return vector_db.EnhancedVectorDB(db_dir=tmp_path / "chroma")
+    return make
+
+
+def test_semantic_embeddings_require_loaded_models(make_db):
+    """An installed library whose models fail to load still means fallback embeddings"""
+    loaded = make_db(FakeModel)
+    assert loaded.has_semantic_embeddings
+    assert loaded.get_embedding_model("english").name == "paraphrase-MiniLM-L3-v2"
+
+    unloaded = make_db(failing_model)
+    assert not unloaded.has_semantic_embeddings
+    assert unloaded.get_embedding_model("turkish") is None
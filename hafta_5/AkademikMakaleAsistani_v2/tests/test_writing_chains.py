@@ -0,0 +1,260 @@
+"""
+Tests for the windowed coherence check and paragraph-wise improvement of long texts
+The LLM calls go to a scripted chat model
+"""
+import json
+import re
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("langchain")
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from chains.writing_chains import AcademicWritingChain
+
+
+class ScriptedWriter:
+    """
+    Answers the writing prompts and records the calls
+
+    Coherence windows report a transition issue between every pair of consecutive
+    paragraphs they see; improved paragraphs are the original upper-cased. hold(kind,
+    number) returns a condition on this recorder a call waits for (briefly) before it
+    answers, so tests can require calls to overlap or finish in a given order.
+    """
+
+    def __init__(self, hold=None, fail_window=None, fail_paragraph=None):
+        self.hold = hold
+        self.fail_window = fail_window
+        self.fail_paragraph = fail_paragraph
+        self.windows = []
+        self.window_texts = []
+        self.single_prompts = []
+        self.paragraphs = []
+        self.in_flight = 0
+        self.peak = 0
+        self.condition = threading.Condition()
+
+    def __call__(self, prompt):
+        window = re.search(r"metnin (\d+)-(\d+)\. paragrafları", prompt)
+        paragraph = re.search(r"Paragraf: (.*?)\n", prompt)
+        if window:
+            kind, number = "window", int(window.group(1))
+        elif paragraph:
+            numbered = re.search(r"Paragraph (\d+)", paragraph.group(1))
+            kind, number = "paragraph", int(numbered.group(1)) if numbered else 0
+        else:
+            kind, number = "single", 0
+
+        with self.condition:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            self.condition.notify_all()
+            condition = self.hold(kind, number) if self.hold else None
+            if condition:
+                self.condition.wait_for(lambda: condition(self), timeout=1)
+        try:
+            if kind == "window":
+                first, last = int(window.group(1)), int(window.group(2))
+                with self.condition:
+                    self.windows.append((first, last))
+                    self.window_texts.append("\n\n".join(re.findall(r"\[P\d+\] .*", prompt)))
+                if first == self.fail_window:
+                    raise RuntimeError("rate limited")
+                return self._window_response(prompt, first, last)
+            if kind == "paragraph":
+                with self.condition:
+                    self.paragraphs.append(paragraph.group(1))
+                if number == self.fail_paragraph:
+                    raise RuntimeError("timeout")
+                return f"  {paragraph.group(1).upper()}\n"
+            with self.condition:
+                self.single_prompts.append(prompt)
+            return "Coherent overall."
+        finally:
+            with self.condition:
+                self.in_flight -= 1
+                self.condition.notify_all()
+
+    @staticmethod
+    def _window_response(prompt, first, last):
+        numbers = [int(n) for n in re.findall(r"\[P(\d+)\]", prompt)]
+        issues = [
+            {"paragraphs": [a, b], "type": "transition",
+             "severity": "high" if first > 1 else "low",
+             "issue": f"Abrupt shift between {a} and {b}", "suggestion": "Add a bridge sentence"}
+            for a, b in zip(numbers, numbers[1:])
+        ]
+        issues.append({"paragraphs": [99], "type": "theme", "severity": "low",
+                       "issue": "Out of window", "suggestion": ""})
+        return "```json\n" + json.dumps({"issues": issues, "summary": f"window {first}-{last}"}) + "\n```"
+
+
+class WordCounter:
+    """One token per word, so window sizes in the tests do not depend on the tokenizer"""
+
+    def count(self, text):
+        return len(text.split())
+
+
+# "[P1] Paragraph 1 discusses feedback timing." plus a separator: four paragraphs per window
+FOUR_PARAGRAPHS = 4 * 7
+
+
+@pytest.fixture
+def make_writer(scripted_llm):
+    def make(script, window_tokens=FOUR_PARAGRAPHS, overlap=1, max_workers=4, max_tokens=1):
+        models = scripted_llm(script)
+        writer = AcademicWritingChain(coherence_window_tokens=window_tokens, coherence_overlap=overlap,
+                                      coherence_max_tokens=max_tokens, max_workers=max_workers)
+        writer.counter = WordCounter()
+        return writer, models[0]
+    return make
+
+
+def manuscript(paragraph_count):
+    return "\n\n".join(f"Paragraph {i + 1} discusses feedback timing." for i in range(paragraph_count))
+
+
+def test_windows_overlap_and_run_concurrently(make_writer):
+    """A 10-paragraph text is covered by three overlapping windows checked at the same time"""
+    # Every window waits until all three are in flight
+    script = ScriptedWriter(hold=lambda kind, number: lambda s: s.peak >= 3)
+    writer, model = make_writer(script)
+
+    result = writer.check_coherence(manuscript(10))
+
+    assert sorted(script.windows) == [(1, 4), (4, 7), (7, 10)]
+    assert script.peak == 3
+    assert model.calls == 3
+    assert result["mode"] == "windowed"
+    assert result["windows"] == 3
+    assert "failed_windows" not in result
+
+
+def test_issues_are_merged_with_positions(make_writer):
+    """Every paragraph pair is reported once, in order, with its character span"""
+    text = manuscript(10)
+    # Windows 1-4, 3-6, 5-8, 7-10: pairs 3-4, 5-6 and 7-8 are seen by two windows
+    writer, _ = make_writer(ScriptedWriter(), overlap=2)
+    result = writer.check_coherence(text)
+
+    issues = result["issues"]
+    assert [issue["paragraphs"] for issue in issues] == [[n, n + 1] for n in range(1, 10)]
+    for issue in issues:
+        span = text[issue["start_char"]:issue["end_char"]]
+        assert span.startswith(f"Paragraph {issue['paragraphs'][0]} ")
+        assert span.endswith(f"Paragraph {issue['paragraphs'][-1]} discusses feedback timing.")
+    # Duplicates keep the higher severity; issues outside their window are dropped
+    assert issues[2]["paragraphs"] == [3, 4] and issues[2]["severity"] == "high"
+    assert issues[0]["severity"] == "low"
+    assert all(99 not in issue["paragraphs"] for issue in issues)
+
+
+def test_only_texts_over_the_token_budget_are_windowed(make_writer):
+    """The decision depends on tokens alone, however many paragraphs the text has"""
+    script = ScriptedWriter()
+    writer, _ = make_writer(script, window_tokens=1000, max_tokens=3000)
+
+    # Ten short paragraphs fit in one call
+    assert writer.check_coherence(manuscript(10))["mode"] == "single"
+    assert script.windows == [] and len(script.single_prompts) == 1
+
+    # Three long paragraphs, and a long chapter without any blank line, are windowed
+    long_paragraphs = "\n\n".join(f"Paragraph {i} " + "discusses feedback timing. " * 400 for i in range(3))
+    assert writer.check_coherence(long_paragraphs)["mode"] == "windowed"
+    hard_wrapped = "\n".join(f"Line {i} of a single long paragraph about feedback timing" for i in range(600))
+    result = writer.check_coherence(hard_wrapped)
+    assert (result["mode"], result["paragraphs"]) == ("windowed", 1)
+
+
+def test_windows_stay_within_the_token_budget(make_writer):
+    """Paragraphs longer than a window are split at sentence boundaries, in order and complete"""
+    script = ScriptedWriter()
+    writer, _ = make_writer(script, window_tokens=100, overlap=0)
+    sentences = [f"Sentence {i} of the long chapter discusses feedback timing." for i in range(60)]
+    text = "Short opening paragraph.\n\n" + "\n".join(sentences)
+
+    result = writer.check_coherence(text)
+
+    assert result["windows"] == len(script.window_texts) > 1
+    assert all(writer.counter.count(window) <= 100 for window in script.window_texts)
+    # Every piece ends at a sentence, and the pieces add up to the paragraph
+    pieces = sorted(re.findall(r"\[P2\] (.*)", "\n".join(script.window_texts)),
+                    key=lambda piece: int(piece.split()[1]))
+    assert all(piece.endswith("timing.") for piece in pieces)
+    assert " ".join(pieces) == " ".join(sentences)
+    assert sorted(script.windows)[-1] == (2, 2)
+
+
+def test_failed_window_keeps_the_other_windows(make_writer):
+    """A failing window is reported while the remaining windows still return their issues"""
+    writer, _ = make_writer(ScriptedWriter(fail_window=1))
+
+    result = writer.check_coherence(manuscript(10))
+
+    assert result["failed_windows"] == [{"paragraphs": [1, 4], "error": "rate limited"}]
+    assert "error" not in result
+    assert [issue["paragraphs"] for issue in result["issues"]][0] == [4, 5]
+
+
+def test_improve_document_streams_and_preserves_order(make_writer):
+    """Paragraphs are reported as they finish, and reassembled in document order"""
+    streamed = []
+
+    def hold(kind, number):
+        # Three paragraphs in flight at once; paragraph 1 answers only after the others were reported
+        if number == 1:
+            return lambda s: s.peak >= 3 and len(streamed) >= 4
+        return lambda s: s.peak >= 3
+
+    def on_paragraph(paragraph):
+        with script.condition:
+            streamed.append(paragraph["index"])
+            script.condition.notify_all()
+
+    script = ScriptedWriter(hold=hold, fail_paragraph=3)
+    writer, _ = make_writer(script, max_workers=3)
+    text = manuscript(5)
+
+    result = writer.improve_document(text, on_paragraph=on_paragraph)
+
+    assert script.peak == 3
+    assert streamed[-1] == 0 and sorted(streamed) == [0, 1, 2, 3, 4]
+    assert [paragraph["index"] for paragraph in result["paragraphs"]] == [0, 1, 2, 3, 4]
+    assert result["failed_paragraphs"] == [2]
+    assert result["improved_text"].split("\n\n") == [
+        "PARAGRAPH 1 DISCUSSES FEEDBACK TIMING.",
+        "PARAGRAPH 2 DISCUSSES FEEDBACK TIMING.",
+        "Paragraph 3 discusses feedback timing.",
+        "PARAGRAPH 4 DISCUSSES FEEDBACK TIMING.",
+        "PARAGRAPH 5 DISCUSSES FEEDBACK TIMING.",
+    ]
+
+
+def test_hard_wrapped_lines_stay_in_their_paragraph(make_writer):
+    """Text pasted from a PDF is split on blank lines only, and each paragraph is sent whole"""
+    text = ("Deep learning models have been widely applied to crisis detection\n"
+            "in social media streams, yet the effect of noisy\n"
+            "labels remains poorly understood.\n"
+            "\n"
+            "We compare three label cleaning strategies\n"
+            "on two public datasets.")
+    script = ScriptedWriter()
+    writer, _ = make_writer(script)
+
+    result = writer.improve_document(text)
+
+    assert sorted(script.paragraphs) == [
+        "Deep learning models have been widely applied to crisis detection in social media streams, "
+        "yet the effect of noisy labels remains poorly understood.",
+        "We compare three label cleaning strategies on two public datasets.",
+    ]
+    assert result["improved_text"].split("\n\n") == [paragraph.upper() for paragraph in
+                                                     sorted(script.paragraphs)]
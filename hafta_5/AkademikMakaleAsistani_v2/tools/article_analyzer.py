@@ -3,7 +3,6 @@ Enhanced Article Analysis Module for Academic Research
 Provides comprehensive analysis of academic papers including methodology, findings, and limitations
 """
 
-import openai
 import os
 from dotenv import load_dotenv
 from typing import Dict, List, Optional, Any
@@ -12,6 +11,10 @@ import json
 import re
 from datetime import datetime
 
+from tools.llm_gateway import get_gateway
+from tools.document_digest import DIGEST, get_document_digester
+from chains.map_reduce import long_document_mode
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
@@ -25,7 +28,7 @@ class EnhancedArticleAnalyzer:
         if not self.openai_api_key:
             raise ValueError("OpenAI API key not found in environment variables")
         
-        self.client = openai.OpenAI(api_key=self.openai_api_key)
+        self.client = get_gateway().client
         self.analysis_cache = {}
     
     def analyze_article_comprehensive(self, pdf_name: str, pdf_text: str, 
@@ -66,6 +69,8 @@ class EnhancedArticleAnalyzer:
             
             # Add overall summary
             analysis_results["overall_summary"] = self._generate_overall_summary(analysis_results)
+            if long_document_mode() == DIGEST:
+                analysis_results["digest"] = get_document_digester().report(pdf_text)
             
             # Cache results
             self.analysis_cache[cache_key] = analysis_results
@@ -81,6 +86,18 @@ class EnhancedArticleAnalyzer:
                 "analysis_timestamp": datetime.now().isoformat()
             }
     
+    def _prompt_text(self, text: str, excerpt: str, label: str) -> str:
+        """
+        Labelled article text for a prompt: the excerpt, or its shared digest with LONG_DOCUMENT_MODE=digest
+        
+        The label tells the model which one it is reading (e.g. "İlk 8000 karakter" for an excerpt).
+        """
+        if long_document_mode() == DIGEST:
+            digest = get_document_digester().for_prompt(text, excerpt, consumer="article_analyzer")
+            if digest != excerpt:
+                return f"Makale Metni (tam metinden seçilmiş cümlelerle özet):\n{digest}"
+        return f"Makale Metni ({label}):\n{excerpt}"
+    
     def _analyze_methodology(self, text: str) -> Dict[str, Any]:
         """Analyze research methodology"""
         try:
@@ -95,8 +112,7 @@ Aşağıdaki akademik makale metnini analiz ederek ARAŞTIRMA YÖNTEMİ hakkınd
 5. Kullanılan Araçlar ve Ölçekler
 6. Geçerlik ve Güvenirlik Bilgileri
 
-Makale Metni (İlk 8000 karakter):
-{text[:8000]}
+{self._prompt_text(text, text[:8000], "İlk 8000 karakter")}
 
 Lütfen JSON formatında yanıt ver:
 {{
@@ -171,7 +187,7 @@ Lütfen bu akademik makale metnindeki araştırma metodolojisini analiz et ve k
 3. Hangi veri toplama yöntemi kullanılmış?
 4. Hangi analiz yöntemi kullanılmış?
 
-Makale metni: {text[:5000]}
+{self._prompt_text(text, text[:5000], "İlk 5000 karakter")}
 
 Kısa ve net yanıtlar ver:
 """
@@ -243,8 +259,7 @@ Aşağıdaki akademik makale metnini analiz ederek BULGULAR VE SONUÇLAR hakkın
 5. Bulguların Teorik Katkısı
 6. Pratik Uygulamalar
 
-Makale Metni (Ortası 8000 karakter):
-{text[len(text)//3:len(text)//3+8000]}
+{self._prompt_text(text, text[len(text)//3:len(text)//3+8000], "Ortası 8000 karakter")}
 
 Lütfen JSON formatında yanıt ver:
 {{
@@ -322,7 +337,7 @@ Bu akademik makale metnindeki ana bulguları listele:
 2. Hangi istatistiksel sonuçlar var?
 3. Hangi hipotezler desteklendi?
 
-Makale metni: {text[len(text)//2:len(text)//2+4000]}
+{self._prompt_text(text, text[len(text)//2:len(text)//2+4000], "Ortası 4000 karakter")}
 
 Kısa listeler halinde yanıt ver:
 """
@@ -373,8 +388,7 @@ Aşağıdaki akademik makale metnini analiz ederek ARAŞTIRMANIN SINIRLILIKLARI
 5. Zaman/Mekan Sınırları
 6. Gelecek Araştırma Önerileri
 
-Makale Metni (Son 8000 karakter):
-{text[-8000:]}
+{self._prompt_text(text, text[-8000:], "Son 8000 karakter")}
 
 Lütfen JSON formatında yanıt ver:
 {{
@@ -0,0 +1,179 @@
+"""
+Context Packer - Token-budgeted prompt context for answer generation
+Orders retrieved chunks by score, removes spans shared by overlapping chunks
+and fills a fixed token budget
+"""
+import logging
+import math
+import os
+from typing import Dict, List, Optional, Any, Tuple
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    tiktoken = None
+    TIKTOKEN_AVAILABLE = False
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class TokenCounter:
+    """Local token counting with tiktoken, or a ~4 characters per token estimate without it"""
+
+    def __init__(self, model: str = "gpt-4o"):
+        self.model = model
+        self.encoding = None
+
+        if TIKTOKEN_AVAILABLE:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = self._load_encoding("cl100k_base")
+            except Exception as e:
+                # Encoding files are downloaded on first use - offline machines fall back
+                logger.warning(f"tiktoken encoding for {model} unavailable, estimating tokens: {e}")
+
+        self.exact = self.encoding is not None
+
+    @staticmethod
+    def _load_encoding(name: str):
+        try:
+            return tiktoken.get_encoding(name)
+        except Exception as e:
+            logger.warning(f"tiktoken encoding {name} unavailable, estimating tokens: {e}")
+            return None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        return math.ceil(len(text) / 4)
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        """Chat prompt size including the per-message formatting overhead"""
+        return sum(self.count(message.get("content", "")) + 4 for message in messages) + 3
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text to at most max_tokens, preferring a sentence or word boundary"""
+        if self.count(text) <= max_tokens:
+            return text
+
+        if self.encoding is not None:
+            cut = self.encoding.decode(self.encoding.encode(text)[:max_tokens])
+        else:
+            cut = text[:max_tokens * 4]
+
+        for boundary in (". ", "\n", " "):
+            position = cut.rfind(boundary)
+            if position > len(cut) * 0.6:
+                return cut[:position + len(boundary)].rstrip()
+        return cut
+
+class ContextPacker:
+    """
+    Packs retrieved chunks into a token budget for the answer prompt:
+    - highest similarity_score first
+    - text shared with an already packed chunk (splitter overlap) is removed
+    - chunks are added until the budget is full; the last one may be truncated
+    """
+
+    def __init__(self, max_tokens: int = None, model: str = "gpt-4o",
+                 min_chunk_tokens: int = 50, min_overlap_chars: int = 20):
+        self.max_tokens = max_tokens or int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+        self.min_chunk_tokens = min_chunk_tokens
+        self.min_overlap_chars = min_overlap_chars
+        self.counter = TokenCounter(model)
+
+        logger.info(
+            f"Context packer ready (budget={self.max_tokens} tokens, "
+            f"tokenizer={'tiktoken' if self.counter.exact else 'estimate'})"
+        )
+
+    def _overlap(self, first: str, second: str) -> int:
+        """Length of the longest suffix of first that is a prefix of second"""
+        limit = min(len(first), len(second))
+        for size in range(limit, self.min_overlap_chars - 1, -1):
+            if first.endswith(second[:size]):
+                return size
+        return 0
+
+    def _remove_overlap(self, text: str, packed_texts: List[str]) -> Tuple[str, int]:
+        """Strip spans of text already present at the boundary of a packed chunk"""
+        removed = 0
+        for packed in packed_texts:
+            if text in packed:
+                return "", removed + len(text)
+
+            # Packed chunk precedes this one in the document: drop the shared prefix
+            size = self._overlap(packed, text)
+            if size:
+                text = text[size:].lstrip()
+                removed += size
+
+            # Packed chunk follows this one: drop the shared suffix
+            size = self._overlap(text, packed)
+            if size:
+                text = text[:-size].rstrip()
+                removed += size
+        return text, removed
+
+    def pack(self, documents: List[str], metadatas: List[Dict],
+             max_tokens: int = None) -> Dict[str, Any]:
+        """
+        Select and trim chunks to fit the token budget
+
+        Returns:
+            documents / metadatas of the packed chunks (highest score first) plus
+            context_tokens, original_tokens, overlap_chars_removed, dropped and truncated counts
+        """
+        budget = max_tokens or self.max_tokens
+        candidates = sorted(
+            zip(documents, metadatas),
+            key=lambda item: item[1].get("similarity_score", 0.0),
+            reverse=True
+        )
+
+        packed_documents, packed_metadatas = [], []
+        packed_by_pdf: Dict[str, List[str]] = {}
+        used_tokens = 0
+        overlap_removed = 0
+        dropped = 0
+        truncated = 0
+        # Blank lines between chunks when they are joined into the prompt
+        separator_tokens = self.counter.count("\n\n")
+
+        for text, metadata in candidates:
+            pdf_name = metadata.get("pdf_name", "")
+            text, removed = self._remove_overlap(text, packed_by_pdf.get(pdf_name, []))
+            overlap_removed += removed
+            if not text:
+                dropped += 1
+                continue
+
+            remaining = budget - used_tokens - (separator_tokens if packed_documents else 0)
+            tokens = self.counter.count(text)
+            if tokens > remaining:
+                if remaining < self.min_chunk_tokens:
+                    dropped += 1
+                    continue
+                text = self.counter.truncate(text, remaining)
+                tokens = self.counter.count(text)
+                truncated += 1
+
+            used_tokens += tokens + (separator_tokens if packed_documents else 0)
+            packed_documents.append(text)
+            packed_metadatas.append(metadata)
+            packed_by_pdf.setdefault(pdf_name, []).append(text)
+
+        return {
+            "documents": packed_documents,
+            "metadatas": packed_metadatas,
+            "context_tokens": used_tokens,
+            "original_tokens": sum(self.counter.count(text) for text in documents),
+            "budget": budget,
+            "overlap_chars_removed": overlap_removed,
+            "dropped": dropped,
+            "truncated": truncated
+        }
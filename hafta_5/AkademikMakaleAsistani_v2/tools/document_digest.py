@@ -0,0 +1,373 @@
+"""
+Document Digest - Compact extractive digest of a paper shared by all analysis prompts
+Section headings, the abstract and the highest-scoring sentences of every section,
+picked locally without LLM calls, built once per document and stored by file hash
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+from tools.context_packer import TokenCounter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# LONG_DOCUMENT_MODE value that sends the digest instead of raw text
+DIGEST = "digest"
+# Bump when the extraction changes, so stored digests are rebuilt
+DIGEST_VERSION = 1
+
+# Section names recognised as headings (optionally numbered), Turkish and English
+SECTION_NAMES = [
+    r"abstract", r"özet", r"introduction", r"giriş", r"background", r"literature review",
+    r"literatür( taraması)?", r"kuramsal çerçeve", r"theoretical framework", r"related work",
+    r"materials and methods", r"methods?", r"methodology", r"yöntem", r"araştırmanın yöntemi",
+    r"results?", r"findings", r"bulgular", r"discussion", r"tartışma",
+    r"results and discussion", r"bulgular ve tartışma", r"conclusions?", r"sonuç( ve öneriler)?",
+    r"limitations", r"sınırlılıklar", r"references", r"kaynakça", r"kaynaklar",
+    r"acknowledge?ments?", r"teşekkür",
+]
+ABSTRACT_SECTIONS = {"abstract", "özet"}
+SKIPPED_SECTIONS = {"references", "kaynakça", "kaynaklar", "acknowledgements", "acknowledgments",
+                    "acknowledgement", "acknowledgment", "teşekkür"}
+
+# Sentences stating aims, results and conclusions get a bonus
+CUE_PATTERNS = [
+    r"\b(this|the present) (study|paper|article|research)\b", r"\baim", r"\bpurpose\b",
+    r"\bwe (found|show|propose|conclude)", r"\bresults? (show|indicate|suggest|reveal)",
+    r"\bsignificant", r"\bconclu", r"\blimitation", r"\bcontribut",
+    r"\bbu (çalışma|araştırma|makale)", r"\bamac", r"\bbulgular", r"\banlamlı",
+    r"\bsonuç", r"\bgöster", r"\bsınırlılı", r"\bkatkı", r"\bönerilmekte",
+]
+# Reported statistics (p-values, coefficients, percentages, sample sizes)
+STATISTIC_PATTERN = re.compile(r"\bp\s*[<=>]\s*\.?\d|\b[rnβ]\s*=\s*-?\.?\d|\d+(\.\d+)?\s*%|%\s*\d+")
+
+STOPWORDS = set("""
+the and for are was were with that this from have has had not but its their which these those
+into than then also such been being can may our all any each more most other some only over
+between both after before about under there when where while will would could should using used
+ve ile bir bu da de için olarak gibi olan daha çok ise ya veya ancak kadar sonra önce göre
+arasında üzerinde tarafından ayrıca her hem şu o ne nasıl olduğu olduğunu ilgili yer
+""".split())
+
+WORD_PATTERN = re.compile(r"[^\W\d_]{3,}")
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[A-ZÇĞİÖŞÜ0-9])")
+
+
+class DocumentDigester:
+    """
+    Builds and caches extractive digests of documents
+
+    A digest holds the section headings, the abstract and key sentences chosen by a
+    frequency and cue-phrase scorer: the best sentence of every section first, then
+    the best remaining ones until max_chars is reached. Digests are cached in memory
+    by text hash and stored under cache_dir by file hash, so every chain analyzing a
+    document reuses one digest. for_prompt() records the prompt tokens each use saves.
+    """
+
+    def __init__(self, max_chars: int = None, abstract_chars: int = 1500,
+                 cache_dir: str = None, cache_size: int = 32):
+        self.max_chars = max_chars or int(os.getenv("DIGEST_CHARS", "6000"))
+        self.abstract_chars = abstract_chars
+        self.cache_dir = Path(cache_dir or Path(__file__).parent.parent / 'data' / 'digests')
+        self.cache_size = cache_size
+        self.counter = TokenCounter()
+
+        self._heading_pattern = re.compile(
+            r"^(\d+(\.\d+)*\.?\s+)?(" + "|".join(SECTION_NAMES) + r")\s*:?$", re.IGNORECASE
+        )
+        self._numbered_heading = re.compile(r"^\d+(\.\d+)*\.?\s+[A-ZÇĞİÖŞÜ][^.!?:]{2,80}$")
+        self._cues = [re.compile(pattern) for pattern in CUE_PATTERNS]
+
+        self._digests: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._usage: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _heading(self, line: str) -> Optional[str]:
+        """Heading text if the line looks like a section heading"""
+        if not line or len(line) > 90 or len(line.split()) > 10:
+            return None
+        if self._heading_pattern.match(line) or self._numbered_heading.match(line):
+            return line.rstrip(":").strip()
+        letters = [c for c in line if c.isalpha()]
+        if len(letters) >= 4 and line.upper() == line and not line.endswith((".", ",")):
+            return line.strip()
+        return None
+
+    @staticmethod
+    def _section_name(heading: str) -> str:
+        """Heading without numbering, casefolded, for matching abstract/reference sections"""
+        return re.sub(r"^\d+(\.\d+)*\.?\s+", "", heading).rstrip(":").strip().casefold()
+
+    def _sections(self, text: str) -> List[Dict[str, Any]]:
+        """Split text into (heading, sentences) sections; text before the first heading has heading ''"""
+        sections = [{"heading": "", "lines": []}]
+        for line in text.splitlines():
+            line = line.strip()
+            heading = self._heading(line)
+            if heading:
+                sections.append({"heading": heading, "lines": []})
+            elif line:
+                sections[-1]["lines"].append(line)
+
+        result = []
+        for section in sections:
+            body = "\n".join(section["lines"])
+            body = re.sub(r"-\n(?=[a-zçğıöşü])", "", body)  # words hyphenated across lines
+            body = re.sub(r"\s+", " ", body).strip()
+            if not body and not section["heading"]:
+                continue
+            result.append({
+                "heading": section["heading"],
+                "body": body,
+                "sentences": [s.strip() for s in SENTENCE_SPLIT.split(body) if s.strip()]
+            })
+        return result
+
+    def _truncate_sentences(self, sentences: List[str], char_limit: int) -> str:
+        kept, length = [], 0
+        for sentence in sentences:
+            if kept and length + len(sentence) + 1 > char_limit:
+                break
+            kept.append(sentence)
+            length += len(sentence) + 1
+        return " ".join(kept)[:char_limit]
+
+    def _score_sentences(self, sections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Candidate sentences of the content sections with their scores"""
+        candidates, seen = [], set()
+        for index, section in enumerate(sections):
+            name = self._section_name(section["heading"])
+            if name in SKIPPED_SECTIONS or name in ABSTRACT_SECTIONS:
+                continue
+            for position, sentence in enumerate(section["sentences"]):
+                # Repeated sentences (running headers, boilerplate) would dominate the frequencies
+                if sentence.casefold() in seen or not 8 <= len(sentence.split()) <= 60:
+                    continue
+                seen.add(sentence.casefold())
+                candidates.append({"section": index, "position": position, "sentence": sentence})
+        if not candidates:
+            return []
+
+        def content_words(sentence: str) -> List[str]:
+            return [w for w in WORD_PATTERN.findall(sentence.casefold()) if w not in STOPWORDS]
+
+        frequencies = Counter(w for c in candidates for w in content_words(c["sentence"]))
+        top = max(frequencies.values()) if frequencies else 1
+
+        for candidate in candidates:
+            words = set(content_words(candidate["sentence"]))
+            score = sum(frequencies[w] / top for w in words) / math.sqrt(len(words) or 1)
+            text = candidate["sentence"].casefold()
+            score += 0.5 * min(2, sum(1 for cue in self._cues if cue.search(text)))
+            if STATISTIC_PATTERN.search(text):
+                score += 0.3
+            candidate["score"] = round(score, 4)
+        return candidates
+
+    def _select(self, candidates: List[Dict[str, Any]], char_budget: int) -> List[Dict[str, Any]]:
+        """Best sentence of each section first, then the best remaining ones, within the budget"""
+        ranked = sorted(candidates, key=lambda c: c["score"], reverse=True)
+        best_per_section = {}
+        for candidate in ranked:
+            best_per_section.setdefault(candidate["section"], candidate)
+
+        selected, used = [], 0
+        for candidate in sorted(best_per_section.values(), key=lambda c: c["score"], reverse=True) + ranked:
+            if candidate in selected:
+                continue
+            cost = len(candidate["sentence"]) + 3
+            if used + cost > char_budget:
+                continue
+            selected.append(candidate)
+            used += cost
+        return sorted(selected, key=lambda c: (c["section"], c["position"]))
+
+    def _render(self, headings: List[str], abstract: str, sections: List[Dict[str, Any]],
+                selected: List[Dict[str, Any]]) -> str:
+        parts = []
+        if headings:
+            parts.append("Bölümler: " + " | ".join(headings))
+        if abstract:
+            parts.append("Özet:\n" + abstract)
+        lines, current = [], None
+        for candidate in selected:
+            if candidate["section"] != current:
+                current = candidate["section"]
+                lines.append(f"[{sections[current]['heading'] or 'Başlangıç'}]")
+            lines.append(f"- {candidate['sentence']}")
+        if lines:
+            parts.append("Anahtar cümleler:\n" + "\n".join(lines))
+        return "\n\n".join(parts)
+
+    def _extract(self, text: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        sections = self._sections(text)
+        headings = [s["heading"] for s in sections if s["heading"]][:30]
+
+        abstract_section = next(
+            (s for s in sections if self._section_name(s["heading"]) in ABSTRACT_SECTIONS and s["body"]), None
+        )
+        if abstract_section is None and sections:
+            # No abstract heading: the opening sentences stand in for it
+            abstract_section = sections[0]
+        abstract = self._truncate_sentences(abstract_section["sentences"], self.abstract_chars) \
+            if abstract_section else ""
+
+        header = self._render(headings, abstract, sections, [])
+        selected = self._select(self._score_sentences(sections),
+                                self.max_chars - len(header) - len("\n\nAnahtar cümleler:") - 60)
+        digest_text = self._render(headings, abstract, sections, selected)[:self.max_chars]
+
+        return {
+            "version": DIGEST_VERSION,
+            "text_hash": self.text_hash(text),
+            "headings": headings,
+            "abstract": abstract,
+            "key_sentences": [
+                {"section": sections[c["section"]]["heading"], "sentence": c["sentence"], "score": c["score"]}
+                for c in selected
+            ],
+            "text": digest_text,
+            "original_chars": len(text),
+            "original_tokens": self.counter.count(text),
+            "digest_tokens": self.counter.count(digest_text),
+            "build_seconds": round(time.perf_counter() - start, 4)
+        }
+
+    def _load(self, file_hash: str, text_hash: str) -> Optional[Dict[str, Any]]:
+        path = self.cache_dir / f"{file_hash}.json"
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                digest = json.load(f)
+        except Exception as e:
+            logger.warning(f"Unreadable digest {path}: {e}")
+            return None
+        if digest.get("version") != DIGEST_VERSION or digest.get("text_hash") != text_hash:
+            return None
+        return digest
+
+    def _save(self, file_hash: str, digest: Dict[str, Any]):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.cache_dir / f"{file_hash}.json", 'w', encoding='utf-8') as f:
+                json.dump(digest, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.error(f"Error saving digest for {file_hash}: {e}")
+
+    def build(self, text: str, file_hash: str = None) -> Dict[str, Any]:
+        """
+        Return the digest of text, building it on first use
+
+        With a file hash the digest is also stored on disk and reused by later runs.
+        """
+        key = self.text_hash(text)
+        with self._lock:
+            digest = self._digests.get(key)
+            if digest is not None:
+                self._digests.move_to_end(key)
+                if file_hash and not digest.get("file_hash"):
+                    digest["file_hash"] = file_hash
+                    self._save(file_hash, digest)
+                return digest
+
+            digest = self._load(file_hash, key) if file_hash else None
+            if digest is None:
+                digest = self._extract(text)
+                digest["file_hash"] = file_hash
+                if file_hash:
+                    self._save(file_hash, digest)
+                logger.info(
+                    f"Built digest: {digest['original_tokens']} -> {digest['digest_tokens']} tokens, "
+                    f"{len(digest['headings'])} headings, {len(digest['key_sentences'])} key sentences "
+                    f"in {digest['build_seconds']:.3f}s"
+                )
+
+            self._digests[key] = digest
+            while len(self._digests) > self.cache_size:
+                evicted, _ = self._digests.popitem(last=False)
+                self._usage.pop(evicted, None)
+            return digest
+
+    def for_prompt(self, text: str, excerpt: str, consumer: str = "", calls: int = 1) -> str:
+        """
+        Digest to send in place of excerpt (the raw text a prompt would otherwise get)
+
+        Returns the excerpt when the digest is not shorter. Each substitution is
+        recorded for report(): calls prompts of consumer, with their token counts.
+        """
+        digest = self.build(text)
+        if len(digest["text"]) >= len(excerpt):
+            return excerpt
+
+        excerpt_tokens = self.counter.count(excerpt)
+        with self._lock:
+            usage = self._usage.setdefault(digest["text_hash"], {}).setdefault(
+                consumer or "unknown", {"calls": 0, "excerpt_tokens": 0, "digest_tokens": 0}
+            )
+            usage["calls"] += calls
+            usage["excerpt_tokens"] += excerpt_tokens * calls
+            usage["digest_tokens"] += digest["digest_tokens"] * calls
+        return digest["text"]
+
+    def report(self, text: str) -> Dict[str, Any]:
+        """Digest summary and the prompt tokens saved for one document, per consumer and in total"""
+        digest = self.build(text)
+        with self._lock:
+            consumers = {name: dict(usage) for name, usage in self._usage.get(digest["text_hash"], {}).items()}
+        for usage in consumers.values():
+            usage["tokens_saved"] = usage["excerpt_tokens"] - usage["digest_tokens"]
+
+        excerpt_tokens = sum(u["excerpt_tokens"] for u in consumers.values())
+        digest_tokens = sum(u["digest_tokens"] for u in consumers.values())
+        return {
+            "file_hash": digest.get("file_hash"),
+            "headings": len(digest["headings"]),
+            "key_sentences": len(digest["key_sentences"]),
+            "original_tokens": digest["original_tokens"],
+            "digest_tokens": digest["digest_tokens"],
+            "prompt_calls": sum(u["calls"] for u in consumers.values()),
+            "input_tokens_without_digest": excerpt_tokens,
+            "input_tokens_with_digest": digest_tokens,
+            "tokens_saved": excerpt_tokens - digest_tokens,
+            "consumers": consumers
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Digests in memory and prompt tokens saved across them"""
+        with self._lock:
+            usages = [u for consumers in self._usage.values() for u in consumers.values()]
+            return {
+                "max_chars": self.max_chars,
+                "cached_digests": len(self._digests),
+                "prompt_calls": sum(u["calls"] for u in usages),
+                "tokens_saved": sum(u["excerpt_tokens"] - u["digest_tokens"] for u in usages)
+            }
+
+
+_digester: Optional[DocumentDigester] = None
+_digester_lock = threading.Lock()
+
+
+def get_document_digester() -> DocumentDigester:
+    """Return the process-wide digester shared by the analysis chains"""
+    global _digester
+    if _digester is None:
+        with _digester_lock:
+            if _digester is None:
+                _digester = DocumentDigester()
+    return _digester
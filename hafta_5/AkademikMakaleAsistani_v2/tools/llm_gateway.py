@@ -0,0 +1,501 @@
+"""
+LLM Gateway - Process-wide pooled access to the OpenAI API
+Every module shares one HTTP connection pool; retries, the global concurrency
+limit and per-call timing/token accounting are applied in one place
+"""
+import contextvars
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Any, Callable
+
+import httpx
+import openai
+from dotenv import load_dotenv
+
+from analytics.metrics import percentile
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Priority classes: interactive questions are admitted before queued background analysis
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = {INTERACTIVE: 0, BACKGROUND: 1}
+
+_priority_class = contextvars.ContextVar("llm_priority_class", default=INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority_class: str):
+    """Tag LLM requests made inside the block (and in copied contexts) with a priority class"""
+    if priority_class not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority class: {priority_class}")
+    token = _priority_class.set(priority_class)
+    try:
+        yield
+    finally:
+        _priority_class.reset(token)
+
+
+def current_priority() -> str:
+    return _priority_class.get()
+
+
+class PriorityLimiter:
+    """
+    Concurrency limiter with priority classes
+
+    At most max_concurrency requests run at once and each class has its own
+    limit. When a slot frees up it goes to the highest-priority waiting request
+    whose class is under its limit (FIFO within a class). Running requests are
+    never interrupted; keeping the background limit below the total leaves
+    headroom for interactive requests.
+    """
+
+    def __init__(self, max_concurrency: int, class_limits: Dict[str, int] = None,
+                 wait_history: int = 500):
+        self.max_concurrency = max_concurrency
+        self.class_limits = {name: max_concurrency for name in PRIORITIES}
+        self.class_limits.update(class_limits or {})
+
+        self._condition = threading.Condition()
+        self._waiting: List[tuple] = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._running_by_class = {name: 0 for name in PRIORITIES}
+
+        self._metrics = {
+            name: {"requests": 0, "total_wait": 0.0, "max_wait": 0.0, "waits": deque(maxlen=wait_history)}
+            for name in PRIORITIES
+        }
+
+    def _next_admissible(self) -> Optional[tuple]:
+        for entry in sorted(self._waiting):
+            if self._running_by_class[entry[2]] < self.class_limits[entry[2]]:
+                return entry
+        return None
+
+    def acquire(self, priority_class: str = None) -> float:
+        """Block until a slot is granted; returns the time spent waiting"""
+        priority_class = priority_class or current_priority()
+        entry = (PRIORITIES[priority_class], next(self._sequence), priority_class)
+        start = time.perf_counter()
+
+        with self._condition:
+            self._waiting.append(entry)
+            while not (self._running < self.max_concurrency and self._next_admissible() == entry):
+                self._condition.wait()
+            self._waiting.remove(entry)
+            self._running += 1
+            self._running_by_class[priority_class] += 1
+
+            waited = time.perf_counter() - start
+            metrics = self._metrics[priority_class]
+            metrics["requests"] += 1
+            metrics["total_wait"] += waited
+            metrics["max_wait"] = max(metrics["max_wait"], waited)
+            metrics["waits"].append(waited)
+            # Another waiter may be admissible too (e.g. a different class)
+            self._condition.notify_all()
+
+        return waited
+
+    def release(self, priority_class: str):
+        with self._condition:
+            self._running -= 1
+            self._running_by_class[priority_class] -= 1
+            self._condition.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-class limits, current load and queue-wait metrics (seconds)"""
+        with self._condition:
+            queued = {name: 0 for name in PRIORITIES}
+            for _, _, name in self._waiting:
+                queued[name] += 1
+
+            classes = {}
+            for name, metrics in self._metrics.items():
+                waits = list(metrics["waits"])
+                classes[name] = {
+                    "limit": self.class_limits[name],
+                    "running": self._running_by_class[name],
+                    "queued": queued[name],
+                    "requests": metrics["requests"],
+                    "avg_wait": round(metrics["total_wait"] / metrics["requests"], 4) if metrics["requests"] else 0.0,
+                    "p50_wait": round(percentile(waits, 0.5), 4),
+                    "p95_wait": round(percentile(waits, 0.95), 4),
+                    "max_wait": round(metrics["max_wait"], 4)
+                }
+            return {"max_concurrency": self.max_concurrency, "running": self._running, "classes": classes}
+
+
+class LLMUsageStats:
+    """Thread-safe per-call timing and token accounting"""
+
+    def __init__(self, history_size: int = 200):
+        self._lock = threading.Lock()
+        self.history_size = history_size
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.errors = 0
+            self.retries = 0
+            self.total_seconds = 0.0
+            self.prompt_tokens = 0
+            self.completion_tokens = 0
+            self.by_model: Dict[str, Dict[str, Any]] = {}
+            self.recent_calls: List[Dict[str, Any]] = []
+
+    def record(self, model: str, seconds: float, prompt_tokens: int = 0,
+               completion_tokens: int = 0, retries: int = 0, error: str = None,
+               streamed: bool = False):
+        """Record one logical call (all retry attempts included in seconds)"""
+        model = model or "unknown"
+        with self._lock:
+            self.calls += 1
+            self.retries += retries
+            self.total_seconds += seconds
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            if error:
+                self.errors += 1
+
+            entry = self.by_model.setdefault(model, {
+                "calls": 0, "errors": 0, "total_seconds": 0.0,
+                "prompt_tokens": 0, "completion_tokens": 0
+            })
+            entry["calls"] += 1
+            entry["total_seconds"] += seconds
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            if error:
+                entry["errors"] += 1
+
+            self.recent_calls.append({
+                "model": model,
+                "seconds": round(seconds, 3),
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "retries": retries,
+                "streamed": streamed,
+                "error": error
+            })
+            del self.recent_calls[:-self.history_size]
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "retries": self.retries,
+                "total_seconds": round(self.total_seconds, 3),
+                "avg_seconds": round(self.total_seconds / self.calls, 3) if self.calls else 0.0,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "by_model": {model: dict(entry) for model, entry in self.by_model.items()}
+            }
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Streaming response body that frees the concurrency slot once consumed or closed"""
+
+    # Only the tail of the event stream is kept to find a final usage event
+    TAIL_BYTES = 8192
+
+    def __init__(self, stream, on_done: Callable[[bytes, int], None]):
+        self._stream = stream
+        self._on_done = on_done
+        self._done = False
+        self._tail = b""
+        self._events = 0
+
+    def __iter__(self):
+        for chunk in self._stream:
+            self._events += chunk.count(b"data:")
+            self._tail = (self._tail + chunk)[-self.TAIL_BYTES:]
+            yield chunk
+        self._finish()
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._finish()
+
+    def _finish(self):
+        if not self._done:
+            self._done = True
+            self._on_done(self._tail, self._events)
+
+
+class GatedTransport(httpx.BaseTransport):
+    """
+    httpx transport that wraps the pooled transport with:
+    - a global priority-aware limit on concurrent LLM requests
+    - exponential-backoff retries (honouring Retry-After) on throttling, 5xx and connection errors
+    - timing and token accounting parsed from the response body
+    """
+
+    RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+    def __init__(self, inner: httpx.BaseTransport, limiter: PriorityLimiter,
+                 stats: LLMUsageStats, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 20.0):
+        self.inner = inner
+        self.limiter = limiter
+        self.stats = stats
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Delay before the next attempt: Retry-After if given, else jittered exponential"""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+        return delay * random.uniform(0.5, 1.0)
+
+    @staticmethod
+    def _request_model(request: httpx.Request) -> str:
+        try:
+            return json.loads(request.content or b"{}").get("model", "unknown")
+        except (ValueError, httpx.RequestNotRead):
+            return "unknown"
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        model = self._request_model(request)
+        start = time.perf_counter()
+        retries = 0
+
+        priority_class = current_priority()
+        self.limiter.acquire(priority_class)
+        try:
+            while True:
+                try:
+                    response = self.inner.handle_request(request)
+                except httpx.TransportError as e:
+                    if retries >= self.max_retries:
+                        raise
+                    delay = self._backoff(retries)
+                    logger.warning(f"LLM request failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                    retries += 1
+                    continue
+
+                if response.status_code in self.RETRY_STATUS_CODES and retries < self.max_retries:
+                    delay = self._backoff(retries, response.headers.get("retry-after"))
+                    response.close()
+                    logger.warning(f"LLM request returned {response.status_code}, retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                    retries += 1
+                    continue
+                break
+        except Exception as e:
+            self.limiter.release(priority_class)
+            self.stats.record(model, time.perf_counter() - start, retries=retries, error=str(e))
+            raise
+
+        error = f"HTTP {response.status_code}" if response.status_code >= 400 else None
+
+        if response.headers.get("content-type", "").startswith("text/event-stream"):
+            # Keep the slot until the caller has consumed the stream
+            def on_done(tail: bytes, events: int):
+                self.limiter.release(priority_class)
+                prompt_tokens, completion_tokens = self._stream_usage(tail, events)
+                self.stats.record(model, time.perf_counter() - start, prompt_tokens,
+                                  completion_tokens, retries, error, streamed=True)
+
+            response.stream = _ReleasingStream(response.stream, on_done)
+            return response
+
+        try:
+            content = b"".join(response.stream)
+        finally:
+            response.stream.close()
+            self.limiter.release(priority_class)
+
+        buffered = httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            content=content,
+            extensions=response.extensions,
+            request=request
+        )
+
+        prompt_tokens, completion_tokens = self._body_usage(buffered)
+        self.stats.record(model, time.perf_counter() - start, prompt_tokens,
+                          completion_tokens, retries, error)
+        return buffered
+
+    @staticmethod
+    def _body_usage(response: httpx.Response) -> tuple:
+        try:
+            usage = response.json().get("usage") or {}
+        except (ValueError, AttributeError):
+            return 0, 0
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+    @staticmethod
+    def _stream_usage(tail: bytes, events: int) -> tuple:
+        """Usage from a final usage event if present, else one token per content event"""
+        for line in reversed(tail.splitlines()):
+            line = line.strip()
+            if not line.startswith(b"data:") or b'"usage"' not in line:
+                continue
+            try:
+                usage = json.loads(line[5:]).get("usage")
+            except ValueError:
+                continue
+            if usage:
+                return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+        # Last event is the [DONE] marker
+        return 0, max(events - 1, 0)
+
+    def close(self):
+        self.inner.close()
+
+
+class LLMGateway:
+    """
+    Shared entry point for all LLM calls
+
+    - client: openai.OpenAI on the pooled, gated HTTP client
+    - chat_model(): LangChain ChatOpenAI on the same HTTP client
+    - get_stats(): call counts, latency, retries and token usage
+
+    Requests are admitted by priority class (see llm_priority): interactive
+    questions go ahead of queued background analysis, and background work is
+    capped below the total so a slot stays free for questions.
+
+    Configuration (environment): OPENAI_API_KEY, OPENAI_BASE_URL,
+    MAX_CONCURRENT_LLM_CALLS, LLM_BACKGROUND_LIMIT, LLM_MAX_RETRIES, LLM_TIMEOUT
+    """
+
+    def __init__(self, api_key: str = None, base_url: str = None,
+                 max_concurrency: int = None, max_retries: int = None,
+                 timeout: float = None, backoff_base: float = 0.5,
+                 background_limit: int = None):
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
+        self.max_concurrency = max_concurrency or int(os.getenv("MAX_CONCURRENT_LLM_CALLS", "4"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "3"))
+        self.timeout = timeout or float(os.getenv("LLM_TIMEOUT", "120"))
+
+        self.background_limit = background_limit or int(
+            os.getenv("LLM_BACKGROUND_LIMIT", str(max(1, self.max_concurrency - 1)))
+        )
+
+        self.stats = LLMUsageStats()
+        self.limiter = PriorityLimiter(
+            self.max_concurrency,
+            {INTERACTIVE: self.max_concurrency, BACKGROUND: min(self.background_limit, self.max_concurrency)}
+        )
+
+        # Keep-alive pool sized to the concurrency limit so connections are reused
+        limits = httpx.Limits(
+            max_connections=self.max_concurrency * 2,
+            max_keepalive_connections=self.max_concurrency
+        )
+        self.transport = GatedTransport(
+            httpx.HTTPTransport(limits=limits),
+            self.limiter,
+            self.stats,
+            max_retries=self.max_retries,
+            backoff_base=backoff_base
+        )
+        self.http_client = httpx.Client(transport=self.transport, timeout=self.timeout)
+
+        self._client = None
+        self._client_lock = threading.Lock()
+
+        logger.info(
+            f"LLM gateway ready (max_concurrency={self.max_concurrency}, "
+            f"background_limit={self.limiter.class_limits[BACKGROUND]}, "
+            f"max_retries={self.max_retries}, base_url={self.base_url or 'default'})"
+        )
+
+    @property
+    def client(self) -> openai.OpenAI:
+        """Process-wide OpenAI client (retries are handled by the gateway transport)"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = openai.OpenAI(
+                        api_key=self.api_key,
+                        base_url=self.base_url,
+                        http_client=self.http_client,
+                        max_retries=0
+                    )
+        return self._client
+
+    def chat_model(self, model_name: str = "gpt-4o-mini", temperature: float = 0.3,
+                   chain: Optional[str] = None, **kwargs):
+        """
+        LangChain chat model sharing the gateway's connection pool and limits
+
+        chain names the model's calls in callback metadata (see analytics/chain_usage.py)
+        """
+        from langchain.chat_models import ChatOpenAI
+
+        if chain:
+            kwargs["metadata"] = {**kwargs.get("metadata", {}), "chain": chain}
+        if self.base_url:
+            kwargs.setdefault("openai_api_base", self.base_url)
+        return ChatOpenAI(
+            model_name=model_name,
+            temperature=temperature,
+            openai_api_key=self.api_key,
+            http_client=self.http_client,
+            max_retries=0,
+            **kwargs
+        )
+
+    def chat_completion(self, **kwargs):
+        """Shorthand for client.chat.completions.create"""
+        return self.client.chat.completions.create(**kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.stats.summary()
+        stats["max_concurrency"] = self.max_concurrency
+        stats["scheduling"] = self.limiter.get_stats()
+        return stats
+
+    def close(self):
+        self.http_client.close()
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """Return the process-wide gateway, creating it on first use"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
+
+
+def set_gateway(gateway: Optional[LLMGateway]) -> Optional[LLMGateway]:
+    """Replace the process-wide gateway (e.g. a different endpoint or limits); returns the old one"""
+    global _gateway
+    with _gateway_lock:
+        previous, _gateway = _gateway, gateway
+    return previous
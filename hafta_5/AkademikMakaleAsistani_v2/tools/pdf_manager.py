@@ -9,11 +9,14 @@ from typing import Dict, List, Optional, Tuple, Any
 from pathlib import Path
 import logging
 from PyPDF2 import PdfReader
-import openai
 from dotenv import load_dotenv
 import hashlib
 import shutil
 import re
+import math
+import threading
+
+from tools.llm_gateway import get_gateway
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -21,29 +24,78 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+
+def detect_language(text: str) -> str:
+    """Turkish or English by the share of Turkish-specific characters"""
+    turkish_count = sum(1 for char in text if char in "ğüşıöçĞÜŞİÖÇ")
+    return "turkish" if turkish_count > len(text) * 0.01 else "english"
+
+
 class EnhancedPDFManager:
     """
     Enhanced PDF Manager with comprehensive document processing capabilities
     Includes features from hafta_4 with advanced metadata management
     """
     
-    def __init__(self, pdf_dir: str = None, data_dir: str = None):
+    # Lines that tend to be set in a large font on a first page without being the title
+    TITLE_NOISE_PATTERNS = [
+        r'^arxiv:', r'^vol\.?', r'^volume', r'^issn', r'^doi', r'^https?://', r'journal of',
+        r'^abstract$', r'^introduction$', r'^\d+\s+introduction$', r'^article info', r'^research article$',
+        r'^original article$', r'applications$', r'^contents lists', r'^received', r'^available online'
+    ]
+    GENERIC_INFO_VALUES = ["untitled", "microsoft word", "windows user", "user", "admin", "owner", "author"]
+    # First-page cues for the research type when the LLM is not asked (same labels as its prompt)
+    RESEARCH_TYPE_CUES = {
+        "karma": [r'mixed[- ]methods?', r'karma yöntem'],
+        "nicel": [r'\bquantitative', r'\bsurvey\b', r'\bregression\b', r'\bexperiment', r'\bnicel\b',
+                  r'\banket\b', r'\bdeney'],
+        "nitel": [r'\bqualitative', r'\binterviews?\b', r'\bcase study\b', r'\bnitel\b', r'görüşme',
+                  r'durum çalışması'],
+        "teorik": [r'\btheoretical\b', r'\bconceptual\b', r'\bliterature review\b', r'\bkuramsal\b',
+                   r'\bteorik\b', r'\bderleme\b'],
+    }
+    # First-page lines whose year is the publication year (not received/revised dates or citations)
+    PUBLICATION_YEAR_CUES = [r'©', r'\(c\)', r'copyright', r'published', r'journal', r'\bvol\.?\s*\d',
+                             r'\bvolume\b', r'\bcilt\b', r'yayın', r'telif']
+    # Fields the confidence requires besides the title
+    REQUIRED_METADATA_FIELDS = ["authors", "publication_year"]
+    UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+    
+    # Guards read-modify-write cycles on the JSON stores when PDFs are processed concurrently
+    _store_lock = threading.RLock()
+    
+    def __init__(self, pdf_dir: str = None, data_dir: str = None,
+                 heuristic_confidence_threshold: float = None, max_upload_size_mb: float = None):
         self.pdf_dir = Path(pdf_dir) if pdf_dir else Path(__file__).parent.parent / 'pdfs'
         self.data_dir = Path(data_dir) if data_dir else Path(__file__).parent.parent / 'data'
         self.metadata_file = self.data_dir / 'metadata.json'
         self.library_index_file = self.data_dir / 'library_index.json'
+        self.llm_metadata_cache_file = self.data_dir / 'llm_metadata_cache.json'
         
         # Create directories if they don't exist
         self.pdf_dir.mkdir(exist_ok=True)
         self.data_dir.mkdir(exist_ok=True)
         
-        # Initialize OpenAI client
+        # Shared OpenAI client from the LLM gateway
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         if self.openai_api_key:
-            self.openai_client = openai.OpenAI(api_key=self.openai_api_key)
+            self.openai_client = get_gateway().client
         else:
             logger.warning("OpenAI API key not found - title extraction will be limited")
             self.openai_client = None
+        
+        # Local metadata extraction is trusted above this confidence; below it we ask the LLM
+        if heuristic_confidence_threshold is None:
+            heuristic_confidence_threshold = float(os.getenv("METADATA_HEURISTIC_THRESHOLD", "0.8"))
+        self.heuristic_confidence_threshold = heuristic_confidence_threshold
+        # Where document metadata came from: heuristics, an LLM call or the LLM metadata cache
+        self.metadata_source_counts = {"heuristic": 0, "llm": 0, "llm_cache": 0}
+        self._counts_lock = threading.Lock()
+        
+        # Upload size limit, enforced while streaming the upload to disk
+        if max_upload_size_mb is None:
+            max_upload_size_mb = float(os.getenv("MAX_UPLOAD_SIZE", "50"))
+        self.max_upload_bytes = int(max_upload_size_mb * 1024 * 1024)
     
     def load_metadata(self) -> Dict:
         """Load metadata from JSON file"""
@@ -70,11 +122,13 @@ class EnhancedPDFManager:
         try:
             if self.library_index_file.exists():
                 with open(self.library_index_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return {"documents": {}, "categories": {}, "authors": {}, "keywords": {}}
+                    index = json.load(f)
+                index.setdefault("hashes", {})
+                return index
+            return {"documents": {}, "categories": {}, "authors": {}, "keywords": {}, "hashes": {}}
         except Exception as e:
             logger.error(f"Error loading library index: {e}")
-            return {"documents": {}, "categories": {}, "authors": {}, "keywords": {}}
+            return {"documents": {}, "categories": {}, "authors": {}, "keywords": {}, "hashes": {}}
     
     def save_library_index(self, index: Dict) -> None:
         """Save library index"""
@@ -84,6 +138,25 @@ class EnhancedPDFManager:
         except Exception as e:
             logger.error(f"Error saving library index: {e}")
     
+    def load_llm_metadata_cache(self) -> Dict:
+        """Load LLM metadata results cached per file hash"""
+        try:
+            if self.llm_metadata_cache_file.exists():
+                with open(self.llm_metadata_cache_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            return {}
+        except Exception as e:
+            logger.error(f"Error loading LLM metadata cache: {e}")
+            return {}
+    
+    def save_llm_metadata_cache(self, cache: Dict) -> None:
+        """Save LLM metadata cache"""
+        try:
+            with open(self.llm_metadata_cache_file, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            logger.error(f"Error saving LLM metadata cache: {e}")
+    
     def extract_text(self, pdf_path: str) -> str:
         """Extract text from PDF file"""
         try:
@@ -97,22 +170,23 @@ class EnhancedPDFManager:
             logger.error(f"Error extracting text from {pdf_path}: {e}")
             return ""
     
-    def extract_enhanced_metadata(self, pdf_path: str, pdf_text: str) -> Dict[str, Any]:
+    def extract_enhanced_metadata(self, pdf_path: str, pdf_text: str, file_hash: str = None) -> Dict[str, Any]:
         """Extract comprehensive metadata from PDF"""
         try:
             # Basic file metadata
             file_stat = os.stat(pdf_path)
+            file_hash = file_hash or self._calculate_file_hash(pdf_path)
             basic_metadata = {
                 "file_size": file_stat.st_size,
                 "upload_date": datetime.datetime.fromtimestamp(file_stat.st_mtime).isoformat(),
-                "file_hash": self._calculate_file_hash(pdf_path),
+                "file_hash": file_hash,
                 "text_length": len(pdf_text),
                 "page_count": self._get_page_count(pdf_path)
             }
             
-            # Enhanced metadata with LLM
-            if self.openai_client and pdf_text:
-                enhanced_metadata = self._extract_metadata_with_llm(pdf_text)
+            # Local heuristics first, single cached LLM call only when they are not confident
+            if pdf_text:
+                enhanced_metadata = self.extract_document_metadata(pdf_path, pdf_text, file_hash)
                 basic_metadata.update(enhanced_metadata)
             
             return basic_metadata
@@ -121,8 +195,275 @@ class EnhancedPDFManager:
             logger.error(f"Error extracting enhanced metadata: {e}")
             return {"error": str(e)}
     
+    def extract_document_metadata(self, pdf_path: str, pdf_text: str, file_hash: str = None) -> Dict[str, Any]:
+        """
+        Resolve document metadata, preferring the local heuristic extractor
+        
+        The LLM is only consulted when the heuristic confidence is below
+        heuristic_confidence_threshold. LLM fields win, empty ones are filled from heuristics.
+        """
+        heuristic_metadata = self.extract_metadata_heuristically(pdf_path, pdf_text)
+        confidence = heuristic_metadata.get("metadata_confidence", 0.0)
+        
+        if confidence >= self.heuristic_confidence_threshold or not self.openai_client:
+            self._count_metadata_source("heuristic")
+            heuristic_metadata["metadata_source"] = "heuristic"
+            logger.info(f"Using heuristic metadata for {Path(pdf_path).name} (confidence {confidence:.2f})")
+            return heuristic_metadata
+        
+        # Counted as "llm" or "llm_cache" by extract_structured_metadata
+        llm_metadata = self.extract_structured_metadata(pdf_text, file_hash)
+        
+        metadata = dict(heuristic_metadata)
+        metadata.update({key: value for key, value in llm_metadata.items() if value})
+        metadata["metadata_source"] = "llm" if llm_metadata else "heuristic"
+        return metadata
+    
+    def _count_metadata_source(self, source: str):
+        with self._counts_lock:
+            self.metadata_source_counts[source] += 1
+    
+    def get_metadata_source_counts(self) -> Dict[str, int]:
+        """Metadata extractions of this process by source (heuristic, llm, llm_cache)"""
+        with self._counts_lock:
+            return dict(self.metadata_source_counts)
+    
+    def _guess_research_type(self, text: str) -> str:
+        """Research type with the most first-page cues, "" without any"""
+        lowered = text.lower()
+        hits = {research_type: sum(len(re.findall(cue, lowered)) for cue in cues)
+                for research_type, cues in self.RESEARCH_TYPE_CUES.items()}
+        if hits["karma"]:
+            return "karma"
+        best = max(hits, key=hits.get)
+        return best if hits[best] else ""
+    
+    def _find_publication_year(self, text: str) -> str:
+        """
+        Publication year from the first page, "" when it can not be told apart
+        
+        A year on a copyright, journal or volume line wins. Otherwise the page must
+        mention a single year: several years are usually received/revised dates or
+        citations, and the LLM is asked instead.
+        """
+        year_pattern = r'\b(19[5-9]\d|20\d{2})\b'
+        for line in text.splitlines():
+            if any(re.search(cue, line, re.IGNORECASE) for cue in self.PUBLICATION_YEAR_CUES):
+                match = re.search(year_pattern, line)
+                if match:
+                    return match.group(1)
+        years = set(re.findall(year_pattern, text))
+        return years.pop() if len(years) == 1 else ""
+    
+    def extract_metadata_heuristically(self, pdf_path: str, pdf_text: str = "") -> Dict[str, Any]:
+        """
+        Extract metadata from the PDF info dictionary and the first page layout
+        
+        Returns the usual metadata fields plus metadata_confidence (0-1): the title score
+        scaled by how many of REQUIRED_METADATA_FIELDS were found, so a confident title
+        with missing authors or year still goes to the LLM. The research type and language
+        are local guesses; the research field is left to the research categorization
+        (see apply_research_categorization).
+        """
+        try:
+            reader = PdfReader(pdf_path)
+            info = reader.metadata or {}
+            first_page_text = pdf_text[:3000] if pdf_text else ""
+            
+            info_title = self._clean_info_value(info.get("/Title"))
+            if info_title and len(info_title.split()) < 3:
+                info_title = ""
+            
+            font_candidates = []
+            body_size = 0.0
+            if reader.pages:
+                font_candidates, body_size = self._get_large_font_lines(reader.pages[0])
+                if not first_page_text:
+                    first_page_text = reader.pages[0].extract_text() or ""
+            
+            # Score the title: info dictionary and layout agreeing is the strongest signal
+            title, confidence = "", 0.0
+            matching = [c for c in font_candidates if info_title and self._titles_agree(info_title, c["text"])]
+            if matching:
+                # Info titles are often truncated, the rendered one is complete
+                title = max([info_title, matching[0]["text"]], key=len)
+                confidence = 0.95
+            elif info_title:
+                title, confidence = info_title, 0.7
+            elif font_candidates:
+                best = font_candidates[0]
+                title, confidence = best["text"], 0.6
+                if body_size and best["size"] >= body_size * 1.2:
+                    confidence += 0.15
+            
+            authors = []
+            info_author = self._clean_info_value(info.get("/Author"))
+            if info_author and len(info_author.split()) >= 2:
+                authors = [a.strip() for a in re.split(r';|,|\band\b', info_author) if a.strip()]
+            
+            keywords = []
+            info_keywords = self._clean_info_value(info.get("/Keywords"))
+            keyword_match = re.search(r'key\s*words?\s*[:\-—]\s*(.+)', first_page_text, re.IGNORECASE)
+            if info_keywords:
+                keywords = [k.strip() for k in re.split(r'[;,]', info_keywords) if k.strip()]
+            elif keyword_match:
+                keywords = [k.strip() for k in re.split(r'[;,·•]', keyword_match.group(1)) if k.strip()][:10]
+            
+            abstract = ""
+            abstract_match = re.search(
+                r'abstract\s*[:\-—]?\s*(.+?)(?:key\s*words?|index terms|\n\s*1\.?\s+introduction|\nintroduction)',
+                first_page_text, re.IGNORECASE | re.DOTALL
+            )
+            if abstract_match:
+                abstract = re.sub(r'\s+', ' ', abstract_match.group(1)).strip()[:2000]
+            
+            year = self._find_publication_year(first_page_text)
+            # The file's creation date is only a fallback value, it does not count as found
+            creation_date = str(info.get("/CreationDate") or "")
+            fallback_year = creation_date[2:6] if re.match(r'^D:(\d{4})', creation_date) and \
+                not re.search(r'\b(19[5-9]\d|20\d{2})\b', first_page_text) else ""
+            
+            found = {"authors": authors, "publication_year": year}
+            coverage = sum(1 for field in self.REQUIRED_METADATA_FIELDS if found[field]) / \
+                len(self.REQUIRED_METADATA_FIELDS)
+            confidence *= 0.5 + 0.5 * coverage
+            
+            doi = self._clean_info_value(info.get("/doi"))
+            doi_match = re.search(r'\b(10\.\d{4,9}/[^\s,;]+)', first_page_text)
+            if not doi and doi_match:
+                doi = doi_match.group(1).rstrip('.')
+            
+            return {
+                "title": title,
+                "authors": authors,
+                "abstract": abstract,
+                "keywords": keywords,
+                "research_field": "",
+                "research_type": self._guess_research_type(first_page_text),
+                "publication_year": year or fallback_year,
+                "journal": "",
+                "doi": doi,
+                "language": detect_language(pdf_text or first_page_text) if (pdf_text or first_page_text) else "",
+                "metadata_confidence": round(min(confidence, 1.0), 2)
+            }
+            
+        except Exception as e:
+            logger.error(f"Error extracting heuristic metadata from {pdf_path}: {e}")
+            return {"metadata_confidence": 0.0}
+    
+    def evaluate_heuristic_coverage(self, pdf_paths: List[str]) -> Dict[str, Any]:
+        """Report which PDFs of a sample corpus would skip the LLM metadata call"""
+        per_file = []
+        for pdf_path in pdf_paths:
+            metadata = self.extract_metadata_heuristically(pdf_path)
+            confidence = metadata.get("metadata_confidence", 0.0)
+            per_file.append({
+                "name": Path(pdf_path).name,
+                "title": metadata.get("title", ""),
+                "confidence": confidence,
+                "skips_llm": confidence >= self.heuristic_confidence_threshold
+            })
+        
+        skipped = sum(1 for item in per_file if item["skips_llm"])
+        return {
+            "total": len(per_file),
+            "skipped_llm": skipped,
+            "skip_fraction": skipped / len(per_file) if per_file else 0.0,
+            "threshold": self.heuristic_confidence_threshold,
+            "files": per_file
+        }
+    
+    def _get_large_font_lines(self, page) -> Tuple[List[Dict[str, Any]], float]:
+        """Group first page text by rendered font size, largest first, noise lines removed"""
+        fragments = []
+        
+        def visitor(text, cm, tm, font_dict, font_size):
+            if text and text.strip() and font_size:
+                size = font_size * math.hypot(tm[2], tm[3]) * math.hypot(cm[2], cm[3])
+                fragments.append((round(size, 1), text))
+        
+        page.extract_text(visitor_text=visitor)
+        if not fragments:
+            return [], 0.0
+        
+        # Body size = size that carries the most characters
+        chars_by_size = {}
+        for size, text in fragments:
+            chars_by_size[size] = chars_by_size.get(size, 0) + len(text.strip())
+        body_size = max(chars_by_size, key=chars_by_size.get)
+        
+        candidates = []
+        for size in sorted(chars_by_size, reverse=True)[:3]:
+            if size <= body_size:
+                break
+            lines = " ".join(text for s, text in fragments if s == size).split("\n")
+            lines = [re.sub(r'\s+', ' ', line).strip() for line in lines]
+            lines = [line for line in lines if line and not self._is_title_noise(line)]
+            text = re.sub(r'\s+-\s+', '-', " ".join(lines)).strip()
+            
+            words = text.split()
+            single_letters = sum(1 for w in words if len(w) == 1 and w.isalpha())
+            if 3 <= len(words) <= 40 and single_letters / len(words) < 0.3:
+                candidates.append({"text": text, "size": size})
+        
+        return candidates, body_size
+    
+    def _is_title_noise(self, line: str) -> bool:
+        """Check whether a large-font line is a header, journal name or section label"""
+        lowered = line.lower()
+        return any(re.search(pattern, lowered) for pattern in self.TITLE_NOISE_PATTERNS)
+    
+    def _titles_agree(self, first: str, second: str) -> bool:
+        """Check whether two title strings refer to the same title"""
+        first_words = set(re.findall(r'\w+', first.lower()))
+        second_words = set(re.findall(r'\w+', second.lower()))
+        if not first_words or not second_words:
+            return False
+        overlap = len(first_words & second_words) / min(len(first_words), len(second_words))
+        return overlap >= 0.8
+    
+    def _clean_info_value(self, value) -> str:
+        """Clean a PDF info dictionary value, dropping generic placeholders"""
+        if value is None:
+            return ""
+        value = re.sub(r'\s+', ' ', str(value)).strip()
+        lowered = value.lower()
+        if not value or re.search(r'\.(docx?|pdf|tex|dvi)$', lowered):
+            return ""
+        if any(lowered.startswith(generic) for generic in self.GENERIC_INFO_VALUES):
+            return ""
+        return value
+    
+    def extract_structured_metadata(self, pdf_text: str, file_hash: str = None) -> Dict[str, Any]:
+        """
+        Extract title, authors, year, abstract, keywords and category in one LLM call
+        
+        Results are cached per file hash so every upload costs at most one round trip,
+        no matter how many times save_pdf / process_pdf touch the same file.
+        """
+        if file_hash:
+            cache = self.load_llm_metadata_cache()
+            if file_hash in cache:
+                logger.info(f"LLM metadata cache hit for {file_hash}")
+                self._count_metadata_source("llm_cache")
+                return dict(cache[file_hash])
+        
+        if not self.openai_client:
+            return {}
+        
+        metadata = self._extract_metadata_with_llm(pdf_text)
+        self._count_metadata_source("llm")
+        
+        if file_hash and metadata:
+            with self._store_lock:
+                cache = self.load_llm_metadata_cache()
+                cache[file_hash] = metadata
+                self.save_llm_metadata_cache(cache)
+        
+        return metadata
+    
     def _extract_metadata_with_llm(self, pdf_text: str) -> Dict[str, Any]:
-        """Extract metadata using LLM analysis"""
+        """Extract metadata using a single structured-output LLM call"""
         try:
             prompt = f"""
 Aşağıdaki akademik makale metnini analiz ederek şu bilgileri JSON formatında çıkar:
@@ -131,13 +472,15 @@ Aşağıdaki akademik makale metnini analiz ederek şu bilgileri JSON formatınd
 2. authors (yazarlar - liste halinde)
 3. abstract (özet - varsa)
 4. keywords (anahtar kelimeler - liste halinde) 
-5. research_field (araştırma alanı)
+5. research_field (araştırma alanı / kategori)
 6. research_type (nicel/nitel/karma/teorik)
 7. publication_year (yayın yılı - varsa)
 8. journal (dergi adı - varsa)
 9. doi (DOI - varsa)
 10. language (makale dili)
 
+Bulunamayan alanlar için boş değer kullan. Başlık bulunamazsa "title" alanını boş bırak.
+
 Makale Metni (İlk 3000 karakter):
 {pdf_text[:3000]}
 
@@ -161,10 +504,11 @@ JSON formatında yanıt ver:
                 messages=[
                     {
                         "role": "system",
-                        "content": "Sen akademik makale metadatası çıkaran bir uzmansın. JSON formatında yanıt verirsin."
+                        "content": "Sen akademik makale metadatası çıkaran bir uzmansın. Sadece geçerli JSON formatında yanıt verirsin."
                     },
                     {"role": "user", "content": prompt}
                 ],
+                response_format={"type": "json_object"},
                 temperature=0.2,
                 max_tokens=800,
                 timeout=60
@@ -174,8 +518,7 @@ JSON formatında yanıt ver:
             
             # Parse JSON response
             try:
-                metadata = json.loads(response_text)
-                return metadata
+                return self._normalize_llm_metadata(json.loads(response_text))
             except json.JSONDecodeError:
                 logger.warning("Could not parse LLM metadata response as JSON, trying to extract title manually")
                 # Try to extract title from response text
@@ -188,6 +531,30 @@ JSON formatında yanıt ver:
             logger.error(f"Error extracting metadata with LLM: {e}")
             return {}
     
+    def _normalize_llm_metadata(self, raw: Dict[str, Any]) -> Dict[str, Any]:
+        """Coerce LLM metadata into the types used by the metadata store and library index"""
+        if not isinstance(raw, dict):
+            return {}
+        
+        metadata = dict(raw)
+        
+        for list_field in ("authors", "keywords"):
+            value = metadata.get(list_field)
+            if isinstance(value, str):
+                value = [item.strip() for item in re.split(r'[;,]', value) if item.strip()]
+            metadata[list_field] = [str(item).strip() for item in (value or []) if str(item).strip()]
+        
+        for text_field in ("title", "abstract", "research_field", "research_type",
+                           "publication_year", "journal", "doi", "language"):
+            value = metadata.get(text_field)
+            metadata[text_field] = str(value).strip() if value is not None else ""
+        
+        failure_indicators = ["başlık bulunamadı", "başlık çıkarılamadı", "title not found", "no title"]
+        if any(indicator in metadata["title"].lower() for indicator in failure_indicators):
+            metadata["title"] = ""
+        
+        return metadata
+    
     def _clean_filename(self, title: str) -> str:
         """Clean title for use as filename"""
         if not title:
@@ -208,41 +575,11 @@ JSON formatında yanıt ver:
         # Limit length
         return title[:150].strip()
 
-    def extract_title_with_llm(self, pdf_text: str) -> str:
-        """Extract title from PDF text using LLM"""
+    def extract_title_with_llm(self, pdf_text: str, file_hash: str = None) -> str:
+        """Extract title from PDF text using the combined metadata LLM call"""
         try:
-            if not self.openai_client:
-                return None
-                
-            prompt = f"""
-Aşağıdaki akademik makale metninden SADECE makale başlığını çıkar. 
-Sadece başlığı ver, başka hiçbir şey yazma.
-Eğer başlık bulamazsan "Başlık bulunamadı" yaz.
-
-Makale Metni (İlk 3000 karakter):
-{pdf_text[:3000]}
-
-Başlık:"""
-            
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Sen akademik makale başlığı çıkarma uzmanısın. Sadece başlığı ver, başka hiçbir şey yazma."
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.2,
-                max_tokens=200,
-                timeout=30
-            )
-            
-            title = response.choices[0].message.content.strip()
-            
-            # Check for failure indicators
-            failure_indicators = ["başlık bulunamadı", "başlık çıkarılamadı", "title not found", "no title"]
-            if any(indicator in title.lower() for indicator in failure_indicators):
+            title = self.extract_structured_metadata(pdf_text, file_hash).get("title")
+            if not title:
                 return None
             
             return self._clean_filename(title)
@@ -257,12 +594,21 @@ Başlık:"""
         Returns (file_path, final_name)
         """
         try:
-            # Save initial file
+            # Stream the upload to a partial file, hashing and size-checking on the way
             original_name = uploaded_file.name
             temp_path = self.pdf_dir / original_name
+            partial_path = self.pdf_dir / f"{original_name}.part"
             
-            with open(temp_path, 'wb') as f:
-                f.write(uploaded_file.getbuffer())
+            file_hash, _ = self._stream_upload(uploaded_file, partial_path)
+            
+            # Duplicate check before any extraction or LLM work
+            existing = self.find_pdf_by_hash(file_hash)
+            if existing:
+                partial_path.unlink()
+                logger.info(f"Duplicate upload {original_name} matches {existing[1]}, skipping processing")
+                return existing
+            
+            partial_path.replace(temp_path)
             
             # Extract text and metadata
             pdf_text = self.extract_text(str(temp_path))
@@ -272,46 +618,70 @@ Başlık:"""
                 return str(temp_path), original_name
             
             # Enhanced metadata extraction
-            enhanced_metadata = self.extract_enhanced_metadata(str(temp_path), pdf_text)
-            
-            # Intelligent title extraction - Try multiple methods
-            extracted_title = enhanced_metadata.get('title')
-            if not extracted_title or extracted_title == "Başlık çıkarılamadı":
-                extracted_title = self.extract_title_with_llm(pdf_text)
-            
-            # Clean and validate title
-            if extracted_title:
-                # Remove common invalid title patterns
-                invalid_patterns = ["Başlık çıkarılamadı", "Bilinmeyen Başlık", "Title not found", "No title", ""]
-                if extracted_title not in invalid_patterns and len(extracted_title.strip()) > 3:
-                    # Clean title for filename
-                    clean_title = self._clean_filename(extracted_title)
-                    if len(clean_title) > 3:
-                        extracted_title = clean_title
-                    else:
-                        extracted_title = None
+            enhanced_metadata = self.extract_enhanced_metadata(str(temp_path), pdf_text, file_hash)
+            
+            file_path, final_name = self.add_to_library(temp_path, pdf_text, enhanced_metadata, file_hash)
+            
+            logger.info(f"PDF saved successfully: {final_name}")
+            return file_path, final_name
+            
+        except ValueError as e:
+            # Rejected upload (e.g. over the size limit) - let the caller report it
+            logger.error(f"Upload rejected: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Error saving PDF: {e}")
+            # Return original file if something goes wrong
+            return str(self.pdf_dir / uploaded_file.name), uploaded_file.name
+    
+    def add_to_library(self, pdf_path, pdf_text: str, enhanced_metadata: Dict[str, Any],
+                       file_hash: str = None, original_name: str = None) -> Tuple[str, str]:
+        """
+        Name a PDF after its title and register it in the metadata store and library index
+        
+        Files already inside pdf_dir are renamed, files elsewhere (bulk imports) are copied in.
+        Returns (file_path, final_name)
+        """
+        pdf_path = Path(pdf_path)
+        original_name = original_name or pdf_path.name
+        
+        # Title comes from the same structured metadata call
+        extracted_title = enhanced_metadata.get('title')
+        
+        # Clean and validate title
+        if extracted_title:
+            # Remove common invalid title patterns
+            invalid_patterns = ["Başlık çıkarılamadı", "Bilinmeyen Başlık", "Title not found", "No title", ""]
+            if extracted_title not in invalid_patterns and len(extracted_title.strip()) > 3:
+                # Clean title for filename
+                clean_title = self._clean_filename(extracted_title)
+                if len(clean_title) > 3:
+                    extracted_title = clean_title
                 else:
                     extracted_title = None
+            else:
+                extracted_title = None
+        
+        base_name = extracted_title if extracted_title and len(extracted_title) > 3 else Path(original_name).stem
+        in_library = pdf_path.parent.resolve() == self.pdf_dir.resolve()
+        
+        with self._store_lock:
+            new_filename = f"{base_name}.pdf"
+            new_path = self.pdf_dir / new_filename
             
-            # Generate new filename if title is meaningful
-            if extracted_title and len(extracted_title) > 3:
-                new_filename = f"{extracted_title}.pdf"
+            # Handle duplicate names
+            counter = 1
+            while new_path.exists() and new_path != pdf_path:
+                new_filename = f"{base_name}_{counter}.pdf"
                 new_path = self.pdf_dir / new_filename
-                
-                # Handle duplicate names
-                counter = 1
-                while new_path.exists():
-                    new_filename = f"{extracted_title}_{counter}.pdf"
-                    new_path = self.pdf_dir / new_filename
-                    counter += 1
-                
-                # Rename file
-                temp_path.rename(new_path)
-                final_name = new_filename
-                file_path = str(new_path)
+                counter += 1
+            
+            if in_library:
+                pdf_path.rename(new_path)
             else:
-                final_name = original_name
-                file_path = str(temp_path)
+                shutil.copyfile(pdf_path, new_path)
+            final_name = new_filename
+            file_path = str(new_path)
             
             # Update metadata store
             metadata_store = self.load_metadata()
@@ -325,33 +695,117 @@ Başlık:"""
             
             # Update library index
             self._update_library_index(final_name, enhanced_metadata, pdf_text[:1000])
-            
-            logger.info(f"PDF saved successfully: {final_name}")
-            return file_path, final_name
-            
-        except Exception as e:
-            logger.error(f"Error saving PDF: {e}")
-            # Return original file if something goes wrong
-            return str(self.pdf_dir / uploaded_file.name), uploaded_file.name
+            self.register_file_hash(file_hash, final_name)
+        
+        return file_path, final_name
+    
+    def _stream_upload(self, uploaded_file, target_path: Path) -> Tuple[str, int]:
+        """
+        Write an uploaded file to disk in chunks while hashing it
+        
+        Raises ValueError as soon as the upload exceeds max_upload_bytes.
+        Returns (md5 hash, bytes written).
+        """
+        declared_size = getattr(uploaded_file, "size", None)
+        if declared_size and declared_size > self.max_upload_bytes:
+            raise ValueError(
+                f"{uploaded_file.name} is {declared_size / (1024 * 1024):.1f} MB, "
+                f"limit is {self.max_upload_bytes / (1024 * 1024):g} MB"
+            )
+        
+        if hasattr(uploaded_file, "seek"):
+            uploaded_file.seek(0)
+        
+        hash_md5 = hashlib.md5()
+        written = 0
+        try:
+            with open(target_path, 'wb') as f:
+                for chunk in iter(lambda: uploaded_file.read(self.UPLOAD_CHUNK_SIZE), b""):
+                    written += len(chunk)
+                    if written > self.max_upload_bytes:
+                        raise ValueError(
+                            f"{uploaded_file.name} exceeds the "
+                            f"{self.max_upload_bytes / (1024 * 1024):g} MB upload limit"
+                        )
+                    hash_md5.update(chunk)
+                    f.write(chunk)
+        except Exception:
+            if target_path.exists():
+                target_path.unlink()
+            raise
+        
+        return hash_md5.hexdigest(), written
+    
+    def find_pdf_by_hash(self, file_hash: str) -> Optional[Tuple[str, str]]:
+        """Find an already stored PDF with the same content, returns (file_path, pdf_name)"""
+        if not file_hash:
+            return None
+        
+        metadata_store = self.load_metadata()
+        library_index = self.load_library_index()
+        
+        pdf_name = library_index["hashes"].get(file_hash)
+        if pdf_name is None:
+            # Entries stored before the hash index existed
+            pdf_name = next(
+                (name for name, info in metadata_store.items()
+                 if info.get("extracted_metadata", {}).get("file_hash") == file_hash),
+                None
+            )
+            if pdf_name is None:
+                return None
+            self.register_file_hash(file_hash, pdf_name)
+        
+        info = metadata_store.get(pdf_name, {})
+        file_path = info.get("file_path") or str(self.pdf_dir / pdf_name)
+        if Path(file_path).exists():
+            return file_path, pdf_name
+        
+        return None
+    
+    def register_file_hash(self, file_hash: str, pdf_name: str) -> None:
+        """Record which library document a content hash belongs to"""
+        if not file_hash:
+            return
+        with self._store_lock:
+            library_index = self.load_library_index()
+            library_index["hashes"][file_hash] = pdf_name
+            self.save_library_index(library_index)
+    
+    def get_file_hashes(self, pdf_name: str) -> List[str]:
+        """Content hashes recorded for a library document"""
+        hashes = {file_hash for file_hash, name in self.load_library_index()["hashes"].items() if name == pdf_name}
+        stored_hash = self.load_metadata().get(pdf_name, {}).get("extracted_metadata", {}).get("file_hash")
+        if stored_hash:
+            hashes.add(stored_hash)
+        return sorted(hashes)
+    
+    def get_file_hash(self, pdf_path: str) -> str:
+        """Content hash used to recognise the same paper under any file name"""
+        return self._calculate_file_hash(pdf_path)
     
     def delete_pdf(self, pdf_name: str) -> bool:
-        """Delete PDF and its metadata"""
+        """Delete PDF, its metadata and its content hashes (a re-upload is then a new document)"""
         try:
             # Remove file
             file_path = self.pdf_dir / pdf_name
             if file_path.exists():
                 file_path.unlink()
             
-            # Remove from metadata
-            metadata_store = self.load_metadata()
-            if pdf_name in metadata_store:
-                del metadata_store[pdf_name]
-                self.save_metadata(metadata_store)
-            
-            # Remove from library index
-            library_index = self.load_library_index()
-            if pdf_name in library_index.get("documents", {}):
-                del library_index["documents"][pdf_name]
+            with self._store_lock:
+                # Remove from metadata
+                metadata_store = self.load_metadata()
+                if pdf_name in metadata_store:
+                    del metadata_store[pdf_name]
+                    self.save_metadata(metadata_store)
+                
+                # Remove from library index
+                library_index = self.load_library_index()
+                if pdf_name in library_index.get("documents", {}):
+                    del library_index["documents"][pdf_name]
+                library_index["hashes"] = {
+                    file_hash: name for file_hash, name in library_index["hashes"].items() if name != pdf_name
+                }
                 self.save_library_index(library_index)
             
             logger.info(f"PDF deleted successfully: {pdf_name}")
@@ -378,8 +832,9 @@ Başlık:"""
             if not text:
                 raise ValueError("No text extracted from PDF")
             
-            # Extract title using LLM
-            title = self.extract_title_with_llm(text)
+            # Title from heuristics or the cached structured metadata (no extra LLM call after save_pdf)
+            document_metadata = self.extract_document_metadata(pdf_path, text, self._calculate_file_hash(pdf_path))
+            title = self._clean_filename(document_metadata.get('title', '')) or None
             
             # Create metadata
             pdf_name = Path(pdf_path).name
@@ -451,13 +906,18 @@ Başlık:"""
                 "research_fields": list(library_index.get("categories", {}).keys()),
                 "authors": list(library_index.get("authors", {}).keys()),
                 "document_types": {},
+                "metadata_sources": {},
+                "metadata_extraction": self.get_metadata_source_counts(),
                 "recent_uploads": []
             }
             
-            # Analyze document types
+            # Analyze document types and where their metadata came from
             for doc_name, doc_info in metadata_store.items():
-                research_type = doc_info.get("extracted_metadata", {}).get("research_type", "Unknown")
+                extracted = doc_info.get("extracted_metadata", {})
+                research_type = extracted.get("research_type") or "Unknown"
                 library_stats["document_types"][research_type] = library_stats["document_types"].get(research_type, 0) + 1
+                source = extracted.get("metadata_source", "unknown")
+                library_stats["metadata_sources"][source] = library_stats["metadata_sources"].get(source, 0) + 1
             
             # Get recent uploads (last 5)
             recent_docs = sorted(
@@ -609,6 +1069,40 @@ Başlık:"""
             logger.error(f"Error getting PDF metadata: {e}")
             return None
 
+    def apply_research_categorization(self, pdf_name: str, categorization: Dict[str, Any]) -> bool:
+        """
+        Fill empty research_field / research_type of a stored document from its research categorization
+
+        Heuristic metadata has no research field, so the categorization of the research
+        analysis stage completes it and files the document under that category.
+        """
+        try:
+            with self._store_lock:
+                metadata_store = self.load_metadata()
+                if pdf_name not in metadata_store:
+                    return False
+                extracted = metadata_store[pdf_name].setdefault("extracted_metadata", {})
+                filled = {field: categorization[field] for field in ("research_field", "research_type")
+                          if not extracted.get(field) and categorization.get(field)}
+                if not filled:
+                    return False
+                extracted.update(filled)
+                self.save_metadata(metadata_store)
+
+                library_index = self.load_library_index()
+                if pdf_name in library_index["documents"]:
+                    library_index["documents"][pdf_name].update(filled)
+                research_field = filled.get("research_field")
+                if research_field:
+                    documents = library_index["categories"].setdefault(research_field, [])
+                    if pdf_name not in documents:
+                        documents.append(pdf_name)
+                self.save_library_index(library_index)
+            return True
+        except Exception as e:
+            logger.error(f"Error applying research categorization: {e}")
+            return False
+
 # Legacy functions for backward compatibility
 def extract_text(pdf_path: str) -> str:
     """Legacy function wrapper"""
@@ -0,0 +1,189 @@
+"""
+Question Router - Complexity-based model selection for answers
+Classifies questions locally (lookup, summary, synthesis) with keyword and
+length heuristics, so simple lookups go to a smaller, faster model
+"""
+import logging
+import os
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Any, Tuple
+
+from analytics.metrics import percentile
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LOOKUP = "lookup"
+SUMMARY = "summary"
+SYNTHESIS = "synthesis"
+
+# USD per 1M tokens (input, output); unknown models are reported without cost
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+
+# Patterns are matched against the stripped, casefolded question; Turkish stems match suffixed forms
+SYNTHESIS_PATTERNS = [
+    r"\bcompar", r"\bcontrast", r"\bdiffer", r"\bsimilar", r"\brelationship", r"\bwhy\b",
+    r"\bimplication", r"\bevaluat", r"\bcritique", r"\bcritical", r"\bgap", r"\bsynthes",
+    r"\bacross\b", r"\bversus\b", r"\bvs\.?\b", r"\bhow does .+ (affect|influence|relate)",
+    r"karşılaştır", r"\bfark", r"\bbenzer", r"\bilişki", r"\bneden\b", r"\bniçin\b",
+    r"değerlendir", r"eleştir", r"\bsentez", r"çıkarım", r"\bboşlu", r"arasında",
+]
+# Lookups are anchored to fact-question forms: "authors" or "published" inside an open
+# question ("What do the authors conclude ...?") must not send it to the small model.
+# Turkish puts the question word last, so its forms are anchored to the end instead.
+LOOKUP_PATTERNS = [
+    r"^(in )?what year\b", r"^when (was|were|did)\b", r"^how many\b",
+    r"^who (wrote|is the author|are the authors|were the authors|published)\b",
+    r"^(in )?which (journal|year|country|university|database)\b",
+    r"^where (was|were) .+ published\b",
+    r"^what (is|was|are|were) the (sample size|doi|authors?|publication (year|date)|journal)\b",
+    r"hangi (yıl|dergi)", r"\bne zaman\b", r"\bkim\b", r"\bkimdir\b", r"\bkimler",
+    r"^kaç\b", r"\bkaç( tane)?\??$", r"örneklem (büyüklüğü|sayısı) (kaç|nedir|ne kadar)",
+]
+SUMMARY_PATTERNS = [
+    r"\bsummar", r"\boverview\b", r"\bmain (finding|result|idea)", r"\bkey (finding|result|point)",
+    r"\bwhat is\b", r"\bdescribe", r"\bexplain",
+    r"\bözet", r"ana bulgu", r"temel bulgu", r"\bnedir\b", r"\banlat", r"\baçıkla",
+]
+
+
+@dataclass
+class Route:
+    """Model and generation settings of one question class"""
+    name: str
+    model: str
+    max_tokens: int
+    temperature: float = 0.7
+    context_tokens: Optional[int] = None  # context packer budget; None uses its default
+    concise: bool = False  # short direct answer instead of the multi-paragraph academic prompt
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """USD cost of one call from the price table, None for unknown models"""
+    prices = MODEL_PRICES.get(model)
+    if not prices:
+        return None
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+class QuestionRouter:
+    """
+    Routes each question to a model by complexity:
+    - lookup: single facts (year, authors, sample size) -> small model, short answer
+    - summary: findings or description of the retrieved papers -> small model
+    - synthesis: comparisons, explanations, evaluations and any question matching no
+      class -> large model, full budget (an unclear question is not assumed to be simple)
+
+    Records latency and cost per route for get_stats().
+    """
+
+    def __init__(self, routes: Dict[str, Route] = None, max_lookup_words: int = 20,
+                 min_synthesis_words: int = 30, history_size: int = 500):
+        self.routes = routes or self._default_routes()
+        self.max_lookup_words = max_lookup_words
+        self.min_synthesis_words = min_synthesis_words
+        self._patterns = {
+            SYNTHESIS: [re.compile(pattern) for pattern in SYNTHESIS_PATTERNS],
+            LOOKUP: [re.compile(pattern) for pattern in LOOKUP_PATTERNS],
+            SUMMARY: [re.compile(pattern) for pattern in SUMMARY_PATTERNS],
+        }
+        self._lock = threading.Lock()
+        self._metrics = {
+            name: {"calls": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                   "total_cost": 0.0, "latencies": deque(maxlen=history_size),
+                   "costs": deque(maxlen=history_size)}
+            for name in self.routes
+        }
+
+        logger.info("Question router ready: " + ", ".join(
+            f"{route.name}={route.model}/{route.max_tokens}" for route in self.routes.values()
+        ))
+
+    @staticmethod
+    def _default_routes() -> Dict[str, Route]:
+        return {
+            LOOKUP: Route(LOOKUP, os.getenv("ROUTER_LOOKUP_MODEL", "gpt-4o-mini"),
+                          max_tokens=300, temperature=0.2, context_tokens=1500, concise=True),
+            SUMMARY: Route(SUMMARY, os.getenv("ROUTER_SUMMARY_MODEL", "gpt-4o-mini"),
+                           max_tokens=1200),
+            SYNTHESIS: Route(SYNTHESIS, os.getenv("ROUTER_SYNTHESIS_MODEL", "gpt-4o"),
+                             max_tokens=2000),
+        }
+
+    def _matches(self, route_name: str, text: str) -> List[str]:
+        return [pattern.pattern for pattern in self._patterns[route_name] if pattern.search(text)]
+
+    def classify(self, question: str) -> Tuple[str, str]:
+        """Return (route name, reason) for a question"""
+        text = question.strip().casefold()
+        words = len(text.split())
+
+        matched = self._matches(SYNTHESIS, text)
+        if matched:
+            return SYNTHESIS, f"synthesis keyword {matched[0]}"
+        if words >= self.min_synthesis_words:
+            return SYNTHESIS, f"long question ({words} words)"
+
+        matched = self._matches(LOOKUP, text)
+        if matched and words <= self.max_lookup_words:
+            return LOOKUP, f"lookup keyword {matched[0]}"
+
+        matched = self._matches(SUMMARY, text)
+        if matched:
+            return SUMMARY, f"summary keyword {matched[0]}"
+        return SYNTHESIS, "default"
+
+    def route(self, question: str) -> Route:
+        route_name, reason = self.classify(question)
+        route = self.routes[route_name]
+        logger.info(f"Question routed to {route.name} ({route.model}, max_tokens={route.max_tokens}): {reason}")
+        return route
+
+    def record(self, route: Route, seconds: float, prompt_tokens: int = 0,
+               completion_tokens: int = 0, error: bool = False):
+        """Record latency, tokens and estimated cost of one answer generation"""
+        cost = estimate_cost(route.model, prompt_tokens, completion_tokens)
+        with self._lock:
+            metrics = self._metrics[route.name]
+            metrics["calls"] += 1
+            if error:
+                metrics["errors"] += 1
+                return
+            metrics["prompt_tokens"] += prompt_tokens
+            metrics["completion_tokens"] += completion_tokens
+            metrics["latencies"].append(seconds)
+            if cost is not None:
+                metrics["total_cost"] += cost
+                metrics["costs"].append(cost)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-route settings, call counts, latency (seconds) and cost (USD) distributions"""
+        with self._lock:
+            stats = {}
+            for name, metrics in self._metrics.items():
+                latencies = list(metrics["latencies"])
+                costs = list(metrics["costs"])
+                stats[name] = {
+                    "route": asdict(self.routes[name]),
+                    "calls": metrics["calls"],
+                    "errors": metrics["errors"],
+                    "prompt_tokens": metrics["prompt_tokens"],
+                    "completion_tokens": metrics["completion_tokens"],
+                    "avg_seconds": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+                    "p50_seconds": round(percentile(latencies, 0.5), 3),
+                    "p95_seconds": round(percentile(latencies, 0.95), 3),
+                    "total_cost": round(metrics["total_cost"], 6),
+                    "avg_cost": round(metrics["total_cost"] / len(costs), 6) if costs else 0.0,
+                    "p50_cost": round(percentile(costs, 0.5), 6),
+                    "p95_cost": round(percentile(costs, 0.95), 6)
+                }
+            return stats
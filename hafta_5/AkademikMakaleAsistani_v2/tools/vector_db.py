@@ -32,13 +32,21 @@ class EnhancedVectorDB:
         self.primary_model_name = embedding_model or "paraphrase-MiniLM-L3-v2"  # Fastest English model
         self.english_model_name = "paraphrase-MiniLM-L3-v2"  # Much faster than L6-v2
         
-        # Initialize models (if available)
+        # Initialize models (if available); set only when both models actually loaded
+        self.turkish_model = None
+        self.english_model = None
+        self._models_loaded = False
         if SENTENCE_TRANSFORMERS_AVAILABLE:
-            self.turkish_model = SentenceTransformer(self.primary_model_name)
-            self.english_model = SentenceTransformer(self.english_model_name)
+            try:
+                self.turkish_model = SentenceTransformer(self.primary_model_name)
+                self.english_model = SentenceTransformer(self.english_model_name)
+                self._models_loaded = True
+            except Exception as e:
+                # e.g. model download failed - the library alone does not make embeddings semantic
+                self.turkish_model = None
+                self.english_model = None
+                logger.warning(f"SentenceTransformer models could not be loaded ({e}) - using fallback embeddings")
         else:
-            self.turkish_model = None
-            self.english_model = None
             logger.warning("SentenceTransformer models not available - using fallback embeddings")
         
         # LangChain embeddings
@@ -75,7 +83,7 @@ class EnhancedVectorDB:
     
     def get_embedding_model(self, language: str = "turkish"):
         """Get appropriate embedding model based on language"""
-        if not SENTENCE_TRANSFORMERS_AVAILABLE:
+        if not self._models_loaded:
             return None
         return self.turkish_model if language == "turkish" else self.english_model
     
@@ -115,7 +123,7 @@ class EnhancedVectorDB:
                     "chunk_text_length": len(chunk),
                     "language": language,
                     "pdf_name": pdf_name,
-                    "embedding_model": embedding_model.get_sentence_embedding_dimension()
+                    "embedding_model": embedding_model.get_sentence_embedding_dimension() if embedding_model else "fallback"
                 }
                 chunk_metadatas.append(chunk_metadata)
             
@@ -139,23 +147,39 @@ class EnhancedVectorDB:
         except Exception as e:
             logger.error(f"Error adding document to vector DB: {e}")
     
+    @property
+    def has_semantic_embeddings(self) -> bool:
+        """False when only the hash-based fallback embeddings are available"""
+        return self._models_loaded
+    
+    def embed_query(self, query: str, language: str = None) -> List[float]:
+        """Embed a search query with the model matching its language"""
+        # Auto-detect query language if not provided
+        if language is None:
+            language = self.detect_language(query)
+        
+        # Get appropriate embedding model
+        embedding_model = self.get_embedding_model(language)
+        
+        if embedding_model is not None:
+            return embedding_model.encode([query])[0].tolist()
+        
+        # Fallback: use simple hash-based embeddings (not ideal but prevents crash)
+        logger.warning("Using fallback query embeddings - search results may be poor")
+        return [hash(query) % 1000 / 1000.0] * 384
+    
     def search_documents(self, query: str, pdf_names: List[str] = None, 
-                        top_k: int = 5, language: str = None) -> Tuple[List[str], List[Dict]]:
+                        top_k: int = 5, language: str = None,
+                        query_embedding: List[float] = None) -> Tuple[List[str], List[Dict]]:
         """Enhanced document search with filtering and language detection"""
         try:
             # Auto-detect query language if not provided
             if language is None:
                 language = self.detect_language(query)
             
-            # Get appropriate embedding model
-            embedding_model = self.get_embedding_model(language)
-            
-            if embedding_model is not None:
-                query_embedding = embedding_model.encode([query])[0].tolist()
-            else:
-                # Fallback: use simple hash-based embeddings (not ideal but prevents crash)
-                logger.warning("Using fallback query embeddings - search results may be poor")
-                query_embedding = [hash(query) % 1000 / 1000.0] * 384
+            # A precomputed embedding (e.g. shared with the answer cache) skips re-encoding
+            if query_embedding is None:
+                query_embedding = self.embed_query(query, language)
             
             # Build filter for specific PDFs
             where_filter = None
@@ -172,11 +196,14 @@ class EnhancedVectorDB:
             documents = results['documents'][0] if results['documents'] else []
             metadatas = results['metadatas'][0] if results['metadatas'] else []
             distances = results['distances'][0] if results['distances'] else []
+            ids = results['ids'][0] if results.get('ids') else []
             
-            # Add similarity scores to metadata
+            # Add similarity scores and chunk IDs to metadata
             for i, metadata in enumerate(metadatas):
                 metadata['similarity_score'] = 1 - distances[i]  # Convert distance to similarity
                 metadata['search_language'] = language
+                if i < len(ids):
+                    metadata['chunk_ref'] = ids[i]
             
             logger.info(f"Found {len(documents)} relevant documents for query")
             return documents, metadatas
@@ -235,6 +262,14 @@ class EnhancedVectorDB:
             logger.error(f"Error getting document stats: {e}")
             return {}
     
+    def has_document(self, pdf_name: str) -> bool:
+        """Whether any chunks of a PDF are stored"""
+        try:
+            return bool(self.collection.get(where={"pdf_name": pdf_name}, limit=1)["ids"])
+        except Exception as e:
+            logger.error(f"Error checking document {pdf_name}: {e}")
+            return False
+    
     def delete_document(self, pdf_name: str) -> bool:
         """Delete all chunks related to a specific PDF"""
         try:
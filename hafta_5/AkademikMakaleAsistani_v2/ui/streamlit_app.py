@@ -8,6 +8,8 @@ import os
 import sys
 import json
 import asyncio
+import queue
+import threading
 from pathlib import Path
 from datetime import datetime, timedelta
 import time
@@ -273,7 +275,10 @@ def initialize_assistant():
                 st.session_state.assistant = AdvancedAcademicAssistant(
                     session_id=st.session_state.session_id
                 )
-            st.success("✅ Sistem başarıyla başlatıldı!")
+                # Heavy components (embedding models, chains) load while the UI renders
+                st.session_state.assistant.warm_up(background=True)
+            startup = st.session_state.assistant.get_startup_metrics()
+            st.success(f"✅ Sistem başarıyla başlatıldı! ({startup['construct_seconds']:.2f}s)")
         return True
     except Exception as e:
         st.error(f"❌ Sistem başlatılamadı: {str(e)}")
@@ -527,6 +532,26 @@ def render_document_processing():
     else:
         st.info("No documents processed yet. Upload some PDFs to get started!")
 
+# Categorization fields shown while the rest of the analysis is still running
+PARTIAL_CATEGORIZATION_FIELDS = {
+    "research_field": "Alan",
+    "research_type": "Araştırma türü",
+    "methodology": "Metodoloji",
+    "novelty_score": "Yenilik",
+}
+
+def render_partial_analysis(placeholder, filename, fields):
+    """Research analysis fields of a document that is still being processed"""
+    lines = [f"**⏳ {filename}**"]
+    categorization = fields.get("categorization", {})
+    for field, label in PARTIAL_CATEGORIZATION_FIELDS.items():
+        if field in categorization:
+            lines.append(f"- {label}: {categorization[field]}")
+    for step, step_fields in fields.items():
+        if step != "categorization":
+            lines.append(f"- {step}: {len(step_fields)} alan hazır")
+    placeholder.markdown("\n".join(lines))
+
 def process_documents(uploaded_files, associate_project, advanced_analysis, chunk_size):
     """Process uploaded documents with real-time progress"""
     
@@ -534,40 +559,93 @@ def process_documents(uploaded_files, associate_project, advanced_analysis, chun
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    for i, uploaded_file in enumerate(uploaded_files):
+    # Save uploaded files temporarily
+    temp_files = {}
+    for uploaded_file in uploaded_files:
+        temp_path = f"./temp_{uploaded_file.name}"
+        with open(temp_path, "wb") as f:
+            f.write(uploaded_file.getbuffer())
+        temp_files[temp_path] = uploaded_file
+    
+    status_text.text(f"Processing {len(temp_files)} documents...")
+    
+    # Research analysis fields are shown per document as soon as they are generated
+    partial_views = {temp_path: st.empty() for temp_path in temp_files}
+    partial_fields = {temp_path: {} for temp_path in temp_files}
+    
+    # Documents are processed concurrently in a worker thread. Streamed fields and
+    # finished documents come back through a queue, since Streamlit elements can only
+    # be updated from the script thread
+    events = queue.Queue()
+    assistant = st.session_state.assistant
+    project_id = st.session_state.current_project if associate_project else None
+    
+    def run_batch():
         try:
-            # Update progress
-            progress = i / len(uploaded_files)
-            progress_bar.progress(progress)
-            status_text.text(f"Processing {uploaded_file.name}...")
-            
-            # Save uploaded file temporarily
-            temp_path = f"./temp_{uploaded_file.name}"
-            with open(temp_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            
-            # Process document
-            result = st.session_state.assistant.process_document(
-                pdf_path=temp_path,
-                project_id=st.session_state.current_project if associate_project else None
+            results = assistant.process_documents(
+                list(temp_files),
+                max_concurrency=3,
+                project_id=project_id,
+                on_field=lambda path, step, field, value: events.put(("field", path, step, field, value))
             )
+            for result in results:
+                events.put(("result", result))
+        except Exception as e:
+            events.put(("error", str(e)))
+        finally:
+            events.put(("done",))
+    
+    threading.Thread(target=run_batch, daemon=True).start()
+    
+    i = 0
+    while True:
+        event = events.get()
+        if event[0] == "done":
+            break
+        if event[0] == "error":
+            st.error(f"Error processing documents: {event[1]}")
+            continue
+        if event[0] == "field":
+            _, temp_path, step, field, value = event
+            if temp_path in partial_fields:
+                partial_fields[temp_path].setdefault(step, {})[field] = value
+                render_partial_analysis(partial_views[temp_path], temp_files[temp_path].name,
+                                        partial_fields[temp_path])
+            continue
+        
+        i += 1
+        result = event[1]
+        temp_path = result.get('document_path')
+        uploaded_file = temp_files.get(temp_path)
+        filename = uploaded_file.name if uploaded_file else os.path.basename(str(temp_path))
+        if temp_path in partial_views:
+            partial_views[temp_path].empty()
+        
+        try:
+            if 'error' in result:
+                st.error(f"Error processing {filename}: {result['error']}")
+            else:
+                # Store result
+                doc_info = {
+                    'filename': filename,
+                    'title': result.get('processing_stages', {}).get('extraction', {}).get('metadata', {}).get('title', filename),
+                    'processed_date': datetime.now().strftime("%Y-%m-%d %H:%M"),
+                    'text_length': result.get('processing_stages', {}).get('extraction', {}).get('text_length', 0),
+                    'analysis': result.get('processing_stages', {}) if advanced_analysis else None
+                }
+                
+                st.session_state.processed_documents.append(doc_info)
             
-            # Store result
-            doc_info = {
-                'filename': uploaded_file.name,
-                'title': result.get('processing_stages', {}).get('extraction', {}).get('metadata', {}).get('title', uploaded_file.name),
-                'processed_date': datetime.now().strftime("%Y-%m-%d %H:%M"),
-                'text_length': result.get('processing_stages', {}).get('extraction', {}).get('text_length', 0),
-                'analysis': result.get('processing_stages', {}) if advanced_analysis else None
-            }
-            
-            st.session_state.processed_documents.append(doc_info)
+            # Update progress
+            progress_bar.progress(i / len(temp_files))
+            status_text.text(f"✅ {filename} ({i}/{len(temp_files)})")
             
             # Clean up temp file
-            os.remove(temp_path)
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
             
         except Exception as e:
-            st.error(f"Error processing {uploaded_file.name}: {str(e)}")
+            st.error(f"Error processing {filename}: {str(e)}")
     
     # Final progress update
     progress_bar.progress(1.0)
@@ -644,40 +722,58 @@ def render_research_chat():
 def ask_question(question, specific_docs, use_memory):
     """Process research question with streaming response"""
     
-    # Create streaming placeholder
+    # Create streaming placeholders
+    status_placeholder = st.empty()
     response_placeholder = st.empty()
     
-    with st.spinner("🤔 Thinking..."):
-        try:
-            # Get answer from assistant
-            result = st.session_state.assistant.ask_question(
-                question=question,
-                pdf_names=specific_docs if specific_docs else None,
-                use_memory=use_memory
-            )
-            
-            # Display result
-            response_placeholder.success("✅ Question answered!")
-            
-            # Add to chat history
-            chat_entry = {
-                'question': question,
-                'answer': result.get('answer', 'No answer generated'),
-                'sources': result.get('sources', []),
-                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'confidence': result.get('confidence', 'unknown')
-            }
-            
-            st.session_state.chat_history.append(chat_entry)
-            
-            # Clear input
-            st.session_state.chat_input = ""
-            
-            # Rerun to update display
-            st.rerun()
-            
-        except Exception as e:
-            response_placeholder.error(f"❌ Error: {str(e)}")
+    status_placeholder.info("🤔 Thinking...")
+    
+    try:
+        # Render tokens as they arrive; sources and confidence come with the final event
+        answer = ""
+        result = {}
+        for event in st.session_state.assistant.ask_question_stream(
+            question=question,
+            pdf_names=specific_docs if specific_docs else None,
+            use_memory=use_memory
+        ):
+            if event["type"] == "token":
+                if not answer:
+                    status_placeholder.info("✍️ Yanıt oluşturuluyor...")
+                answer += event["content"]
+                response_placeholder.markdown(answer + "▌")
+            elif event["type"] == "result":
+                result = event["result"]
+        
+        if 'error' in result:
+            status_placeholder.empty()
+            response_placeholder.error(f"❌ Error: {result['error']}")
+            return
+        
+        # Display result
+        response_placeholder.markdown(answer)
+        status_placeholder.success("✅ Question answered!")
+        
+        # Add to chat history
+        chat_entry = {
+            'question': question,
+            'answer': result.get('answer', 'No answer generated'),
+            'sources': result.get('sources', []),
+            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'confidence': result.get('confidence', 'unknown')
+        }
+        
+        st.session_state.chat_history.append(chat_entry)
+        
+        # Clear input
+        st.session_state.chat_input = ""
+        
+        # Rerun to update display
+        st.rerun()
+        
+    except Exception as e:
+        status_placeholder.empty()
+        response_placeholder.error(f"❌ Error: {str(e)}")
 
 def main():
     """Main Streamlit application"""